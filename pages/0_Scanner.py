@@ -8,6 +8,8 @@ import pandas as pd
 import streamlit as st
 
 from src.domain.bm_analyzer import BMFlippingAnalyzer
+from src.infra.quote_store import QuoteStore
+from src.infra.regions import DEFAULT_REGION, REGION_BASE_URLS
 from src.infra.template_repo import TemplateRepository
 
 
@@ -266,11 +268,14 @@ def analyze_template_cached(
     min_profit_net: int,
     min_margin_net: float,
     top_n: int,
+    region: str = DEFAULT_REGION,
 ) -> list[dict]:
     analyzer = BMFlippingAnalyzer(
         base_item=base_item,
         tier_min=tier_min, tier_max=tier_max,
         ench_min=ench_min, ench_max=ench_max,
+        store=QuoteStore(get_root_and_db()),
+        region=region,
     )
     results = analyzer.run(
         min_profit_net=min_profit_net,
@@ -327,6 +332,9 @@ repo = TemplateRepository(db_path)
 with st.sidebar:
     st.header("Filtros")
 
+    regions = list(REGION_BASE_URLS)
+    region = st.selectbox("Servidor", options=regions, index=regions.index(DEFAULT_REGION))
+
     if slugs:
         selected_slugs = st.multiselect(
             "Categorías",
@@ -404,6 +412,7 @@ if auto_run or run_btn:
                 min_profit_net=int(min_profit_net),
                 min_margin_net=float(min_margin_net_fraction),
                 top_n=int(top_n_per_template),
+                region=region,
             )
 
             for d in data:
@@ -1,11 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.api.services import SNAPSHOT_WARMUP, build_services
+
 from src.api.routers.categories import router as categories_router
 from src.api.routers.black_market import router as black_market_router
 from src.api.routers.black_market_catalog import router as black_market_catalog_router
 
-app = FastAPI(title="AURIA API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un solo juego de servicios (sesión HTTP, repos, stores, analyzers) por proceso
+    app.state.services = build_services()
+    if SNAPSHOT_WARMUP:
+        app.state.services.snapshot().refresh(wait=False)  # el primer scan arranca ya, en background
+    try:
+        yield
+    finally:
+        app.state.services.close()
+
+
+app = FastAPI(title="AURIA API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,20 +1,18 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional
-from pathlib import Path
 
 # Importa tus dataclasses y analyzer
-from src.domain.category_bm_analyzer import CategoryBMAnalyzer  
-from src.domain.bm_analyzer import FlipResult  # dataclass
+from src.api.services import AppServices, get_services
+from src.domain.bm_analyzer import FlipResult, SOURCING_MODES  # dataclass
+from src.infra.regions import DEFAULT_REGION, REGION_BASE_URLS, normalize_region
 from src.domain.category_bm_analyzer import TemplateGroupResult, CategoryAnalysis  # dataclasses
+from src.infra.quote_cache import shared_quote_cache
 
 router = APIRouter(prefix="/black-market", tags=["black-market"])
 
-# Puedes configurar DB_PATH por env var
-DB_PATH = Path(__import__("os").getenv("DB_PATH", "data/auria.db"))
-
 
 # -------------------------
 # Schemas de respuesta
@@ -40,6 +38,8 @@ class FlipResultOut(BaseModel):
 
     is_robust: bool
 
+    region: str
+
 
 class TemplateGroupResultOut(BaseModel):
     template_key: str
@@ -52,6 +52,15 @@ class CategoryAnalysisOut(BaseModel):
     all_results: List[FlipResultOut]
 
 
+class QuoteCacheStatsOut(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    items: int
+    quotes: int
+
+
 # -------------------------
 # Serializadores (dataclass -> dict compatible)
 # -------------------------
@@ -76,6 +85,8 @@ def flipresult_to_out(r: FlipResult) -> FlipResultOut:
         margin_order=r.margin_order,
 
         is_robust=r.is_robust,
+
+        region=r.region,
     )
 
 
@@ -95,33 +106,69 @@ def category_analysis_to_out(a: CategoryAnalysis) -> CategoryAnalysisOut:
 
 
 # -------------------------
-# Endpoint
+# Endpoints
 # -------------------------
 @router.get("/categories/{slug:path}/analysis", response_model=CategoryAnalysisOut)
 def analyze_category_bm(
     slug: str,
+    region: str = Query(DEFAULT_REGION, description=f"Servidor: {' | '.join(REGION_BASE_URLS)}"),
     include_children: bool = Query(False, description="Si True, incluye templates de subcategorías hijas"),
     top_n_per_template: int = Query(25, ge=1, le=500),
     top_n_total: Optional[int] = Query(100, ge=1, le=5000),
     min_profit_net: int = Query(1, ge=0),
     min_margin_net: float = Query(0.0, ge=0.0),
+    sourcing: str = Query(
+        "same_quality",
+        description=f"{' | '.join(SOURCING_MODES)}: upgrade llena cada orden del BM con lo más barato de calidad >= la pedida",
+    ),
+    services: AppServices = Depends(get_services),
 ):
     """
     Analiza flipping del Black Market para una categoría (slug).
-    Ej: /black-market/categories/equipamiento/armas/hachas/analysis
+    Ej: /black-market/categories/equipamiento/armas/hachas/analysis?region=europe
     """
     try:
-        analyzer = CategoryBMAnalyzer(db_path=DB_PATH)
-        analysis = analyzer.run(
+        region = normalize_region(region)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if sourcing not in SOURCING_MODES:
+        raise HTTPException(status_code=400, detail=f"sourcing inválido: {sourcing!r} (usa {' | '.join(SOURCING_MODES)})")
+
+    try:
+        analysis = services.category.run(
             category_slug=slug,
+            region=region,
             include_children=include_children,
             top_n_per_template=top_n_per_template,
             top_n_total=top_n_total,
             min_profit_net=min_profit_net,
             min_margin_net=min_margin_net,
+            sourcing=sourcing,
         )
         return category_analysis_to_out(analysis)
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"DB not found: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
+
+
+@router.get("/cache/stats", response_model=QuoteCacheStatsOut)
+def quote_cache_stats(
+    region: str = Query(DEFAULT_REGION, description=f"Servidor: {' | '.join(REGION_BASE_URLS)}"),
+):
+    """
+    Contadores de la cache de cotizaciones en memoria de una región
+    (compartida por todo el proceso).
+    """
+    try:
+        st = shared_quote_cache(region).stats()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return QuoteCacheStatsOut(
+        hits=st.hits,
+        misses=st.misses,
+        hit_rate=st.hit_rate,
+        evictions=st.evictions,
+        items=st.items,
+        quotes=st.quotes,
+    )
@@ -1,24 +1,26 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from typing import List, Optional
-from pathlib import Path
 
 # Domain
+from src.api.services import AppServices, get_services
 from src.domain.catalog_bm_analyzer import (
-    CatalogBMAnalyzer,
     CatalogReport,
+    CategoryCoverage,
     CategoryRun,
+    FetchPlanStats,
     TemplateRun,
+    result_key,
 )
 from src.domain.bm_analyzer import FlipResult  # dataclass
+from src.domain.catalog_snapshot import SnapshotStatus
+from src.infra.regions import DEFAULT_REGION, REGION_BASE_URLS, normalize_region
 
 
 router = APIRouter(prefix="/black-market", tags=["black-market"])
 
-DB_PATH = Path(__import__("os").getenv("DB_PATH", "data/auria.db"))
-
 
 # -------------------------
 # Schemas de respuesta
@@ -44,6 +46,8 @@ class FlipResultOut(BaseModel):
 
     is_robust: bool
 
+    region: str
+
 
 class TemplateRunOut(BaseModel):
     template_key: str
@@ -56,9 +60,40 @@ class CategoryRunOut(BaseModel):
     top_results: List[FlipResultOut]
 
 
+class FetchPlanStatsOut(BaseModel):
+    categories: int
+    item_ids_requested: int
+    item_ids_unique: int
+    requests_per_category: int
+    requests_planned: int
+    requests_saved: int
+
+
+class CategoryCoverageOut(BaseModel):
+    category_slug: str
+    status: str          # complete | partial | skipped
+    items_total: int
+    items_done: int
+
+
 class CatalogReportOut(BaseModel):
     categories: List[CategoryRunOut]
     top_global: List[FlipResultOut]
+    plan: Optional[FetchPlanStatsOut] = None
+    coverage: Optional[List[CategoryCoverageOut]] = None
+    deadline_hit: bool = False
+
+
+class CatalogSnapshotOut(BaseModel):
+    version: int
+    region: str
+    built_at: float
+    age_sec: float
+    build_sec: float
+    stale: bool
+    refreshing: bool
+    last_error: Optional[str] = None
+    report: CatalogReportOut
 
 
 # -------------------------
@@ -85,6 +120,8 @@ def flipresult_to_out(r: FlipResult) -> FlipResultOut:
         margin_order=r.margin_order,
 
         is_robust=r.is_robust,
+
+        region=r.region,
     )
 
 
@@ -103,10 +140,77 @@ def category_run_to_out(c: CategoryRun) -> CategoryRunOut:
     )
 
 
+def plan_stats_to_out(p: FetchPlanStats) -> FetchPlanStatsOut:
+    return FetchPlanStatsOut(
+        categories=p.categories,
+        item_ids_requested=p.item_ids_requested,
+        item_ids_unique=p.item_ids_unique,
+        requests_per_category=p.requests_per_category,
+        requests_planned=p.requests_planned,
+        requests_saved=p.requests_saved,
+    )
+
+
+def coverage_to_out(c: CategoryCoverage) -> CategoryCoverageOut:
+    return CategoryCoverageOut(
+        category_slug=c.category_slug,
+        status=c.status,
+        items_total=c.items_total,
+        items_done=c.items_done,
+    )
+
+
 def catalog_report_to_out(r: CatalogReport) -> CatalogReportOut:
     return CatalogReportOut(
         categories=[category_run_to_out(c) for c in r.categories],
         top_global=[flipresult_to_out(x) for x in r.top_global],
+        plan=plan_stats_to_out(r.plan) if r.plan is not None else None,
+        coverage=[coverage_to_out(c) for c in r.coverage] if r.coverage is not None else None,
+        deadline_hit=r.deadline_hit,
+    )
+
+
+def filter_report(
+    r: CatalogReport,
+    *,
+    category_slugs: Optional[List[str]],
+    top_n_global: int,
+    min_profit_net: int,
+    min_margin_net: float,
+) -> CatalogReport:
+    """Recorte de un snapshot (categorías, umbrales, top global) sin re-escanear."""
+    keep = lambda x: x.profit_net >= min_profit_net and x.margin_net >= min_margin_net  # noqa: E731
+
+    cats = r.categories
+    coverage = r.coverage
+    if category_slugs:
+        wanted = set(category_slugs)
+        cats = [c for c in cats if c.category_slug in wanted]
+        if coverage is not None:
+            coverage = [c for c in coverage if c.category_slug in wanted]
+
+    cats = [
+        CategoryRun(
+            category_slug=c.category_slug,
+            templates=[TemplateRun(template_key=t.template_key, results=[x for x in t.results if keep(x)])
+                       for t in c.templates],
+            top_results=[x for x in c.top_results if keep(x)],
+        )
+        for c in cats
+    ]
+
+    if category_slugs:
+        pool = list({result_key(x): x for c in cats for x in c.top_results}.values())
+        pool.sort(key=lambda x: (x.is_robust, x.profit_net, x.margin_net), reverse=True)
+    else:
+        pool = [x for x in r.top_global if keep(x)]
+
+    return CatalogReport(
+        categories=cats,
+        top_global=pool[:top_n_global],
+        plan=r.plan,
+        coverage=coverage,
+        deadline_hit=r.deadline_hit,
     )
 
 
@@ -114,14 +218,13 @@ def catalog_report_to_out(r: CatalogReport) -> CatalogReportOut:
 # Endpoints
 # -------------------------
 @router.get("/catalog/categories", response_model=List[str])
-def list_categories_with_templates():
+def list_categories_with_templates(services: AppServices = Depends(get_services)):
     """
     Lista categorías (slug) que tienen templates activos asociados.
     Útil para el frontend (dropdown/multiselect).
     """
     try:
-        runner = CatalogBMAnalyzer(db_path=DB_PATH)
-        return runner.list_categories_with_templates()
+        return services.catalog.list_categories_with_templates()
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"DB not found: {e}")
     except Exception as e:
@@ -135,22 +238,35 @@ def analyze_catalog_bm(
         description="Si se omite, analiza todas las categorías con templates. "
                     "Puedes repetir el query param: ?category_slugs=a&category_slugs=b",
     ),
+    region: str = Query(DEFAULT_REGION, description=f"Servidor: {' | '.join(REGION_BASE_URLS)}"),
     include_children: bool = Query(False, description="Si True, incluye templates de subcategorías hijas"),
     top_n_per_template: int = Query(25, ge=1, le=500),
     top_n_per_category: int = Query(100, ge=1, le=5000),
     top_n_global: int = Query(200, ge=1, le=20000),
     min_profit_net: int = Query(1, ge=0),
     min_margin_net: float = Query(0.0, ge=0.0),
+    deadline_ms: Optional[int] = Query(
+        None, ge=1, le=600_000,
+        description="Tope de tiempo: al vencerse devuelve el mejor reporte parcial (ver coverage)",
+    ),
+    services: AppServices = Depends(get_services),
 ):
     """
     Escaneo completo (catálogo):
       - por categoría (y templates)
       - top por categoría
       - top global del catálogo
+    Con deadline_ms nunca tarda (mucho) más que eso: deadline_hit=True y
+    coverage dice qué categorías quedaron complete / partial / skipped.
     """
     try:
-        runner = CatalogBMAnalyzer(db_path=DB_PATH)
-        report = runner.run(
+        region = normalize_region(region)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        report = services.catalog.run(
+            region=region,
             category_slugs=category_slugs,
             include_children=include_children,
             top_n_per_template=top_n_per_template,
@@ -158,6 +274,7 @@ def analyze_catalog_bm(
             top_n_global=top_n_global,
             min_profit_net=min_profit_net,
             min_margin_net=min_margin_net,
+            deadline_ms=deadline_ms,
         )
         return catalog_report_to_out(report)
 
@@ -165,3 +282,53 @@ def analyze_catalog_bm(
         raise HTTPException(status_code=500, detail=f"DB not found: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Catalog analysis failed: {e}")
+
+
+@router.get("/catalog/snapshot", response_model=CatalogSnapshotOut)
+def catalog_snapshot(
+    response: Response,
+    category_slugs: Optional[List[str]] = Query(None, description="Filtra categorías del snapshot"),
+    region: str = Query(DEFAULT_REGION, description=f"Servidor: {' | '.join(REGION_BASE_URLS)}"),
+    top_n_global: int = Query(200, ge=1, le=20000),
+    min_profit_net: int = Query(1, ge=0),
+    min_margin_net: float = Query(0.0, ge=0.0),
+    services: AppServices = Depends(get_services),
+):
+    """
+    Catálogo desde el snapshot en memoria (se refresca en background):
+    responde en milisegundos, con la edad del snapshot. Si está vencido
+    dispara un refresh y mientras tanto sirve el actual (stale-while-revalidate).
+    503 mientras se arma el primero.
+    """
+    try:
+        region = normalize_region(region)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    status: SnapshotStatus = services.snapshot(region).get()
+    snap = status.snapshot
+    if snap is None:
+        detail = "Snapshot en preparación"
+        if status.last_error:
+            detail += f" (último intento falló: {status.last_error})"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+    report = filter_report(
+        snap.report,
+        category_slugs=category_slugs,
+        top_n_global=top_n_global,
+        min_profit_net=min_profit_net,
+        min_margin_net=min_margin_net,
+    )
+    response.headers["Age"] = str(int(snap.age_sec()))
+    return CatalogSnapshotOut(
+        version=snap.version,
+        region=snap.region,
+        built_at=snap.built_at,
+        age_sec=snap.age_sec(),
+        build_sec=snap.build_sec,
+        stale=status.stale,
+        refreshing=status.refreshing,
+        last_error=status.last_error,
+        report=catalog_report_to_out(report),
+    )
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict
+
+import requests
+from fastapi import Request
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer
+from src.domain.catalog_snapshot import CatalogSnapshotRefresher
+from src.domain.category_bm_analyzer import CategoryBMAnalyzer
+from src.infra.negative_cache import NegativeCache
+from src.infra.price_fetcher import make_session
+from src.infra.quote_store import QuoteStore
+from src.infra.regions import DEFAULT_REGION, normalize_region
+from src.infra.template_repo import TemplateRepository
+
+# Puedes configurar DB_PATH por env var
+DB_PATH = Path(os.getenv("DB_PATH", "data/auria.db"))
+
+# Conexiones keep-alive por host: alcanza para varios requests de la API en paralelo,
+# cada uno con sus batches en vuelo
+HTTP_POOL_MAXSIZE = 16
+
+# Snapshot del catálogo (/catalog/snapshot). Por defecto solo se escanea cuando alguien
+# pide el snapshot y está vencido; cada worker de uvicorn tiene el suyo, así que
+# precalentar al arrancar y el refresh periódico son opt-in:
+#   AURIA_SNAPSHOT_WARMUP=1    -> primer scan (región default) al arrancar
+#   AURIA_SNAPSHOT_PERIODIC=1  -> refresca cada max_age aunque nadie pida
+SNAPSHOT_MAX_AGE_SEC = float(os.getenv("AURIA_SNAPSHOT_MAX_AGE_SEC", CatalogSnapshotRefresher.DEFAULT_MAX_AGE_SEC))
+SNAPSHOT_WARMUP = os.getenv("AURIA_SNAPSHOT_WARMUP", "0") == "1"
+SNAPSHOT_PERIODIC = os.getenv("AURIA_SNAPSHOT_PERIODIC", "0") == "1"
+
+
+@dataclass
+class AppServices:
+    """
+    Lo que vive todo el proceso (lo arma el lifespan de src/api/main.py):
+    una sola sesión HTTP con su pool, repositorios, stores y analyzers.
+    Los analyzers no guardan estado por request: se comparten entre hilos.
+    """
+    db_path: Path
+    session: requests.Session
+    template_repo: TemplateRepository
+    quote_store: QuoteStore
+    negative_cache: NegativeCache
+    catalog: CatalogBMAnalyzer
+    category: CategoryBMAnalyzer
+    snapshots: Dict[str, CatalogSnapshotRefresher] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def snapshot(self, region: str = DEFAULT_REGION) -> CatalogSnapshotRefresher:
+        """Refresher del snapshot de la región (se crea al primer uso; con refresh periódico, también arranca)."""
+        region = normalize_region(region)
+        with self._lock:
+            refresher = self.snapshots.get(region)
+            if refresher is None:
+                refresher = self.snapshots[region] = CatalogSnapshotRefresher(
+                    self.catalog, region=region, max_age_sec=SNAPSHOT_MAX_AGE_SEC
+                )
+                if SNAPSHOT_PERIODIC:
+                    refresher.start()
+            return refresher
+
+    def close(self) -> None:
+        """Corta los scans de snapshot (periódicos y en curso) y cierra la sesión."""
+        with self._lock:
+            refreshers = list(self.snapshots.values())
+        for refresher in refreshers:
+            refresher.stop()
+        self.session.close()
+
+
+def build_services(db_path: Path = DB_PATH) -> AppServices:
+    db_path = Path(db_path)
+    session = make_session(HTTP_POOL_MAXSIZE)
+    template_repo = TemplateRepository(db_path)
+    quote_store = QuoteStore(db_path)
+    negative_cache = NegativeCache(db_path)
+
+    shared = dict(
+        session=session,
+        template_repo=template_repo,
+        quote_store=quote_store,
+        negative_cache=negative_cache,
+    )
+    return AppServices(
+        db_path=db_path,
+        session=session,
+        template_repo=template_repo,
+        quote_store=quote_store,
+        negative_cache=negative_cache,
+        catalog=CatalogBMAnalyzer(db_path, **shared),
+        category=CategoryBMAnalyzer(db_path, **shared),
+    )
+
+
+_LAZY_LOCK = threading.Lock()
+
+
+def get_services(request: Request) -> AppServices:
+    """
+    Dependencia de FastAPI. Normalmente las arma el lifespan; si la app corre
+    sin lifespan (p.ej. TestClient sin `with`) se arman una vez al primer uso.
+    """
+    state = request.app.state
+    services = getattr(state, "services", None)
+    if services is None:
+        with _LAZY_LOCK:
+            services = getattr(state, "services", None)
+            if services is None:
+                services = state.services = build_services()
+    return services
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Tuple
+import heapq
+from typing import Iterator, List, Mapping, Optional, Dict, Sequence, Tuple
+import requests
 
+from src.domain.bm_kernel import HAS_NUMPY, compute_flips_numpy
 from src.infra.market_query import FastMarketQuery, MarketIndex, Quote
+from src.infra.negative_cache import NegativeCache
+from src.infra.quote_store import QuoteStore
+from src.infra.regions import DEFAULT_REGION
 
 
 # Impuestos (según tu modelo)
@@ -36,10 +42,42 @@ class FlipResult:
 
     is_robust: bool               # True si la ganancia existe usando sell_max
 
+    region: str = DEFAULT_REGION  # servidor del juego (west | east | europe)
+
+
+ENGINES = ("auto", "python", "numpy")
+
+# sourcing: con qué publicación de origen se llena cada venta al BM
+#   same_quality     -> cada (ciudad, calidad) de origen contra el mejor BM <= esa calidad
+#   upgrade          -> cada orden del BM (calidad b) con lo más barato de calidad >= b, por ciudad
+#   upgrade_any_city -> igual, pero lo más barato de calidad >= b en cualquier ciudad
+SOURCING_MODES = ("same_quality", "upgrade", "upgrade_any_city")
+
+
+@dataclass(frozen=True, slots=True)
+class BMRung:
+    """Escalón de la escalera BM de un item: la mejor venta para una calidad de origen."""
+    quality: int                  # calidad BM usada
+    revenue: int
+    source: str                   # "buy_max" | "buy_min"
+
+    # revenue neto por impuesto (depende solo del revenue: se calcula una vez)
+    net_rev_net: int
+    net_rev_flip: int
+    net_rev_order: int
+
+
+# (item_id, origin_city, origin_quality, cost, cost_src, robust_cost, robust_src, rung):
+# argumentos de BMFlippingAnalyzer._flip_result
+Candidate = Tuple[str, str, int, int, str, int, str, BMRung]
+
 
 class BMFlippingAnalyzer:
     BM_CITY = "Black Market"
 
+    # engine="auto": por debajo de esto el armado de arrays cuesta más que el loop
+    NUMPY_MIN_ITEMS = 16
+
     def __init__(
         self,
         base_item: str,
@@ -47,14 +85,57 @@ class BMFlippingAnalyzer:
         tier_max: int = 8,
         ench_min: int = 0,
         ench_max: int = 4,
+        store: Optional[QuoteStore] = None,
+        negative_cache: Optional[NegativeCache] = None,
+        qualities: Optional[List[int]] = None,
+        cities: Optional[List[str]] = None,
+        region: str = DEFAULT_REGION,
+        session: Optional[requests.Session] = None,
+        engine: str = "auto",
+        sourcing: str = "same_quality",
     ) -> None:
+        """
+        engine: "python" (loops), "numpy" (vectorizado, src/domain/bm_kernel.py)
+        o "auto" (numpy si está instalado y el índice es grande). Mismos resultados.
+
+        sourcing: ver SOURCING_MODES. Los modos upgrade van siempre por el motor
+        en Python (el kernel numpy solo hace same_quality).
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"engine inválido: {engine!r} (usa {' | '.join(ENGINES)})")
+        if engine == "numpy" and not HAS_NUMPY:
+            raise ValueError("engine='numpy' requiere numpy instalado")
+        if sourcing not in SOURCING_MODES:
+            raise ValueError(f"sourcing inválido: {sourcing!r} (usa {' | '.join(SOURCING_MODES)})")
+        if engine == "numpy" and sourcing != "same_quality":
+            raise ValueError(f"engine='numpy' no soporta sourcing={sourcing!r}")
+        self.engine = engine
+        self.sourcing = sourcing
+
         self.q = FastMarketQuery(
             base_item=base_item,
             tier_min=tier_min,
             tier_max=tier_max,
             ench_min=ench_min,
             ench_max=ench_max,
+            store=store,
+            negative_cache=negative_cache,
+            qualities=qualities,
+            cities=self.cities_with_bm(cities),
+            region=region,
+            session=session,
         )
+        self.region = self.q.region
+
+    @classmethod
+    def cities_with_bm(cls, cities: Optional[Sequence[str]]) -> Optional[List[str]]:
+        """Ciudades a pedir: sin el Black Market no hay nada que analizar."""
+        if not cities:
+            return None  # todas
+        out = list(cities)
+        if cls.BM_CITY not in out:
+            out.append(cls.BM_CITY)
+        return out
 
     def run(
         self,
@@ -73,22 +154,50 @@ class BMFlippingAnalyzer:
     # ---------------- Internal ----------------
 
     def _compute(self, index: MarketIndex) -> List[FlipResult]:
-        out: List[FlipResult] = []
-
+        """
+        Todos los FlipResult del índice, sin filtrar ni ordenar (en el orden de
+        recorrido). Es la referencia con la que se comparan los motores: los
+        tests de paridad (tests/test_bm_analyzer.py, tests/test_bm_kernel.py) y
+        src/scripts/bench_bm_kernel.py. analyze_index no pasa por acá.
+        Con engine numpy la ganancia real es sobre un ColumnarIndex: sobre dicts
+        el aplanado y armar cada FlipResult cuestan casi lo mismo que el loop.
+        """
+        if self._use_numpy(index):
+            return compute_flips_numpy(
+                index,
+                bm_city=self.BM_CITY,
+                region=self.region,
+                taxes=(TAX_NET, TAX_FLIP, TAX_ORDER),
+            )
+        return self._compute_python(index)
+
+    def _use_numpy(self, index: MarketIndex) -> bool:
+        if self.sourcing != "same_quality":
+            return False
+        if self.engine == "auto":
+            return HAS_NUMPY and len(index) >= self.NUMPY_MIN_ITEMS
+        return self.engine == "numpy"
+
+    def _compute_python(self, index: MarketIndex) -> List[FlipResult]:
+        return [self._flip_result(*c) for c in self._iter_candidates(index)]
+
+    def _iter_candidates(self, index: MarketIndex) -> Iterator[Candidate]:
+        """Pares (origen, escalón BM) con ganancia bruta > 0, sin armar el FlipResult."""
+        if self.sourcing != "same_quality":
+            return self._iter_upgrade(index, any_city=self.sourcing == "upgrade_any_city")
+        return self._iter_same_quality(index)
+
+    def _iter_same_quality(self, index: MarketIndex) -> Iterator[Candidate]:
         for item_id, city_map in index.items():
             bm_qmap = city_map.get(self.BM_CITY)
             if not bm_qmap:
                 continue
 
-            # BM revenue por calidad + fuente
-            bm_rev_by_q: Dict[int, Tuple[int, str]] = {}
-            for q_bm, quote_bm in bm_qmap.items():
-                rev, src = self._bm_revenue_with_source(quote_bm)
-                if rev > 0:
-                    bm_rev_by_q[q_bm] = (rev, src)
-
-            if not bm_rev_by_q:
+            # Escalera BM del item: una vez por item, sirve para todas las ciudades
+            ladder = self._bm_quality_ladder(bm_qmap)
+            if not ladder:
                 continue
+            top_q = len(ladder) - 1
 
             for origin_city, qmap in city_map.items():
                 if origin_city == self.BM_CITY:
@@ -101,75 +210,142 @@ class BMFlippingAnalyzer:
                     if robust_cost <= 0 and opportunistic_cost <= 0:
                         continue
 
-                    bm_choice = self._best_bm_revenue_for_origin_quality(bm_rev_by_q, origin_quality)
-                    if bm_choice is None:
+                    # mejor BM con calidad <= origin_quality: un lookup
+                    if origin_quality < 0:
                         continue
-
-                    bm_quality_used, (revenue, bm_src) = bm_choice
-                    if revenue <= 0:
+                    rung = ladder[origin_quality if origin_quality <= top_q else top_q]
+                    if rung is None:
                         continue
 
                     # Para resultados “relevantes”: prioriza costo robusto (sell_max) si existe
                     cost, cost_src = self._choose_cost_for_output(robust_cost, robust_src, opportunistic_cost, opp_src)
-                    if cost <= 0:
-                        continue
-
-                    gross_profit = revenue - cost
-                    if gross_profit <= 0:
+                    if cost <= 0 or rung.revenue - cost <= 0:
                         continue
 
-                    # is_robust: si hay sell_max y con sell_max también hay profit
-                    robust_profit = -1
-                    if robust_cost > 0:
-                        net_rev_robust = int(round(revenue * (1.0 - TAX_FLIP)))
-                        robust_profit = net_rev_robust - robust_cost
-
-                    is_robust = (robust_src == "sell_max") and (robust_profit > 0)
+                    yield item_id, origin_city, origin_quality, cost, cost_src, robust_cost, robust_src, rung
 
+    def _iter_upgrade(self, index: MarketIndex, *, any_city: bool) -> Iterator[Candidate]:
+        """
+        El BM acepta calidad >= la de la orden: cada orden del BM (calidad b)
+        se llena con la publicación más barata de calidad >= b de la ciudad
+        (o de cualquier ciudad con any_city). Un resultado por orden del BM y
+        ciudad (o por orden, con any_city); encuentra órdenes que same_quality
+        no empareja, p.ej. una Q2 barata llenando la orden Q1.
+
+        Lineal por item: mínimo por calidad, mínimo sufijo (calidad >= b) y una
+        pasada conjunta con las órdenes del BM, ya ordenadas por calidad.
+        Empates de costo: la calidad más baja, después la primera ciudad.
+        """
+        for item_id, city_map in index.items():
+            bm_qmap = city_map.get(self.BM_CITY)
+            if not bm_qmap:
+                continue
 
-                    # Netos (tu modelo: “aplicar impuesto al profit”)
-                    profit_net, margin_net = self._apply_tax_on_revenue(revenue, cost, TAX_NET)
-                    profit_flip, margin_flip = self._apply_tax_on_revenue(revenue, cost, TAX_FLIP)
-                    profit_order, margin_order = self._apply_tax_on_revenue(revenue, cost, TAX_ORDER)
-
-                    out.append(FlipResult(
-                        item_id=item_id,
-                        origin_quality=origin_quality,
-                        bm_quality_used=bm_quality_used,
-                        origin_city=origin_city,
-
-                        origin_price=cost,
-                        origin_price_source=cost_src,
-                        bm_price=revenue,
-                        bm_price_source=bm_src,
-
-                        profit_net=profit_net,
-                        margin_net=margin_net,
+            orders: List[BMRung] = []
+            for q_bm in sorted(bm_qmap):
+                rev, src = self._bm_revenue_with_source(bm_qmap[q_bm])
+                if rev > 0:
+                    orders.append(self._bm_rung(q_bm, rev, src))
+            if not orders:
+                continue
 
-                        profit_flip=profit_flip,
-                        margin_flip=margin_flip,
-                        profit_order=profit_order,
-                        margin_order=margin_order,
+            # más barato por calidad: quality -> (cost, cost_src, robust_cost, robust_src, city)
+            groups: List[Dict[int, Tuple[int, str, int, str, str]]] = []
+            cheapest: Dict[int, Tuple[int, str, int, str, str]] = {}
+            for origin_city, qmap in city_map.items():
+                if origin_city == self.BM_CITY:
+                    continue
+                if not any_city:
+                    cheapest = {}
+                    groups.append(cheapest)
+                for origin_quality, quote_origin in qmap.items():
+                    robust_cost, robust_src = self._origin_cost_robust(quote_origin)
+                    opportunistic_cost, opp_src = self._origin_cost_opportunistic(quote_origin)
+                    cost, cost_src = self._choose_cost_for_output(robust_cost, robust_src, opportunistic_cost, opp_src)
+                    if cost <= 0:
+                        continue
+                    prev = cheapest.get(origin_quality)
+                    if prev is None or cost < prev[0]:
+                        cheapest[origin_quality] = (cost, cost_src, robust_cost, robust_src, origin_city)
+            if any_city:
+                groups.append(cheapest)
+
+            for cheapest in groups:
+                if not cheapest:
+                    continue
 
-                        is_robust=is_robust,
-                    ))
+                # mínimo sufijo: suffix[i] = lo más barato entre qualities[i:]
+                qualities = sorted(cheapest)
+                suffix: List[Tuple[int, Tuple[int, str, int, str, str]]] = [None] * len(qualities)  # type: ignore[list-item]
+                best = None
+                for i in range(len(qualities) - 1, -1, -1):
+                    q = qualities[i]
+                    cand = cheapest[q]
+                    if best is None or cand[0] <= best[1][0]:  # <=: empate -> calidad más baja
+                        best = (q, cand)
+                    suffix[i] = best
+
+                i = 0
+                for rung in orders:
+                    while i < len(qualities) and qualities[i] < rung.quality:
+                        i += 1
+                    if i == len(qualities):
+                        break
+                    origin_quality, (cost, cost_src, robust_cost, robust_src, origin_city) = suffix[i]
+                    if rung.revenue - cost > 0:
+                        yield item_id, origin_city, origin_quality, cost, cost_src, robust_cost, robust_src, rung
+
+    def _flip_result(
+        self,
+        item_id: str,
+        origin_city: str,
+        origin_quality: int,
+        cost: int,
+        cost_src: str,
+        robust_cost: int,
+        robust_src: str,
+        rung: BMRung,
+    ) -> FlipResult:
+        """FlipResult de comprar en origen a cost y vender en el escalón rung (un Candidate)."""
+        # Netos (tu modelo: “aplicar impuesto al profit”); el revenue neto ya viene en el escalón
+        profit_net = rung.net_rev_net - cost
+        profit_flip = rung.net_rev_flip - cost
+        profit_order = rung.net_rev_order - cost
+
+        return FlipResult(
+            item_id=item_id,
+            origin_quality=origin_quality,
+            bm_quality_used=rung.quality,
+            origin_city=origin_city,
+
+            origin_price=cost,
+            origin_price_source=cost_src,
+            bm_price=rung.revenue,
+            bm_price_source=rung.source,
+
+            profit_net=profit_net,
+            margin_net=profit_net / cost,
+
+            profit_flip=profit_flip,
+            margin_flip=profit_flip / cost,
+            profit_order=profit_order,
+            margin_order=profit_order / cost,
+
+            is_robust=self._is_robust(robust_cost, robust_src, rung),
+            region=self.region,
+        )
 
-        return out
+    @staticmethod
+    def _is_robust(robust_cost: int, robust_src: str, rung: BMRung) -> bool:
+        # si hay sell_max y con sell_max también hay profit
+        return robust_src == "sell_max" and rung.net_rev_flip - robust_cost > 0
 
     # ---------- tax helper ----------
 
     @staticmethod
-    def _apply_tax_on_revenue(revenue: int, cost: int, tax_rate: float) -> Tuple[int, float]:
-        """
-        Impuesto aplicado al REVENUE (precio de venta), que es como funciona BM/mercados.
-        net_revenue = revenue * (1 - tax)
-        profit = net_revenue - cost
-        margin = profit / cost
-        """
-        net_revenue = int(round(revenue * (1.0 - tax_rate)))
-        profit = net_revenue - cost
-        margin = (profit / cost) if cost > 0 else 0.0
-        return profit, margin
+    def _net_revenue(revenue: int, tax_rate: float) -> int:
+        """Impuesto aplicado al REVENUE (precio de venta), que es como funciona BM/mercados."""
+        return int(round(revenue * (1.0 - tax_rate)))
 
 
 
@@ -214,30 +390,42 @@ class BMFlippingAnalyzer:
 
     # ---------- BM quality selection ----------
 
-    @staticmethod
-    def _best_bm_revenue_for_origin_quality(
-        bm_rev_by_q: Dict[int, Tuple[int, str]],
-        origin_quality: int
-    ) -> Optional[Tuple[int, Tuple[int, str]]]:
+    @classmethod
+    def _bm_quality_ladder(cls, bm_qmap: Mapping[int, Quote]) -> List[Optional[BMRung]]:
         """
-        Elige el mejor revenue en BM entre calidades <= origin_quality.
-        Empate: prefiere mayor calidad.
+        ladder[q] = mejor venta en BM entre calidades <= q (máximo prefijo;
+        empate: prefiere mayor calidad), o None si no hay ninguna.
+        Para origen con calidad > la última, vale el último escalón.
+        Vacía si el BM no compra nada del item.
         """
-        best_q: Optional[int] = None
-        best_rev: int = 0
-        best_src: str = "buy_max"
-
-        for q_bm, (rev, src) in bm_rev_by_q.items():
-            if q_bm > origin_quality:
-                continue
-            if best_q is None or rev > best_rev or (rev == best_rev and q_bm > best_q):
-                best_q = q_bm
-                best_rev = rev
-                best_src = src
-
-        if best_q is None:
-            return None
-        return best_q, (best_rev, best_src)
+        rev_by_q: Dict[int, Tuple[int, str]] = {}
+        for q_bm, quote_bm in bm_qmap.items():
+            rev, src = cls._bm_revenue_with_source(quote_bm)
+            if rev > 0:
+                rev_by_q[q_bm] = (rev, src)
+
+        if not rev_by_q:
+            return []
+
+        ladder: List[Optional[BMRung]] = []
+        best: Optional[BMRung] = None
+        for q in range(max(rev_by_q) + 1):
+            cand = rev_by_q.get(q)
+            if cand is not None and (best is None or cand[0] >= best.revenue):
+                best = cls._bm_rung(q, *cand)
+            ladder.append(best)
+        return ladder
+
+    @classmethod
+    def _bm_rung(cls, quality: int, revenue: int, source: str) -> BMRung:
+        return BMRung(
+            quality=quality,
+            revenue=revenue,
+            source=source,
+            net_rev_net=cls._net_revenue(revenue, TAX_NET),
+            net_rev_flip=cls._net_revenue(revenue, TAX_FLIP),
+            net_rev_order=cls._net_revenue(revenue, TAX_ORDER),
+        )
 
     def analyze_index(
             self,
@@ -251,15 +439,67 @@ class BMFlippingAnalyzer:
             Igual que run(), pero reutiliza un MarketIndex ya descargado.
             Ideal para análisis masivo por categoría/catálogo.
             """
-            results = self._compute(index)
-
-            # Filtra usando el neto principal (8%) para ser conservador
-            results = [
-                r for r in results
-                if r.profit_net >= min_profit_net and r.margin_net >= min_margin_net
-            ]
+            if self._use_numpy(index):
+                # filtro, ranking y top_n en arrays: solo se arman los FlipResult que quedan
+                return compute_flips_numpy(
+                    index,
+                    bm_city=self.BM_CITY,
+                    region=self.region,
+                    taxes=(TAX_NET, TAX_FLIP, TAX_ORDER),
+                    min_profit_net=min_profit_net,
+                    min_margin_net=min_margin_net,
+                    ranked=True,
+                    top_n=top_n,
+                )
+
+            # Filtra usando el neto principal (8%) para ser conservador, antes de armar nada
+            ranked = self._iter_ranked(index, min_profit_net=min_profit_net, min_margin_net=min_margin_net)
+
+            if top_n is not None and top_n >= 0:
+                return self._select_top(ranked, top_n)
+
+            results = [self._flip_result(*c) for _, c in ranked]
 
             # Ranking: robustos arriba, luego profit_net, luego margin_net
             results.sort(key=lambda x: (x.is_robust, x.profit_net, x.margin_net), reverse=True)
 
-            return results[:top_n] if top_n is not None else results
\ No newline at end of file
+            return results[:top_n] if top_n is not None else results
+
+    def _iter_ranked(
+        self,
+        index: MarketIndex,
+        *,
+        min_profit_net: int,
+        min_margin_net: float,
+    ) -> Iterator[Tuple[Tuple[bool, int, float], Candidate]]:
+        """(clave de ranking, candidato) de los candidatos que pasan los mínimos."""
+        for c in self._iter_candidates(index):
+            cost, robust_cost, robust_src, rung = c[3], c[5], c[6], c[7]
+            profit_net = rung.net_rev_net - cost
+            if profit_net < min_profit_net:
+                continue
+            margin_net = profit_net / cost
+            if margin_net < min_margin_net:
+                continue
+            yield (self._is_robust(robust_cost, robust_src, rung), profit_net, margin_net), c
+
+    def _select_top(self, ranked: Iterator[Tuple[Tuple[bool, int, float], Candidate]], k: int) -> List[FlipResult]:
+        """
+        Top k por clave con un heap acotado: solo se arman los k FlipResult
+        que quedan. Mismo orden que el sort estable con reverse=True: en
+        empate de clave gana el que vino antes (seq más chico).
+        """
+        if k == 0:
+            return []
+
+        # min-heap de (clave, -seq): heap[0] es el peor del top actual
+        heap: List[Tuple[Tuple[bool, int, float], int, Candidate]] = []
+        for seq, (key, c) in enumerate(ranked):
+            if len(heap) < k:
+                heapq.heappush(heap, (key, -seq, c))
+            elif key > heap[0][0]:
+                # con clave igual al peor no entra: el peor llegó antes
+                heapq.heapreplace(heap, (key, -seq, c))
+
+        heap.sort(reverse=True)
+        return [self._flip_result(*c) for _, _, c in heap]
\ No newline at end of file
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+try:  # opcional: sin numpy BMFlippingAnalyzer usa el motor en Python puro
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from src.infra.columnar_index import ColumnarIndex
+from src.infra.market_types import MarketIndex
+
+HAS_NUMPY = np is not None
+
+# códigos de fuente (índices en estas tuplas)
+ORIGIN_SOURCES = ("sell_max", "sell_min")
+BM_SOURCES = ("buy_max", "buy_min")
+
+
+def compute_flips_numpy(
+    index: MarketIndex,
+    *,
+    bm_city: str,
+    region: str,
+    taxes: tuple,
+    min_profit_net: Optional[int] = None,
+    min_margin_net: Optional[float] = None,
+    ranked: bool = False,
+    top_n: Optional[int] = None,
+) -> list:
+    """
+    Mismo resultado que BMFlippingAnalyzer._compute (mismos FlipResult y en
+    el mismo orden), pero con las cuentas en arrays:
+
+      1) aplana el índice en filas (item, ciudad origen, calidad) en el orden
+         de recorrido de _compute, y el BM en una matriz item x calidad
+         (un ColumnarIndex ya viene en columnas: no hay nada que recorrer)
+      2) escalera por item: mejor revenue BM con calidad <= q (empate: mayor q)
+      3) costo, revenue, impuestos, márgenes e is_robust en operaciones por columna
+      4) arma FlipResult solo para las filas que pasan (en el orden del ranking si ranked)
+
+    Con min_profit_net / min_margin_net / ranked / top_n hace además el filtro
+    y el ranking de analyze_index sobre los arrays, y solo construye los
+    FlipResult que quedan (armarlos es lo más caro).
+
+    Dónde rinde: con un ColumnarIndex el paso 1 es un gather sobre las
+    columnas, sin loop en Python. Con un MarketIndex de dicts el aplanado
+    recorre los dicts en Python, y sin filtro ni top_n (como lo llama
+    _compute) el paso 5 arma todos los FlipResult: ahí empata con el motor en
+    Python (~1x en bench_bm_kernel). analyze_index sí gana, y más sobre un
+    ColumnarIndex.
+
+    taxes = (TAX_NET, TAX_FLIP, TAX_ORDER). El redondeo es el de round():
+    np.rint también redondea al par sobre el mismo float64.
+    """
+    from src.domain.bm_analyzer import FlipResult  # evita import circular
+
+    tax_net, tax_flip, tax_order = taxes
+
+    # ---- 1) aplanado ----
+    if isinstance(index, ColumnarIndex):
+        flat = _flatten_columnar(index, bm_city)
+    else:
+        flat = _flatten_dicts(index, bm_city)
+    if flat is None:
+        return []
+    item_ids, city_names, bm, row_item, row_city, rows_q, sell_max, sell_min = flat
+
+    # ---- 2) escalera BM por item ----
+    n_q = int(max(bm[:, 1].max(), rows_q.max())) + 1
+    n_items = len(item_ids)
+
+    bm_buy_max = bm[:, 2]
+    rev = np.where(bm_buy_max > 0, bm_buy_max, np.maximum(bm[:, 3], 0))
+    src = np.where(bm_buy_max > 0, 0, 1)
+
+    rev_by_q = np.zeros((n_items, n_q), dtype=np.int64)
+    src_by_q = np.zeros((n_items, n_q), dtype=np.int64)
+    rev_by_q[bm[:, 0], bm[:, 1]] = rev
+    src_by_q[bm[:, 0], bm[:, 1]] = src
+
+    best_rev = np.zeros((n_items, n_q), dtype=np.int64)
+    best_q = np.full((n_items, n_q), -1, dtype=np.int64)
+    best_src = np.zeros((n_items, n_q), dtype=np.int64)
+    cur_rev = np.zeros(n_items, dtype=np.int64)
+    cur_q = np.full(n_items, -1, dtype=np.int64)
+    cur_src = np.zeros(n_items, dtype=np.int64)
+    for q in range(n_q):
+        r = rev_by_q[:, q]
+        take = (r > 0) & (r >= cur_rev)  # >=: en empate gana la calidad más alta
+        cur_rev = np.where(take, r, cur_rev)
+        cur_q = np.where(take, q, cur_q)
+        cur_src = np.where(take, src_by_q[:, q], cur_src)
+        best_rev[:, q] = cur_rev
+        best_q[:, q] = cur_q
+        best_src[:, q] = cur_src
+
+    # ---- 3) cuentas por fila ----
+
+    robust_cost = np.where(sell_max > 0, sell_max, np.where(sell_min > 0, sell_min, 0))
+    robust_src = np.where(sell_max > 0, 0, 1)
+    opp_cost = np.where(sell_min > 0, sell_min, np.where(sell_max > 0, sell_max, 0))
+    opp_src = np.where(sell_min > 0, 1, np.where(sell_max > 0, 0, 1))
+
+    revenue = best_rev[row_item, rows_q]
+    bm_q_used = best_q[row_item, rows_q]
+    bm_src = best_src[row_item, rows_q]
+
+    cost = np.where(robust_cost > 0, robust_cost, opp_cost)
+    cost_src = np.where(robust_cost > 0, robust_src, opp_src)
+
+    ok = (
+        ((robust_cost > 0) | (opp_cost > 0))
+        & (bm_q_used >= 0)
+        & (revenue > 0)
+        & (cost > 0)
+        & (revenue - cost > 0)
+    )
+
+    rev_f = revenue.astype(np.float64)
+
+    def net_profit(tax: float):
+        return np.rint(rev_f * (1.0 - tax)).astype(np.int64) - cost
+
+    profit_net = net_profit(tax_net)
+    profit_flip = net_profit(tax_flip)
+    profit_order = net_profit(tax_order)
+
+    robust_profit = np.where(robust_cost > 0, np.rint(rev_f * (1.0 - tax_flip)).astype(np.int64) - robust_cost, -1)
+    is_robust = (robust_src == 0) & (robust_profit > 0)
+
+    # ---- 4) filtro / ranking (opcional) ----
+    # int / int en float64 es la misma división correctamente redondeada que en Python
+    sel = np.flatnonzero(ok)
+    cost_f = cost[sel].astype(np.float64)
+    margin_net = profit_net[sel] / cost_f
+
+    keep = np.ones(len(sel), dtype=bool)
+    if min_profit_net is not None:
+        keep &= profit_net[sel] >= min_profit_net
+    if min_margin_net is not None:
+        keep &= margin_net >= min_margin_net
+    if not keep.all():
+        sel, cost_f, margin_net = sel[keep], cost_f[keep], margin_net[keep]
+
+    if ranked:
+        # lexsort es estable: con las claves negadas da el mismo orden que
+        # sort(key=(is_robust, profit_net, margin_net), reverse=True) en Python
+        order = np.lexsort((-margin_net, -profit_net[sel], -is_robust[sel].astype(np.int64)))
+        if top_n is not None:
+            order = order[:top_n]
+        sel, cost_f, margin_net = sel[order], cost_f[order], margin_net[order]
+
+    # ---- 5) resultados ----
+    # columnas a listas de Python de una vez (indexar arrays escalar por escalar es lento)
+    cols = zip(
+        row_item[sel].tolist(),
+        row_city[sel].tolist(),
+        rows_q[sel].tolist(),
+        bm_q_used[sel].tolist(),
+        cost[sel].tolist(),
+        cost_src[sel].tolist(),
+        revenue[sel].tolist(),
+        bm_src[sel].tolist(),
+        profit_net[sel].tolist(),
+        margin_net.tolist(),
+        profit_flip[sel].tolist(),
+        (profit_flip[sel] / cost_f).tolist(),
+        profit_order[sel].tolist(),
+        (profit_order[sel] / cost_f).tolist(),
+        is_robust[sel].tolist(),
+    )
+    return [
+        FlipResult(
+            item_id=item_ids[i],
+            origin_quality=oq,
+            bm_quality_used=q_used,
+            origin_city=city_names[c],
+
+            origin_price=cost_,
+            origin_price_source=ORIGIN_SOURCES[c_src],
+            bm_price=r,
+            bm_price_source=BM_SOURCES[r_src],
+
+            profit_net=pn,
+            margin_net=mn,
+
+            profit_flip=pf,
+            margin_flip=mf,
+            profit_order=po,
+            margin_order=mo,
+
+            is_robust=robust,
+            region=region,
+        )
+        for i, c, oq, q_used, cost_, c_src, r, r_src, pn, mn, pf, mf, po, mo, robust in cols
+    ]
+
+
+def _flatten_dicts(index: MarketIndex, bm_city: str):
+    """Columnas de filas origen y del BM recorriendo el MarketIndex (solo items con BM)."""
+    item_ids: List[str] = []
+    city_names: List[str] = []
+    city_code: dict = {}
+    bm_rows: List[tuple] = []         # (item_idx, quality, buy_max, buy_min)
+    rows: List[tuple] = []            # (item_idx, city_code, quality, sell_max, sell_min)
+
+    for item_id, city_map in index.items():
+        bm_qmap = city_map.get(bm_city)
+        if not bm_qmap:
+            continue
+        i = len(item_ids)
+        item_ids.append(item_id)
+        for q, quote in bm_qmap.items():
+            bm_rows.append((i, q, quote.buy_max, quote.buy_min))
+        for city, qmap in city_map.items():
+            if city == bm_city:
+                continue
+            c = city_code.get(city)
+            if c is None:
+                c = city_code[city] = len(city_names)
+                city_names.append(city)
+            for q, quote in qmap.items():
+                rows.append((i, c, q, quote.sell_max, quote.sell_min))
+
+    if not rows or not bm_rows:
+        return None
+    r = np.asarray(rows, dtype=np.int64)
+    bm = np.asarray(bm_rows, dtype=np.int64)
+    return item_ids, city_names, bm, r[:, 0], r[:, 1], r[:, 2], r[:, 3], r[:, 4]
+
+
+def _flatten_columnar(index: ColumnarIndex, bm_city: str):
+    """Lo mismo, leyendo las columnas del ColumnarIndex sin armar ningún Quote."""
+    bm_code = index.city_code(bm_city)
+    if bm_code is None or index.n_rows == 0:
+        return None
+
+    def col(a):
+        # mismo typecode en array y numpy: se lee el buffer sin copiar
+        return np.frombuffer(a, dtype=a.typecode).astype(np.int64, copy=False)
+
+    counts = np.diff(col(index.offsets))
+    item = np.repeat(np.arange(len(index.item_ids), dtype=np.int64), counts)
+    city = col(index.city)
+    quality = col(index.quality)
+    sell_min, sell_max, buy_min, buy_max = (col(c) for c in index.prices)
+
+    is_bm = city == bm_code
+    bm = np.stack([item[is_bm], quality[is_bm], buy_max[is_bm], buy_min[is_bm]], axis=1)
+    o = ~is_bm
+    if not o.any() or not len(bm):
+        return None
+    # items sin BM: su escalera queda vacía (best_q = -1) y sus filas no pasan el filtro
+    return index.item_ids, index.cities, bm, item[o], city[o], quality[o], sell_max[o], sell_min[o]
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 import sqlite3
+import threading
+import time
 import requests
 
 from src.domain.bm_analyzer import BMFlippingAnalyzer, FlipResult
 from src.infra.template_repo import TemplateRepository, TemplateSpec
 from src.infra.multi_market_query import MultiMarketQuery, TieredSpec
 from src.infra.market_query import MarketIndex
+from src.infra.price_fetcher import FetchCancelled, make_session
+from src.infra.negative_cache import NegativeCache
+from src.infra.quote_store import QuoteStore
+from src.infra.regions import DEFAULT_REGION, run_per_region
+
+
+def result_key(r: FlipResult) -> Tuple[str, str, int, str]:
+    """
+    Identidad de un resultado para deduplicar: el mismo item, origen y región
+    cuenta una vez aunque llegue desde varias categorías (u objetos distintos).
+    """
+    return (r.item_id, r.origin_city, r.origin_quality, r.region)
 
 
 @dataclass(frozen=True)
@@ -25,25 +39,84 @@ class CategoryRun:
     top_results: List[FlipResult]
 
 
+@dataclass(frozen=True)
+class FetchPlanStats:
+    categories: int
+    item_ids_requested: int     # sumando categorías (con repetidos)
+    item_ids_unique: int        # los que se piden realmente
+    requests_per_category: int  # requests si cada categoría se pidiera por separado
+    requests_planned: int       # requests del plan global deduplicado
+
+    @property
+    def requests_saved(self) -> int:
+        return self.requests_per_category - self.requests_planned
+
+
+@dataclass(frozen=True)
+class CatalogPlan:
+    specs_by_category: Dict[str, List[TemplateSpec]]
+    specs: List[TemplateSpec]   # unión deduplicada (un fetch para todo el catálogo)
+    stats: FetchPlanStats
+    requests_by_category: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CategoryCoverage:
+    category_slug: str
+    status: str                 # "complete" | "partial" | "skipped"
+    items_total: int
+    items_done: int             # items con respuesta (con o sin precios) antes del deadline
+
+
 @dataclass(frozen=True)
 class CatalogReport:
     categories: List[CategoryRun]
     top_global: List[FlipResult]
+    plan: Optional[FetchPlanStats] = None
+    coverage: Optional[List[CategoryCoverage]] = None
+    deadline_hit: bool = False  # True: se cortó por deadline_ms, el reporte es parcial
 
 
 class CatalogBMAnalyzer:
     """
     Escaneo completo:
       - obtiene categorías con templates desde SQLite
-      - por cada categoría:
-          * fetch único (MultiMarketQuery)
-          * analiza cada template (BMFlippingAnalyzer.analyze_index sobre sub-índice)
+      - plan global (plan_catalog): unión deduplicada de templates/items de
+        todas las categorías elegidas
+      - fetch único (MultiMarketQuery), batch por batch
+      - cada batch se analiza apenas llega (BMFlippingAnalyzer.analyze_index
+        sobre los items de cada template) y actualiza los top por template
+      - cada categoría se arma desde los top de sus templates
+
+    Con deadline_ms el scan es "anytime": las categorías se piden en orden de
+    prioridad y al vencerse devuelve el mejor reporte parcial hasta ahí, con
+    qué categorías quedaron completas, parciales o sin tocar.
+
+    Un scan es de una región (servidor); run_regions() corre varias en paralelo.
     """
 
-    def __init__(self, db_path: Path) -> None:
+    # batches en vuelo por fetch (pool de hilos de PriceFetcher)
+    FETCH_CONCURRENCY = 4
+
+    # cada cuánto mira un scan con deadline si lo cancelaron desde afuera
+    CANCEL_POLL_SEC = 0.25
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        quote_ttl_sec: float = QuoteStore.DEFAULT_TTL_SEC,
+        session: Optional[requests.Session] = None,
+        template_repo: Optional[TemplateRepository] = None,
+        quote_store: Optional[QuoteStore] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ) -> None:
+        # Todo es inyectable: la API comparte las mismas instancias (src/api/services.py)
         self.db_path = Path(db_path)
-        self.template_repo = TemplateRepository(self.db_path)
-        self._session = requests.Session()
+        self.template_repo = template_repo or TemplateRepository(self.db_path)
+        self.quote_store = quote_store or QuoteStore(self.db_path, ttl_sec=quote_ttl_sec)
+        self.negative_cache = negative_cache or NegativeCache(self.db_path)
+        self._session = session or make_session(self.FETCH_CONCURRENCY)
 
     def list_categories_with_templates(self) -> List[str]:
         sql = """
@@ -58,9 +131,17 @@ class CatalogBMAnalyzer:
             rows = con.execute(sql).fetchall()
         return [r[0] for r in rows]
 
+    def run_regions(self, regions: Sequence[str], **kwargs) -> Dict[str, CatalogReport]:
+        """
+        run() para cada región a la vez: region -> CatalogReport.
+        Cada región pega a su propio host, con su propio presupuesto de requests.
+        """
+        return run_per_region(regions, lambda r: self.run(region=r, **kwargs))
+
     def run(
         self,
         *,
+        region: str = DEFAULT_REGION,
         category_slugs: Optional[List[str]] = None,
         include_children: bool = False,
         top_n_per_template: int = 25,
@@ -68,74 +149,313 @@ class CatalogBMAnalyzer:
         top_n_global: int = 200,
         min_profit_net: int = 1,
         min_margin_net: float = 0.0,
+        deadline_ms: Optional[int] = None,
+        cancel: Optional[threading.Event] = None,
     ) -> CatalogReport:
+        """
+        deadline_ms: tope de tiempo del scan completo (plan + fetch + análisis).
+        Prioridad: el orden de category_slugs si se pasa; si no, primero las
+        categorías más baratas (menos requests), así entran más completas.
+        cancel: al setearse el scan deja de pedir y sale con FetchCancelled
+        (p.ej. el apagado de la API).
+        """
+        deadline = None if deadline_ms is None else time.monotonic() + deadline_ms / 1000.0
+
         slugs = category_slugs or self.list_categories_with_templates()
+        plan = self.plan_catalog(slugs, include_children=include_children, region=region)
+
+        order = list(plan.specs_by_category)
+        if category_slugs is None:
+            order.sort(key=lambda slug: plan.requests_by_category.get(slug, 0))
+        specs = self._dedupe_specs([s for slug in order for s in plan.specs_by_category[slug]])
+
+        # 1) Fetch único para todo el catálogo (cada item una sola vez), analizando
+        #    cada template una sola vez aunque esté en varias categorías
+        tops, resolved, deadline_hit = self._collect_template_tops(
+            specs,
+            region=region,
+            deadline=deadline,
+            cancel=cancel,
+            top_n_per_template=top_n_per_template,
+            min_profit_net=min_profit_net,
+            min_margin_net=min_margin_net,
+        )
 
+        # 2) Cada categoría se arma desde los top de sus templates
         category_runs: List[CategoryRun] = []
+        coverage: List[CategoryCoverage] = []
         global_results: List[FlipResult] = []
 
+        for slug, cat_specs in plan.specs_by_category.items():
+            cat_run = self._category_run(slug, cat_specs, tops, top_n_per_category)
+            category_runs.append(cat_run)
+            coverage.append(self._category_coverage(slug, cat_specs, resolved))
+            global_results.extend(cat_run.top_results)
+
+        # ranking global (un template en varias categorías aporta una sola vez)
+        global_results = list({result_key(r): r for r in global_results}.values())
+        global_results.sort(key=lambda r: (r.is_robust, r.profit_net, r.margin_net), reverse=True)
+        top_global = global_results[:top_n_global] if top_n_global is not None else global_results
+
+        return CatalogReport(
+            categories=category_runs,
+            top_global=top_global,
+            plan=plan.stats,
+            coverage=coverage,
+            deadline_hit=deadline_hit,
+        )
+
+    def plan_catalog(
+        self,
+        slugs: List[str],
+        *,
+        include_children: bool = False,
+        region: str = DEFAULT_REGION,
+    ) -> CatalogPlan:
+        """
+        Junta los templates de todas las categorías y deduplica: con
+        include_children o templates en varias categorías, el mismo item_id
+        aparece varias veces. Calcula además cuántos requests ahorra el plan
+        global frente a un fetch por categoría (solo planificación, sin red).
+        Los requests se cuentan con los límites de batch configurados, no con
+        el batch_scale AIMD del momento: el mismo catálogo da el mismo plan.
+        """
+        specs_by_category: Dict[str, List[TemplateSpec]] = {}
         for slug in slugs:
-            specs = self.template_repo.list_for_category(slug, include_children=include_children)
-            specs = self._dedupe_specs(specs)
-            if not specs:
-                continue
+            specs = self._dedupe_specs(self.template_repo.list_for_category(slug, include_children=include_children))
+            if specs:
+                specs_by_category[slug] = specs
+
+        union = self._dedupe_specs([s for specs in specs_by_category.values() for s in specs])
 
-            # 1) Fetch único por categoría
-            mq = MultiMarketQuery(
-                specs=[TieredSpec(
-                    template_key=s.template_key,
-                    tier_min=s.tier_min,
-                    tier_max=s.tier_max,
-                    ench_min=s.ench_min,
-                    ench_max=s.ench_max,
-                ) for s in specs],
+        requested = 0
+        requests_by_category: Dict[str, int] = {}
+        for slug, specs in specs_by_category.items():
+            mq = self._query(specs, region)
+            requested += len(mq.build_item_ids())
+            requests_by_category[slug] = mq.plan_request_count(adaptive=False)
+        per_category = sum(requests_by_category.values())
+
+        mq = self._query(union, region)
+        stats = FetchPlanStats(
+            categories=len(specs_by_category),
+            item_ids_requested=requested,
+            item_ids_unique=len(mq.build_item_ids()),
+            requests_per_category=per_category,
+            requests_planned=mq.plan_request_count(adaptive=False) if union else 0,
+        )
+        return CatalogPlan(
+            specs_by_category=specs_by_category,
+            specs=union,
+            stats=stats,
+            requests_by_category=requests_by_category,
+        )
+
+    def iter_category_runs(
+        self,
+        slug: str,
+        *,
+        region: str = DEFAULT_REGION,
+        include_children: bool = False,
+        top_n_per_template: int = 25,
+        top_n_per_category: int = 100,
+        min_profit_net: int = 1,
+        min_margin_net: float = 0.0,
+    ) -> Iterator[CategoryRun]:
+        """
+        Pipeline fetch -> análisis de una categoría: cada batch que llega se
+        analiza mientras los demás siguen en vuelo, y se entrega un CategoryRun
+        parcial con los top por template actualizados. El último es el final
+        (mismo resultado que analizar el índice completo).
+        No entrega nada si la categoría no tiene templates.
+        """
+        specs = self.template_repo.list_for_category(slug, include_children=include_children)
+        specs = self._dedupe_specs(specs)
+        if not specs:
+            return
+
+        for tops in self._iter_template_tops(
+            specs,
+            region=region,
+            top_n_per_template=top_n_per_template,
+            min_profit_net=min_profit_net,
+            min_margin_net=min_margin_net,
+        ):
+            yield self._category_run(slug, specs, tops, top_n_per_category)
+
+    # ---------------- helpers ----------------
+
+    def _query(self, specs: List[TemplateSpec], region: str) -> MultiMarketQuery:
+        return MultiMarketQuery(
+            specs=[self._tiered_spec(s) for s in specs],
+            session=self._session,
+            concurrency=self.FETCH_CONCURRENCY,
+            store=self.quote_store,
+            negative_cache=self.negative_cache,
+            region=region,
+        )
+
+    def _collect_template_tops(
+        self,
+        specs: List[TemplateSpec],
+        *,
+        region: str,
+        deadline: Optional[float],
+        cancel: Optional[threading.Event] = None,
+        **kwargs,
+    ) -> Tuple[Dict[str, List[FlipResult]], Set[str], bool]:
+        """
+        (tops por template, items con respuesta, deadline_hit).
+
+        Sin deadline consume _iter_template_tops hasta el final. Con deadline
+        (time.monotonic) lo consume en un hilo aparte y al vencerse se queda
+        con la última versión completa. El hilo deja de pedir en el acto: el
+        fetch mira el evento de corte antes de cada batch, reintento y espera
+        de backoff (lo que ya llegó queda en cache/store para el próximo scan).
+        """
+        resolved: Set[str] = set()
+        if deadline is None:
+            tops: Dict[str, List[FlipResult]] = {}
+            for tops in self._iter_template_tops(
+                specs, region=region, on_resolved=resolved.update, cancel=cancel, **kwargs
+            ):
+                pass  # nos quedamos con la versión final
+            return tops, resolved, False
+
+        lock = threading.Lock()
+        stop = threading.Event()
+        latest: Dict[str, object] = {"tops": {s.template_key: [] for s in specs}, "resolved": set(), "error": None}
+
+        def consume() -> None:
+            try:
+                for tops in self._iter_template_tops(
+                    specs, region=region, on_resolved=resolved.update, cancel=stop, **kwargs
+                ):
+                    with lock:
+                        latest["tops"] = {k: list(v) for k, v in tops.items()}
+                        latest["resolved"] = set(resolved)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                latest["error"] = e
+
+        worker = threading.Thread(target=consume, name=f"catalog-scan-{region}", daemon=True)
+        worker.start()
+        while worker.is_alive():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                break
+            # con cancel externo despertamos seguido para mirarlo
+            worker.join(remaining if cancel is None else min(remaining, self.CANCEL_POLL_SEC))
+        # antes de stop.set(): al cortarlo, el hilo puede salir (con FetchCancelled) antes de mirarlo
+        deadline_hit = worker.is_alive()
+        stop.set()
+        if cancel is not None and cancel.is_set():
+            raise FetchCancelled()
+
+        with lock:
+            if not deadline_hit and latest["error"] is not None:
+                raise latest["error"]  # terminó a tiempo pero falló: igual que sin deadline
+            return latest["tops"], latest["resolved"], deadline_hit
+
+    def _iter_template_tops(
+        self,
+        specs: List[TemplateSpec],
+        *,
+        region: str,
+        top_n_per_template: int,
+        min_profit_net: int,
+        min_margin_net: float,
+        on_resolved: Optional[Callable[[List[str]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Iterator[Dict[str, List[FlipResult]]]:
+        """
+        Descarga los items de specs batch por batch y analiza cada uno apenas
+        llega. Entrega template_key -> top actual después de cada batch
+        (al menos una vez, aunque no llegue nada).
+        """
+        analyzers: Dict[str, BMFlippingAnalyzer] = {}
+        owner: Dict[str, str] = {}  # item_id -> template_key
+        for s in specs:
+            analyzers[s.template_key] = BMFlippingAnalyzer(
+                base_item=s.template_key,
+                tier_min=s.tier_min,
+                tier_max=s.tier_max,
+                ench_min=s.ench_min,
+                ench_max=s.ench_max,
+                region=region,
                 session=self._session,
             )
-            full_index = mq.fetch_index()
+            for item_id in self._build_item_ids_for_spec(s):
+                owner[item_id] = s.template_key
 
-            # 2) Analiza cada template filtrando sub-índice
-            template_runs: List[TemplateRun] = []
-            cat_all: List[FlipResult] = []
+        tops: Dict[str, List[FlipResult]] = {s.template_key: [] for s in specs}
+        emitted = False
 
-            for s in specs:
-                sub_index = self._subindex_for_spec(full_index, s)
+        for part in self._query(specs, region).iter_index(on_resolved=on_resolved, cancel=cancel):
+            by_template: Dict[str, MarketIndex] = {}
+            for item_id, city_map in part.items():
+                key = owner.get(item_id)
+                if key is not None:
+                    by_template.setdefault(key, {})[item_id] = city_map
 
-                analyzer = BMFlippingAnalyzer(
-                    base_item=s.template_key,
-                    tier_min=s.tier_min,
-                    tier_max=s.tier_max,
-                    ench_min=s.ench_min,
-                    ench_max=s.ench_max,
-                )
-                results = analyzer.analyze_index(
+            for key, sub_index in by_template.items():
+                results = analyzers[key].analyze_index(
                     sub_index,
                     min_profit_net=min_profit_net,
                     min_margin_net=min_margin_net,
                     top_n=top_n_per_template,
                 )
+                if results:
+                    tops[key] = self._merge_top(tops[key], results, top_n_per_template)
 
-                template_runs.append(TemplateRun(template_key=s.template_key, results=results))
-                cat_all.extend(results)
+            emitted = True
+            yield tops
 
-            # ranking categoría
-            cat_all.sort(key=lambda r: (r.is_robust, r.profit_net, r.margin_net), reverse=True)
-            top_cat = cat_all[:top_n_per_category] if top_n_per_category is not None else cat_all
+        if not emitted:
+            # nada en cache ni en el upstream
+            yield tops
 
-            category_runs.append(CategoryRun(
-                category_slug=slug,
-                templates=template_runs,
-                top_results=top_cat,
-            ))
+    @staticmethod
+    def _merge_top(current: List[FlipResult], new: List[FlipResult], top_n: Optional[int]) -> List[FlipResult]:
+        # top_n de (A ∪ B) == top_n de (top_n de A ∪ B): alcanza con guardar el top parcial
+        merged = current + new
+        merged.sort(key=lambda r: (r.is_robust, r.profit_net, r.margin_net), reverse=True)
+        return merged[:top_n] if top_n is not None else merged
 
-            global_results.extend(top_cat)
+    @staticmethod
+    def _category_run(
+        slug: str,
+        specs: List[TemplateSpec],
+        tops: Dict[str, List[FlipResult]],
+        top_n_per_category: Optional[int],
+    ) -> CategoryRun:
+        template_runs = [TemplateRun(template_key=s.template_key, results=list(tops[s.template_key])) for s in specs]
 
-        # ranking global
-        global_results.sort(key=lambda r: (r.is_robust, r.profit_net, r.margin_net), reverse=True)
-        top_global = global_results[:top_n_global] if top_n_global is not None else global_results
+        # ranking categoría
+        cat_all = [r for t in template_runs for r in t.results]
+        cat_all.sort(key=lambda r: (r.is_robust, r.profit_net, r.margin_net), reverse=True)
+        top_cat = cat_all[:top_n_per_category] if top_n_per_category is not None else cat_all
 
-        return CatalogReport(categories=category_runs, top_global=top_global)
+        return CategoryRun(category_slug=slug, templates=template_runs, top_results=top_cat)
 
-    # ---------------- helpers ----------------
+    def _category_coverage(self, slug: str, specs: List[TemplateSpec], resolved: Set[str]) -> CategoryCoverage:
+        wanted: Set[str] = set()
+        for s in specs:
+            wanted |= self._build_item_ids_for_spec(s)
+        done = len(wanted & resolved)
+        if done >= len(wanted):
+            status = "complete"
+        elif done == 0:
+            status = "skipped"
+        else:
+            status = "partial"
+        return CategoryCoverage(category_slug=slug, status=status, items_total=len(wanted), items_done=done)
+
+    @staticmethod
+    def _tiered_spec(s: TemplateSpec) -> TieredSpec:
+        # calidades/ciudades del template bajan al plan de fetch (agrupado por conjunto)
+        return TieredSpec.from_template(s, cities=BMFlippingAnalyzer.cities_with_bm(s.cities))
 
     @staticmethod
     def _dedupe_specs(specs: List[TemplateSpec]) -> List[TemplateSpec]:
@@ -158,7 +478,3 @@ class CatalogBMAnalyzer:
             for e in range(int(s.ench_min), int(s.ench_max) + 1):
                 ids.add(core if e == 0 else f"{core}@{e}")
         return ids
-
-    def _subindex_for_spec(self, full_index: MarketIndex, s: TemplateSpec) -> MarketIndex:
-        wanted = self._build_item_ids_for_spec(s)
-        return {item_id: full_index[item_id] for item_id in wanted if item_id in full_index}
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from src.domain.bm_analyzer import FlipResult
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer, CatalogReport, CategoryRun, TemplateRun, result_key
+from src.infra.regions import DEFAULT_REGION, normalize_region
+from src.infra.scan_queue import ScanJob, ScanProgress, ScanQueue
+
+log = logging.getLogger(__name__)
+
+# parámetros de CatalogBMAnalyzer.run que viajan en el job (top_n_global lo usa el coordinador)
+SCAN_PARAMS: Dict[str, Any] = dict(
+    include_children=False,
+    top_n_per_template=25,
+    top_n_per_category=100,
+    top_n_global=200,
+    min_profit_net=1,
+    min_margin_net=0.0,
+)
+
+
+def category_run_to_json(run: CategoryRun) -> str:
+    return json.dumps(asdict(run), separators=(",", ":"))
+
+
+def category_run_from_json(raw: str) -> CategoryRun:
+    d = json.loads(raw)
+    return CategoryRun(
+        category_slug=d["category_slug"],
+        templates=[
+            TemplateRun(template_key=t["template_key"], results=[FlipResult(**r) for r in t["results"]])
+            for t in d["templates"]
+        ],
+        top_results=[FlipResult(**r) for r in d["top_results"]],
+    )
+
+
+class CatalogScanCoordinator:
+    """
+    Reparte un scan de catálogo en la ScanQueue (un shard por categoría) y
+    después junta los CategoryRun que dejaron los workers en un CatalogReport.
+
+    El ranking global sale de los top por categoría, igual que en
+    CatalogBMAnalyzer.run(); un template en varias categorías aporta una sola vez.
+    """
+
+    def __init__(self, catalog: CatalogBMAnalyzer, queue: ScanQueue) -> None:
+        self.catalog = catalog
+        self.queue = queue
+
+    def submit(
+        self,
+        *,
+        region: str = DEFAULT_REGION,
+        category_slugs: Optional[List[str]] = None,
+        **params: Any,
+    ) -> str:
+        unknown = set(params) - set(SCAN_PARAMS)
+        if unknown:
+            raise ValueError(f"parámetros desconocidos: {sorted(unknown)}")
+
+        slugs = category_slugs or self.catalog.list_categories_with_templates()
+        return self.queue.create(
+            region=normalize_region(region),
+            shards=slugs,
+            params=dict(SCAN_PARAMS, **params),
+        )
+
+    def wait(
+        self,
+        scan_id: str,
+        *,
+        poll_sec: float = 1.0,
+        timeout: Optional[float] = None,
+        on_progress=None,
+    ) -> ScanProgress:
+        """Espera a que no queden shards pendientes ni tomados (o al timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            p = self.queue.progress(scan_id)
+            if on_progress is not None:
+                on_progress(p)
+            if p.finished or (deadline is not None and time.monotonic() >= deadline):
+                return p
+            time.sleep(poll_sec)
+
+    def merge(self, scan_id: str) -> CatalogReport:
+        """CatalogReport con los shards terminados hasta ahora (los que faltan no aparecen)."""
+        job = self._job(scan_id)
+        top_n_global = job.params.get("top_n_global")
+
+        category_runs = [category_run_from_json(raw) for raw in self.queue.results(scan_id).values()]
+
+        # mismo template en varias categorías -> mismo resultado (misma clave que CatalogBMAnalyzer.run)
+        global_results = list({result_key(r): r for c in category_runs for r in c.top_results}.values())
+        global_results.sort(key=lambda r: (r.is_robust, r.profit_net, r.margin_net), reverse=True)
+        top_global = global_results[:top_n_global] if top_n_global is not None else global_results
+
+        return CatalogReport(categories=category_runs, top_global=top_global)
+
+    def _job(self, scan_id: str) -> ScanJob:
+        job = self.queue.job(scan_id)
+        if job is None:
+            raise KeyError(f"scan inexistente: {scan_id}")
+        return job
+
+
+class CatalogScanWorker:
+    """
+    Toma categorías de la ScanQueue hasta que no quede ninguna, las analiza
+    con CatalogBMAnalyzer.iter_category_runs y deja el CategoryRun final.
+
+    Entre batch y batch renueva el lease, así una categoría grande no se le
+    vence a mitad de camino; si el lease ya se perdió (lo tomó otro worker),
+    abandona el shard sin escribir resultado. Varios workers (procesos o máquinas con el mismo
+    archivo) comparten además el QuoteStore: lo que baja uno, el otro lo lee.
+    """
+
+    def __init__(
+        self,
+        catalog: CatalogBMAnalyzer,
+        queue: ScanQueue,
+        *,
+        worker_id: Optional[str] = None,
+        lease_sec: float = ScanQueue.DEFAULT_LEASE_SEC,
+    ) -> None:
+        self.catalog = catalog
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_sec = float(lease_sec)
+
+    def run(self, scan_id: str) -> int:
+        """Procesa shards hasta vaciar la cola. Devuelve cuántos terminó este worker."""
+        job = self.queue.job(scan_id)
+        if job is None:
+            raise KeyError(f"scan inexistente: {scan_id}")
+
+        params = {k: v for k, v in job.params.items() if k != "top_n_global"}
+        done = 0
+        while True:
+            task = self.queue.lease(scan_id, self.worker_id, lease_sec=self.lease_sec)
+            if task is None:
+                return done
+
+            try:
+                last: Optional[CategoryRun] = None
+                lost = False
+                for last in self.catalog.iter_category_runs(task.shard, region=job.region, **params):
+                    if not self.queue.heartbeat(task, self.worker_id, lease_sec=self.lease_sec):
+                        lost = True  # el lease venció y el shard ya es de otro: no seguimos gastando cuota
+                        break
+                if lost:
+                    log.warning("shard %s de %s: lease perdido, se abandona", task.shard, scan_id)
+                    continue
+                if last is None:
+                    # categoría sin templates: igual se marca hecha
+                    last = CategoryRun(category_slug=task.shard, templates=[], top_results=[])
+            except Exception as e:
+                log.exception("shard %s de %s falló (intento %d)", task.shard, scan_id, task.attempts)
+                self.queue.fail(task, f"{type(e).__name__}: {e}")
+                continue
+
+            if self.queue.complete(task, category_run_to_json(last)):
+                done += 1
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer, CatalogReport
+from src.infra.price_fetcher import FetchCancelled
+from src.infra.regions import DEFAULT_REGION, normalize_region
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int             # 1, 2, 3... (sube con cada refresh exitoso)
+    region: str
+    report: CatalogReport
+    built_at: float          # epoch en que terminó el scan
+    build_sec: float         # cuánto tardó el scan
+
+    def age_sec(self, now: Optional[float] = None) -> float:
+        return max(0.0, (time.time() if now is None else now) - self.built_at)
+
+
+@dataclass(frozen=True)
+class SnapshotStatus:
+    snapshot: Optional[CatalogSnapshot]
+    stale: bool              # más viejo que max_age_sec (igual se sirve)
+    refreshing: bool         # hay un scan en curso
+    last_error: Optional[str] = None
+
+
+@dataclass
+class _State:
+    current: Optional[CatalogSnapshot] = None
+    refreshing: bool = False
+    last_error: Optional[str] = None
+    failed_at: float = 0.0   # monotonic del último refresh fallido
+    version: int = 0
+
+
+class CatalogSnapshotRefresher:
+    """
+    Mantiene en memoria un CatalogReport inmutable y versionado de una región,
+    y lo reemplaza de una (swap atómico de la referencia) cuando hay uno nuevo.
+
+    Stale-while-revalidate:
+      - get() responde siempre con el snapshot actual, sin esperar red
+      - si está vencido (> max_age_sec), dispara un refresh en background
+        (nunca dos a la vez) y mientras tanto sigue sirviendo el viejo
+      - start() (opcional) agrega un hilo que refresca solo al vencerse,
+        aunque nadie pida; sin start() solo se escanea cuando alguien pide
+
+    Si un refresh falla, el snapshot anterior sigue vigente (queda last_error).
+    stop() corta el hilo periódico y el scan en curso (deja de pedir al upstream).
+    """
+
+    DEFAULT_MAX_AGE_SEC = 300
+
+    # tras un refresh fallido, get() no reintenta antes de esto (no martillar al upstream caído)
+    ERROR_RETRY_SEC = 30
+
+    # parámetros del scan de fondo: amplios, los endpoints filtran encima
+    DEFAULT_RUN_KWARGS: Dict[str, Any] = dict(
+        top_n_per_template=25,
+        top_n_per_category=100,
+        top_n_global=500,
+        min_profit_net=1,
+        min_margin_net=0.0,
+    )
+
+    def __init__(
+        self,
+        catalog: CatalogBMAnalyzer,
+        *,
+        region: str = DEFAULT_REGION,
+        max_age_sec: float = DEFAULT_MAX_AGE_SEC,
+        run_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.catalog = catalog
+        self.region = normalize_region(region)
+        self.max_age_sec = float(max_age_sec)
+        self.run_kwargs = dict(self.DEFAULT_RUN_KWARGS, **(run_kwargs or {}))
+
+        self._state = _State()
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._loop: Optional[threading.Thread] = None
+        self._worker: Optional[threading.Thread] = None
+
+    # ---------------- Public ----------------
+
+    def get(self, *, now: Optional[float] = None) -> SnapshotStatus:
+        """Snapshot actual (o None si todavía no hay); si está vencido dispara un refresh."""
+        with self._lock:
+            st = self._state
+            snap = st.current
+            stale = snap is None or snap.age_sec(now) > self.max_age_sec
+            cooling_down = st.last_error is not None and time.monotonic() - st.failed_at < self.ERROR_RETRY_SEC
+            if stale and not st.refreshing and not cooling_down and not self._stop.is_set():
+                self._spawn_refresh_locked()
+            return SnapshotStatus(snapshot=snap, stale=stale, refreshing=st.refreshing, last_error=st.last_error)
+
+    def refresh(self, *, wait: bool = True, timeout: Optional[float] = None) -> Optional[CatalogSnapshot]:
+        """Fuerza un refresh (o se suma al que está en curso). wait=True espera a que termine."""
+        with self._lock:
+            if not self._state.refreshing and not self._stop.is_set():
+                self._spawn_refresh_locked()
+            if wait:
+                self._done.wait_for(lambda: not self._state.refreshing, timeout=timeout)
+            return self._state.current
+
+    def start(self) -> None:
+        """Hilo de fondo: refresca cada vez que el snapshot se vence (y uno inicial)."""
+        if self._loop is not None:
+            return
+        self._stop.clear()
+        self._loop = threading.Thread(target=self._run_loop, name=f"snapshot-{self.region}", daemon=True)
+        self._loop.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Corta el hilo periódico y el scan en curso (si hay) y los espera hasta `timeout`."""
+        self._stop.set()
+        for thread in (self._loop, self._worker):
+            if thread is not None:
+                thread.join(timeout=timeout)
+        self._loop = None
+
+    # ---------------- internal ----------------
+
+    def _run_loop(self) -> None:
+        while not self._stop.is_set():
+            status = self.get()
+            snap = status.snapshot
+            if snap is None or status.refreshing:
+                wait = 1.0
+            else:
+                wait = max(1.0, self.max_age_sec - snap.age_sec())
+            self._stop.wait(wait)
+
+    def _spawn_refresh_locked(self) -> None:
+        self._state.refreshing = True
+        self._worker = threading.Thread(target=self._refresh, name=f"snapshot-refresh-{self.region}", daemon=True)
+        self._worker.start()
+
+    def _refresh(self) -> None:
+        t0 = time.monotonic()
+        report: Optional[CatalogReport] = None
+        error: Optional[str] = None
+        try:
+            report = self.catalog.run(region=self.region, cancel=self._stop, **self.run_kwargs)
+        except FetchCancelled:
+            pass  # apagado: ni snapshot nuevo ni error
+        except Exception as e:  # el snapshot anterior sigue sirviendo
+            log.exception("refresh del snapshot (%s) falló", self.region)
+            error = f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            st = self._state
+            if report is not None:
+                st.version += 1
+                st.current = CatalogSnapshot(
+                    version=st.version,
+                    region=self.region,
+                    report=report,
+                    built_at=time.time(),
+                    build_sec=time.monotonic() - t0,
+                )
+            st.last_error = error
+            if error is not None:
+                st.failed_at = time.monotonic()
+            st.refreshing = False
+            self._done.notify_all()
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import List, Optional
 import requests
 
 from src.domain.bm_analyzer import BMFlippingAnalyzer, FlipResult
+from src.infra.multi_market_query import MultiMarketQuery, TieredSpec
+from src.infra.negative_cache import NegativeCache
+from src.infra.price_fetcher import make_session
+from src.infra.quote_store import QuoteStore
+from src.infra.regions import DEFAULT_REGION
 from src.infra.template_repo import TemplateRepository, TemplateSpec
 
 
@@ -25,36 +30,70 @@ class CategoryAnalysis:
 class CategoryBMAnalyzer:
     """
     Orquesta análisis BM por categoría:
-      category_slug -> templates -> BMFlippingAnalyzer por template_key
+      category_slug -> templates -> un fetch batcheado para toda la categoría
+      -> BMFlippingAnalyzer.analyze_index por template_key (sobre su sub-índice)
     """
 
-    def __init__(self, db_path: Path) -> None:
+    # batches en vuelo (pool de hilos de PriceFetcher)
+    FETCH_CONCURRENCY = 4
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        quote_ttl_sec: float = QuoteStore.DEFAULT_TTL_SEC,
+        session: Optional[requests.Session] = None,
+        template_repo: Optional[TemplateRepository] = None,
+        quote_store: Optional[QuoteStore] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ) -> None:
         self.db_path = Path(db_path)
-        self.template_repo = TemplateRepository(self.db_path)
+        self.template_repo = template_repo or TemplateRepository(self.db_path)
+        self.quote_store = quote_store or QuoteStore(self.db_path, ttl_sec=quote_ttl_sec)
+        self.negative_cache = negative_cache or NegativeCache(self.db_path)
 
-        # Sesión compartida (mejor rendimiento y menos overhead TCP)
-        self._session = requests.Session()
+        # Sesión compartida (keep-alive) por el fetch y los analyzers
+        self._session = session or make_session(self.FETCH_CONCURRENCY)
 
     def run(
         self,
         category_slug: str,
         *,
+        region: str = DEFAULT_REGION,
         include_children: bool = False,
         top_n_per_template: int = 25,
         top_n_total: Optional[int] = 100,
         min_profit_net: int = 1,
         min_margin_net: float = 0.0,
+        sourcing: str = "same_quality",
     ) -> CategoryAnalysis:
+        """sourcing: ver bm_analyzer.SOURCING_MODES."""
         specs = self.template_repo.list_for_category(category_slug, include_children=include_children)
         if not specs:
             return CategoryAnalysis(category_slug=category_slug, groups=[], all_results=[])
 
+        # 1) Un solo fetch para todos los templates (batches por bytes de URL)
+        mq = MultiMarketQuery(
+            specs=[TieredSpec.from_template(s, cities=BMFlippingAnalyzer.cities_with_bm(s.cities)) for s in specs],
+            session=self._session,
+            concurrency=self.FETCH_CONCURRENCY,
+            store=self.quote_store,
+            negative_cache=self.negative_cache,
+            region=region,
+        )
+        full_index = mq.fetch_index()
+
+        # 2) Cada template se analiza sobre sus items
         groups: List[TemplateGroupResult] = []
         all_results: List[FlipResult] = []
 
         for spec in specs:
-            analyzer = self._make_bm_analyzer(spec)
-            results = analyzer.run(
+            analyzer = self._make_bm_analyzer(spec, region=region, sourcing=sourcing)
+            wanted = analyzer.q.build_item_ids()
+            sub_index = {item_id: full_index[item_id] for item_id in wanted if item_id in full_index}
+
+            results = analyzer.analyze_index(
+                sub_index,
                 min_profit_net=min_profit_net,
                 min_margin_net=min_margin_net,
                 top_n=top_n_per_template,
@@ -74,12 +113,17 @@ class CategoryBMAnalyzer:
             all_results=all_results,
         )
 
-    def _make_bm_analyzer(self, spec: TemplateSpec) -> BMFlippingAnalyzer:
+    def _make_bm_analyzer(
+        self,
+        spec: TemplateSpec,
+        *,
+        region: str = DEFAULT_REGION,
+        sourcing: str = "same_quality",
+    ) -> BMFlippingAnalyzer:
         """
-        Crea el BMFlippingAnalyzer por template.
-        Nota: si quieres reutilizar la misma requests.Session dentro de FastMarketQuery,
-        podemos extender FastMarketQuery/BMFlippingAnalyzer para aceptar session.
-        Por ahora funciona igual sin eso; solo es una optimización.
+        BMFlippingAnalyzer del template, sobre la sesión compartida.
+        Con run() solo se usa para analizar (el fetch es el de la categoría);
+        su run() propio también serviría, con el store y la cache negativa.
         """
         return BMFlippingAnalyzer(
             base_item=spec.template_key,
@@ -87,4 +131,11 @@ class CategoryBMAnalyzer:
             tier_max=spec.tier_max,
             ench_min=spec.ench_min,
             ench_max=spec.ench_max,
+            store=self.quote_store,
+            negative_cache=self.negative_cache,
+            qualities=list(spec.qualities),
+            cities=list(spec.cities) if spec.cities else None,
+            region=region,
+            session=self._session,
+            sourcing=sourcing,
         )
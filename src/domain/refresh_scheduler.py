@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from src.domain.bm_analyzer import FlipResult
+from src.infra.market_types import MarketIndex, Quote
+from src.infra.price_fetcher import PriceFetcher
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ItemState:
+    refreshed_at: float = 0.0    # epoch del último refresh (0 = nunca)
+    value: float = 0.0           # EWMA del mejor profit_net visto (0 si no hubo oportunidad)
+    volatility: float = 0.0      # EWMA del cambio relativo de precios entre refreshes
+    refreshes: int = 0
+
+
+@dataclass(frozen=True)
+class TickReport:
+    requests: int
+    item_ids: List[str]
+    results: List[FlipResult]
+
+
+class RefreshScheduler:
+    """
+    Refresca un MarketIndex vivo gastando un presupuesto fijo de requests/min
+    en los items que más valen la pena:
+
+      prioridad = peso * edad
+      peso      = 1 + value_weight * log1p(value / value_scale)
+                    + volatility_weight * volatility
+
+    Un item muerto (sin oportunidades, precios quietos) tiene peso 1 y solo
+    sube por edad; uno con profit alto o precios que se mueven envejece
+    varias veces más rápido y se refresca mucho más seguido. Los que nunca
+    se pidieron van primero.
+
+    Cada tick arma batches por bytes de URL con los items ordenados por
+    prioridad (plan_chunks conserva el orden) y pide solo los primeros N que
+    entran en el presupuesto acumulado; el presupuesto se cobra solo si la
+    descarga sale bien, por requests realmente enviados (un batch que el
+    upstream rechaza por tamaño y se parte cuesta más de uno). Las respuestas se guardan en la cache/store del
+    fetcher para el resto del proceso y producen un `index` nuevo que
+    reemplaza al anterior de una (swap de la referencia): quien lee
+    `scheduler.index` desde otro hilo (p.ej. BMFlippingAnalyzer.analyze_index)
+    obtiene un MarketIndex que nadie modifica mientras lo recorre.
+    """
+
+    def __init__(
+        self,
+        fetcher: PriceFetcher,
+        item_ids: Sequence[str],
+        *,
+        requests_per_min: float = 30,
+        analyze: Optional[Callable[[MarketIndex], Iterable[FlipResult]]] = None,
+        value_scale: float = 10_000,
+        value_weight: float = 3.0,
+        volatility_weight: float = 20.0,
+        alpha: float = 0.3,
+        index: Optional[MarketIndex] = None,
+    ) -> None:
+        self.fetcher = fetcher
+        self.requests_per_min = float(requests_per_min)
+        self.analyze = analyze
+        self.value_scale = float(value_scale)
+        self.value_weight = float(value_weight)
+        self.volatility_weight = float(volatility_weight)
+        self.alpha = float(alpha)
+        self.index: MarketIndex = index if index is not None else {}
+
+        self.items: Dict[str, ItemState] = {x: ItemState() for x in dict.fromkeys(item_ids)}
+        self._burst = max(1.0, self.requests_per_min / 6)  # hasta ~10 s de presupuesto acumulado
+        self._tokens = 1.0
+        self._last_tick: Optional[float] = None
+
+    # ---------------- Public ----------------
+
+    def priority(self, item_id: str, now: Optional[float] = None) -> float:
+        st = self.items[item_id]
+        if st.refreshed_at <= 0:
+            return math.inf
+        now = time.time() if now is None else now
+        weight = (
+            1.0
+            + self.value_weight * math.log1p(max(st.value, 0.0) / self.value_scale)
+            + self.volatility_weight * st.volatility
+        )
+        return weight * max(0.0, now - st.refreshed_at)
+
+    def tick(self, *, now: Optional[float] = None) -> TickReport:
+        """Gasta el presupuesto acumulado desde el último tick en los batches más prioritarios."""
+        now = time.time() if now is None else now
+        if self._last_tick is not None:
+            self._tokens = min(self._burst, self._tokens + (now - self._last_tick) * self.requests_per_min / 60.0)
+        self._last_tick = now
+
+        n = int(self._tokens)
+        if n < 1 or not self.items:
+            return TickReport(requests=0, item_ids=[], results=[])
+
+        ranked = sorted(self.items, key=lambda x: self.priority(x, now), reverse=True)
+        chunks = self.fetcher.plan_chunks(ranked)[:n]
+
+        ids = [x for chunk in chunks for x in chunk]
+        sent = itertools.count()
+        # directo al upstream: es un refresh. Se cobra lo que salió de verdad
+        # (reintentos y batches partidos por 413/414 incluidos)
+        fresh = self.fetcher.fetch_index(chunks, on_request=lambda: next(sent))
+        requests_sent = next(sent)
+        self._tokens -= requests_sent
+        self._apply(ids, fresh, now)
+
+        results: List[FlipResult] = []
+        if self.analyze is not None:
+            results = list(self.analyze({x: fresh[x] for x in ids if x in fresh}))
+            self.observe_results(results, item_ids=ids)
+
+        return TickReport(requests=requests_sent, item_ids=ids, results=results)
+
+    def observe_results(self, results: Iterable[FlipResult], *, item_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Actualiza el valor (EWMA del mejor profit_net) con un análisis.
+        item_ids: items analizados; los que no dieron resultado cuentan como 0.
+        """
+        best: Dict[str, float] = {}
+        for r in results:
+            if r.profit_net > best.get(r.item_id, 0):
+                best[r.item_id] = float(r.profit_net)
+
+        for item_id in set(item_ids or ()) | set(best):
+            st = self.items.get(item_id)
+            if st is not None:
+                st.value = self.alpha * best.get(item_id, 0.0) + (1 - self.alpha) * st.value
+
+    def run(
+        self,
+        stop: threading.Event,
+        *,
+        tick_sec: float = 5.0,
+        on_tick: Optional[Callable[[TickReport], None]] = None,
+    ) -> None:
+        """
+        Loop de fondo: un tick cada tick_sec hasta que se setee `stop`.
+        Un tick que falla (upstream caído, HTTPError...) se loguea y el loop sigue.
+        """
+        while not stop.is_set():
+            try:
+                report = self.tick()
+                if on_tick is not None and report.requests:
+                    on_tick(report)
+            except Exception:
+                log.exception("tick del refresh scheduler falló")
+            stop.wait(tick_sec)
+
+    # ---------------- internal ----------------
+
+    def _apply(self, ids: List[str], fresh: MarketIndex, now: float) -> None:
+        f = self.fetcher
+        index = dict(self.index)
+        for item_id in ids:
+            old = index.get(item_id)
+            new = fresh.get(item_id)
+
+            st = self.items[item_id]
+            if old is not None and new is not None:
+                change = self._relative_change(old, new)
+                if change is not None:
+                    st.volatility = self.alpha * change + (1 - self.alpha) * st.volatility
+            st.refreshed_at = now
+            st.refreshes += 1
+
+            if new is None:
+                index.pop(item_id, None)  # ya no cotiza
+            else:
+                index[item_id] = new
+        self.index = index
+
+        f.cache.save(fresh, ids, f.cities, f.qualities)
+        if f.store is not None:
+            f.store.save(fresh, ids, f.cities, f.qualities, region=f.region)
+
+    @staticmethod
+    def _relative_change(old: Dict[str, Dict[int, Quote]], new: Dict[str, Dict[int, Quote]]) -> Optional[float]:
+        """Cambio relativo medio de sell_min/buy_max en los (ciudad, calidad) presentes en ambos."""
+        total, n = 0.0, 0
+        for city, qmap in new.items():
+            old_qmap = old.get(city)
+            if not old_qmap:
+                continue
+            for quality, q in qmap.items():
+                o = old_qmap.get(quality)
+                if o is None:
+                    continue
+                for a, b in ((o.sell_min, q.sell_min), (o.buy_max, q.buy_max)):
+                    if a > 0 and b > 0:
+                        total += abs(b - a) / a
+                        n += 1
+        return (total / n) if n else None
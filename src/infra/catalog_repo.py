@@ -17,7 +17,7 @@ class TemplateRow:
     qualities_csv: str       # "1,2,3,4,5"
 
 
-def _parse_qualities(csv: str) -> List[int]:
+def parse_qualities(csv: str) -> List[int]:
     parts = [p.strip() for p in (csv or "").split(",") if p.strip()]
     out: List[int] = []
     for p in parts:
@@ -153,5 +153,5 @@ class CatalogRepository:
         templates = self.get_templates_by_category_slug(slug, include_children=include_children)
         qs: Set[int] = set()
         for t in templates:
-            qs.update(_parse_qualities(t.qualities_csv))
+            qs.update(parse_qualities(t.qualities_csv))
         return sorted(qs)
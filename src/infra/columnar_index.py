@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from src.infra.market_types import MarketIndex, Quote
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+# fecha vacía ("") en las columnas de fechas
+DATE_EMPTY = -(1 << 63)
+
+PRICE_FIELDS = ("sell_min", "sell_max", "buy_min", "buy_max")
+DATE_FIELDS = ("sell_min_date", "sell_max_date", "buy_min_date", "buy_max_date")
+
+
+class ColumnarIndex(Mapping[str, Mapping[str, Mapping[int, Quote]]]):
+    """
+    MarketIndex compacto: una fila por (item, ciudad, calidad) en columnas
+    tipadas (array) en vez de dict -> dict -> dict -> Quote.
+
+      - item_ids y ciudades internados (tablas chicas + códigos enteros)
+      - precios en int64, fechas como epoch en segundos (int64)
+      - filas contiguas por item y, dentro del item, por ciudad, en el orden
+        en que llegaron (el mismo recorrido que un MarketIndex armado con
+        merge_decoded_rows)
+
+    Se usa como un MarketIndex de solo lectura: index[item][city][quality]
+    arma el Quote en el momento, así que analyze_index y el resto funcionan
+    igual. El motor numpy (src/domain/bm_kernel.py) lee las columnas directo;
+    el motor en Python puro también funciona, pero recorrer las vistas es más
+    lento que recorrer dicts.
+
+    Las fechas van y vuelven exactas si tienen la forma del API
+    ("2024-01-01T00:00:00"); cualquier otra se guarda aparte tal cual.
+    """
+
+    def __init__(
+        self,
+        item_ids: List[str],
+        offsets: array,
+        cities: List[str],
+        city: array,
+        quality: array,
+        prices: Tuple[array, array, array, array],
+        dates: Tuple[array, array, array, array],
+        odd_dates: Optional[Dict[Tuple[int, int], str]] = None,
+    ) -> None:
+        # usar from_market_index / from_rows
+        self.item_ids = item_ids
+        self.offsets = offsets          # filas del item i: [offsets[i], offsets[i+1])
+        self.cities = cities
+        self.city = city                # código de ciudad por fila
+        self.quality = quality
+        self.prices = prices            # sell_min, sell_max, buy_min, buy_max
+        self.dates = dates
+        self._odd_dates = odd_dates or {}
+        self._item_pos = {x: i for i, x in enumerate(item_ids)}
+        self._city_code = {c: i for i, c in enumerate(cities)}
+
+    # ---------------- construcción ----------------
+
+    @classmethod
+    def from_market_index(cls, index: MarketIndex) -> "ColumnarIndex":
+        return cls.from_rows(
+            (item_id, city, quality, quote)
+            for item_id, city_map in index.items()
+            for city, qmap in city_map.items()
+            for quality, quote in qmap.items()
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, int, Quote]]) -> "ColumnarIndex":
+        """
+        Desde filas (item_id, city, quality, Quote), p.ej. las del decoder en
+        streaming, sin pasar por el MarketIndex de dicts. Igual que
+        merge_decoded_rows: una fila repetida pisa a la anterior en su lugar.
+        """
+        b = _Builder()
+        for item_id, city, quality, quote in rows:
+            b.add(item_id, city, quality, quote)
+        return b.build()
+
+    # ---------------- Mapping ----------------
+
+    def __getitem__(self, item_id: str) -> "_ItemView":
+        i = self._item_pos[item_id]
+        return _ItemView(self, self.offsets[i], self.offsets[i + 1])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.item_ids)
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._item_pos
+
+    # ---------------- columnas ----------------
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.city)
+
+    def city_code(self, city: str) -> Optional[int]:
+        return self._city_code.get(city)
+
+    def nbytes(self) -> int:
+        """Bytes de las columnas (sin las tablas de item_ids/ciudades)."""
+        cols = [self.offsets, self.city, self.quality, *self.prices, *self.dates]
+        return sum(c.itemsize * len(c) for c in cols)
+
+    def quote_at(self, row: int) -> Quote:
+        p = self.prices
+        d = self.dates
+        return Quote(
+            sell_min=p[0][row],
+            sell_max=p[1][row],
+            buy_min=p[2][row],
+            buy_max=p[3][row],
+            sell_min_date=self._date_str(row, 0, d[0][row]),
+            sell_max_date=self._date_str(row, 1, d[1][row]),
+            buy_min_date=self._date_str(row, 2, d[2][row]),
+            buy_max_date=self._date_str(row, 3, d[3][row]),
+        )
+
+    def _date_str(self, row: int, field: int, value: int) -> str:
+        if value == DATE_EMPTY:
+            return self._odd_dates.get((row, field), "")
+        return (_EPOCH + value * _SECOND).isoformat()
+
+
+class _ItemView(Mapping[str, Mapping[int, Quote]]):
+    """city -> quality -> Quote de un item (filas [start, end))."""
+
+    __slots__ = ("_idx", "_start", "_end", "_segments")
+
+    def __init__(self, idx: ColumnarIndex, start: int, end: int) -> None:
+        self._idx = idx
+        self._start = start
+        self._end = end
+        self._segments: Optional[Dict[str, Tuple[int, int]]] = None
+
+    def _segs(self) -> Dict[str, Tuple[int, int]]:
+        # las filas de cada ciudad son contiguas dentro del item
+        if self._segments is None:
+            segs: Dict[str, Tuple[int, int]] = {}
+            codes = self._idx.city
+            names = self._idx.cities
+            row = self._start
+            while row < self._end:
+                code = codes[row]
+                end = row + 1
+                while end < self._end and codes[end] == code:
+                    end += 1
+                segs[names[code]] = (row, end)
+                row = end
+            self._segments = segs
+        return self._segments
+
+    def __getitem__(self, city: str) -> "_CityView":
+        start, end = self._segs()[city]
+        return _CityView(self._idx, start, end)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._segs())
+
+    def __len__(self) -> int:
+        return len(self._segs())
+
+
+class _CityView(Mapping[int, Quote]):
+    """quality -> Quote de un (item, ciudad)."""
+
+    __slots__ = ("_idx", "_start", "_end")
+
+    def __init__(self, idx: ColumnarIndex, start: int, end: int) -> None:
+        self._idx = idx
+        self._start = start
+        self._end = end
+
+    def __getitem__(self, quality: int) -> Quote:
+        q = self._idx.quality
+        for row in range(self._start, self._end):
+            if q[row] == quality:
+                return self._idx.quote_at(row)
+        raise KeyError(quality)
+
+    def __iter__(self) -> Iterator[int]:
+        q = self._idx.quality
+        return (q[row] for row in range(self._start, self._end))
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+
+class _Builder:
+    def __init__(self) -> None:
+        self.item_ids: List[str] = []
+        self.item_pos: Dict[str, int] = {}
+        self.cities: List[str] = []
+        self.city_pos: Dict[str, int] = {}
+        self.pair_rank: Dict[Tuple[int, int], int] = {}     # (item, ciudad) -> orden de aparición
+        self.row_of: Dict[Tuple[int, int, int], int] = {}   # (item, ciudad, calidad) -> fila
+
+        self.item = array("I")
+        self.pair = array("I")
+        self.city = array("H")
+        self.quality = array("B")
+        self.prices = tuple(array("q") for _ in PRICE_FIELDS)
+        self.dates = tuple(array("q") for _ in DATE_FIELDS)
+        self.odd_dates: Dict[Tuple[int, int], str] = {}
+        self._date_memo: Dict[str, int] = {}
+
+    def add(self, item_id: str, city: str, quality: int, quote: Quote) -> None:
+        i = self.item_pos.get(item_id)
+        if i is None:
+            i = self.item_pos[item_id] = len(self.item_ids)
+            self.item_ids.append(item_id)
+        c = self.city_pos.get(city)
+        if c is None:
+            c = self.city_pos[city] = len(self.cities)
+            self.cities.append(city)
+
+        key = (i, c, quality)
+        row = self.row_of.get(key)
+        if row is None:
+            row = self.row_of[key] = len(self.item)
+            self.item.append(i)
+            self.pair.append(self.pair_rank.setdefault((i, c), len(self.pair_rank)))
+            self.city.append(c)
+            self.quality.append(quality)
+            for col in self.prices:
+                col.append(0)
+            for col in self.dates:
+                col.append(0)
+
+        p = self.prices
+        p[0][row], p[1][row], p[2][row], p[3][row] = quote.sell_min, quote.sell_max, quote.buy_min, quote.buy_max
+        for field, s in enumerate((quote.sell_min_date, quote.sell_max_date, quote.buy_min_date, quote.buy_max_date)):
+            self.dates[field][row] = self._encode_date(row, field, s)
+
+    def build(self) -> ColumnarIndex:
+        # orden final: por item, y dentro del item por (item, ciudad) según aparición;
+        # sort estable -> las calidades quedan en su orden de llegada
+        n = len(self.item)
+        item, pair = self.item, self.pair
+        self.row_of.clear()
+        self.pair_rank.clear()
+
+        # lo normal (respuestas del API) es que ya vengan agrupadas: no hay que reordenar
+        if all(item[r] <= item[r + 1] and pair[r] <= pair[r + 1] for r in range(n - 1)):
+            order = None
+        else:
+            order = sorted(range(n), key=lambda r: (item[r], pair[r]))
+
+        def take(col: array) -> array:
+            return col if order is None else array(col.typecode, (col[r] for r in order))
+
+        offsets = array("I", [0] * (len(self.item_ids) + 1))
+        for r in range(n):
+            offsets[item[r] + 1] += 1
+        for i in range(len(self.item_ids)):
+            offsets[i + 1] += offsets[i]
+
+        odd = self.odd_dates
+        if order is not None and odd:
+            new_row = {old: new for new, old in enumerate(order)}
+            odd = {(new_row[r], f): s for (r, f), s in odd.items()}
+
+        return ColumnarIndex(
+            item_ids=self.item_ids,
+            offsets=offsets,
+            cities=self.cities,
+            city=take(self.city),
+            quality=take(self.quality),
+            prices=tuple(take(c) for c in self.prices),
+            dates=tuple(take(c) for c in self.dates),
+            odd_dates=odd,
+        )
+
+    def _encode_date(self, row: int, field: int, s: str) -> int:
+        v = self._date_memo.get(s)
+        if v is None:
+            v = DATE_EMPTY
+            if s:
+                try:
+                    dt = datetime.fromisoformat(s)
+                    if dt.tzinfo is None and dt.microsecond == 0 and dt.isoformat() == s:
+                        v = (dt - _EPOCH) // _SECOND
+                except ValueError:
+                    pass
+            self._date_memo[s] = v
+        if v == DATE_EMPTY:
+            self.odd_dates.pop((row, field), None)
+            if s:
+                self.odd_dates[(row, field)] = s  # formato raro: se guarda tal cual
+        return v
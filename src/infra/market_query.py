@@ -1,24 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import List, Optional
 import requests
 
-
-@dataclass(frozen=True)
-class Quote:
-    sell_min: int
-    sell_max: int
-    buy_min: int
-    buy_max: int
-    sell_min_date: str
-    sell_max_date: str
-    buy_min_date: str
-    buy_max_date: str
-
-
-MarketIndex = Dict[str, Dict[str, Dict[int, Quote]]]
-#            item_id -> city -> quality -> Quote
+from src.infra.market_types import MarketIndex, Quote
+from src.infra.price_fetcher import DEFAULT_MAX_URL_BYTES, PriceFetcher
+from src.infra.negative_cache import NegativeCache
+from src.infra.quote_cache import QuoteCache
+from src.infra.quote_store import QuoteStore
+from src.infra.rate_governor import RateGovernor
+from src.infra.regions import DEFAULT_REGION, base_url_for_region, normalize_region
 
 
 class FastMarketQuery:
@@ -45,8 +36,6 @@ class FastMarketQuery:
 
     DEFAULT_QUALITIES = [1, 2, 3, 4, 5]
 
-    BASE_URL = "https://www.albion-online-data.com/api/v2/stats/prices"
-
     def __init__(
         self,
         base_item: str,
@@ -56,18 +45,45 @@ class FastMarketQuery:
         ench_max: int = 4,
         cities: Optional[List[str]] = None,
         timeout_sec: int = 30,
-        batch_size: int = 120,
+        batch_size: Optional[int] = None,
+        max_url_bytes: int = DEFAULT_MAX_URL_BYTES,
         session: Optional[requests.Session] = None,
+        concurrency: int = 1,
+        base_url: Optional[str] = None,
+        store: Optional[QuoteStore] = None,
+        cache: Optional[QuoteCache] = None,
+        governor: Optional[RateGovernor] = None,
+        negative_cache: Optional[NegativeCache] = None,
+        qualities: Optional[List[int]] = None,
+        region: str = DEFAULT_REGION,
     ) -> None:
         self.base_item = base_item.strip().upper()
+        self.region = normalize_region(region)
         self.tier_min = int(tier_min)
         self.tier_max = int(tier_max)
         self.ench_min = int(ench_min)
         self.ench_max = int(ench_max)
         self.cities = cities or self.DEFAULT_CITIES
+        self.qualities = qualities or self.DEFAULT_QUALITIES
         self.timeout_sec = timeout_sec
         self.batch_size = batch_size
-        self.session = session or requests.Session()
+        # se resuelve acá (no al importar): respeta AURIA_BASE_URL* vigentes al crear la consulta
+        self.base_url = base_url or base_url_for_region(self.region)
+        self.fetcher = PriceFetcher(
+            base_url=self.base_url,
+            cities=self.cities,
+            qualities=self.qualities,
+            timeout_sec=timeout_sec,
+            session=session,
+            concurrency=concurrency,
+            max_url_bytes=max_url_bytes,
+            store=store,
+            cache=cache,
+            governor=governor,
+            negative_cache=negative_cache,
+            region=self.region,
+        )
+        self.session = self.fetcher.session
 
         if self.tier_min > self.tier_max:
             raise ValueError("tier_min > tier_max")
@@ -91,72 +107,27 @@ class FastMarketQuery:
         return ids
 
     def build_urls(self) -> List[str]:
-        item_ids = self.build_item_ids()
-        return [self._build_url(chunk) for chunk in self._chunks(item_ids, self.batch_size)]
-
-    def fetch_index(self) -> MarketIndex:
-        index: MarketIndex = {}
-
-        for url in self.build_urls():
-            data = self._get_json(url)
-            if not isinstance(data, list):
-                continue
-
-            for e in data:
-                item_id = e.get("item_id")
-                city = e.get("city") or e.get("location")
-                quality = e.get("quality")
-
-                if not item_id or not city or quality is None:
-                    continue
-
-                try:
-                    q_int = int(quality)
-                except Exception:
-                    continue
-
-                sell_min = int(e.get("sell_price_min", 0) or 0)
-                sell_max = int(e.get("sell_price_max", 0) or 0)
-                buy_min  = int(e.get("buy_price_min", 0) or 0)
-                buy_max  = int(e.get("buy_price_max", 0) or 0)
-
-                # NUEVA CONDICIÓN: elimina solo si los 4 están en 0
-                if sell_min == 0 and sell_max == 0 and buy_min == 0 and buy_max == 0:
-                    continue
-
-                quote = Quote(
-                    sell_min=sell_min,
-                    sell_max=sell_max,
-                    buy_min=buy_min,
-                    buy_max=buy_max,
-                    sell_min_date=e.get("sell_price_min_date", ""),
-                    sell_max_date=e.get("sell_price_max_date", ""),
-                    buy_min_date=e.get("buy_price_min_date", ""),
-                    buy_max_date=e.get("buy_price_max_date", ""),
-                )
-
-                index.setdefault(item_id, {}).setdefault(city, {})[q_int] = quote
-
-        return index
+        return [self._build_url(chunk) for chunk in self.plan_chunks()]
+
+    def fetch_index(self, *, concurrency: Optional[int] = None) -> MarketIndex:
+        """
+        concurrency: batches en vuelo a la vez (None = el del constructor).
+        Pasa por la cache compartida del proceso (cache=None) y el store:
+        solo se descargan los items vencidos según su TTL.
+        """
+        return self.fetcher.fetch_items(self.build_item_ids(), max_items=self.batch_size, concurrency=concurrency)
+
+    def plan_chunks(self) -> List[List[str]]:
+        """
+        Batches de item_ids, llenando cada URL hasta max_url_bytes
+        (batch_size, si se indica, limita además los ids por batch).
+        """
+        return self.fetcher.plan_chunks(self.build_item_ids(), max_items=self.batch_size)
+
+    def plan_request_count(self) -> int:
+        return len(self.plan_chunks())
 
     # ---------------- Internal ----------------
 
     def _build_url(self, item_ids: List[str]) -> str:
-        items_str = ",".join(item_ids)
-        loc_str = ",".join(self._encode_location(x) for x in self.cities)
-        qual_str = ",".join(map(str, self.DEFAULT_QUALITIES))
-        return f"{self.BASE_URL}/{items_str}.json?locations={loc_str}&qualities={qual_str}"
-
-    def _get_json(self, url: str):
-        r = self.session.get(url, timeout=self.timeout_sec)
-        r.raise_for_status()
-        return r.json()
-
-    @staticmethod
-    def _encode_location(s: str) -> str:
-        return s.strip().replace(" ", "%20")
-
-    @staticmethod
-    def _chunks(items: List[str], n: int):
-        for i in range(0, len(items), n):
-            yield items[i : i + n]
+        return self.fetcher.build_url(item_ids)
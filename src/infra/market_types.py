@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict
+
+
+@dataclass(frozen=True, slots=True)
+class Quote:
+    sell_min: int
+    sell_max: int
+    buy_min: int
+    buy_max: int
+    sell_min_date: str
+    sell_max_date: str
+    buy_min_date: str
+    buy_max_date: str
+
+
+MarketIndex = Dict[str, Dict[str, Dict[int, Quote]]]
+#            item_id -> city -> quality -> Quote
+
+RegionalIndex = Dict[str, MarketIndex]
+#              region ("west" | "east" | "europe") -> MarketIndex
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Set
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Set, Tuple
 import requests
 
-from src.infra.market_query import MarketIndex, Quote, FastMarketQuery
+from src.infra.market_query import MarketIndex, FastMarketQuery
+from src.infra.market_types import RegionalIndex
+from src.infra.price_fetcher import DEFAULT_MAX_URL_BYTES, PriceFetcher
+from src.infra.negative_cache import NegativeCache
+from src.infra.quote_cache import QuoteCache
+from src.infra.quote_store import QuoteStore
+from src.infra.rate_governor import RateGovernor
+from src.infra.template_repo import TemplateSpec
+from src.infra.regions import DEFAULT_REGION, base_url_for_region, normalize_region, run_per_region
 
 
 @dataclass(frozen=True)
@@ -14,6 +23,30 @@ class TieredSpec:
     tier_max: int
     ench_min: int
     ench_max: int
+    qualities: Optional[Tuple[int, ...]] = None   # None = las de la consulta
+    cities: Optional[Tuple[str, ...]] = None      # None = las de la consulta
+
+    @classmethod
+    def from_template(cls, t: TemplateSpec, *, cities: Optional[Sequence[str]] = None) -> "TieredSpec":
+        """TemplateSpec -> TieredSpec (cities, si se indica, reemplaza las del template)."""
+        cities = cities if cities is not None else t.cities
+        return cls(
+            template_key=t.template_key,
+            tier_min=t.tier_min,
+            tier_max=t.tier_max,
+            ench_min=t.ench_min,
+            ench_max=t.ench_max,
+            qualities=tuple(t.qualities),
+            cities=tuple(cities) if cities else None,
+        )
+
+
+@dataclass(frozen=True)
+class FetchGroup:
+    """Items que necesitan exactamente las mismas ciudades y calidades."""
+    cities: Tuple[str, ...]
+    qualities: Tuple[int, ...]
+    item_ids: Tuple[str, ...]
 
 
 class MultiMarketQuery:
@@ -25,6 +58,13 @@ class MultiMarketQuery:
       - unir todos los item_ids de la categoría
       - pedirlos en batches (para no explotar la URL)
       - devolver MarketIndex[item_id][city][quality] -> Quote(...)
+
+    Si los specs traen sus propias calidades/ciudades, los items se agrupan
+    por (ciudades, calidades) y cada grupo pide solo lo suyo: menos filas
+    en la respuesta y, con URLs más cortas, más ids por batch.
+
+    `region` elige el servidor; fetch_regions() trae varias regiones en
+    paralelo, cada una con su cache y su presupuesto de requests.
     """
 
     def __init__(
@@ -33,16 +73,39 @@ class MultiMarketQuery:
         *,
         cities: Optional[List[str]] = None,
         qualities: Optional[List[int]] = None,
-        batch_size: int = 120,
+        batch_size: Optional[int] = None,
+        max_url_bytes: int = DEFAULT_MAX_URL_BYTES,
         timeout_sec: int = 30,
         session: Optional[requests.Session] = None,
+        concurrency: int = 1,
+        base_url: Optional[str] = None,
+        store: Optional[QuoteStore] = None,
+        cache: Optional[QuoteCache] = None,
+        governor: Optional[RateGovernor] = None,
+        negative_cache: Optional[NegativeCache] = None,
+        region: str = DEFAULT_REGION,
     ) -> None:
         self.specs = specs
+        self.region = normalize_region(region)
         self.cities = cities or FastMarketQuery.DEFAULT_CITIES
         self.qualities = qualities or FastMarketQuery.DEFAULT_QUALITIES
-        self.batch_size = int(batch_size)
+        self.batch_size = int(batch_size) if batch_size is not None else None
         self.timeout_sec = int(timeout_sec)
-        self.session = session or requests.Session()
+        self.fetcher = PriceFetcher(
+            base_url=base_url or base_url_for_region(self.region),
+            cities=self.cities,
+            qualities=self.qualities,
+            timeout_sec=self.timeout_sec,
+            session=session,
+            concurrency=concurrency,
+            max_url_bytes=max_url_bytes,
+            store=store,
+            cache=cache,
+            governor=governor,
+            negative_cache=negative_cache,
+            region=self.region,
+        )
+        self.session = self.fetcher.session
 
     def build_item_ids(self) -> List[str]:
         ids: Set[str] = set()
@@ -51,53 +114,118 @@ class MultiMarketQuery:
         # Orden estable solo para debug/consistencia
         return sorted(ids)
 
-    def fetch_index(self) -> MarketIndex:
-        index: MarketIndex = {}
+    def fetch_index(self, *, concurrency: Optional[int] = None) -> MarketIndex:
+        """
+        concurrency: batches en vuelo a la vez (None = el del constructor).
+        Pasa por la cache compartida del proceso (cache=None) y el store:
+        solo se descargan los items vencidos según su TTL.
+        """
+        return self._fetch_with(self.fetcher, concurrency)
+
+    def iter_index(
+        self,
+        *,
+        concurrency: Optional[int] = None,
+        on_resolved: Optional[Callable[[List[str]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Iterator[MarketIndex]:
+        """
+        El MarketIndex por partes, a medida que llegan los batches (ver
+        PriceFetcher.iter_items): cada item aparece completo en una sola parte.
+        Los batches salen en el orden de los specs: los primeros, primero.
+        cancel: al setearse no se piden más batches (FetchCancelled).
+        """
+        for g in self.plan_groups():
+            yield from self._fetcher_for(g).cancellable(cancel).iter_items(
+                list(g.item_ids), max_items=self.batch_size, concurrency=concurrency, on_resolved=on_resolved
+            )
+
+    def fetch_regions(self, regions: Sequence[str], *, concurrency: Optional[int] = None) -> RegionalIndex:
+        """
+        Mismo plan en varias regiones a la vez: region -> MarketIndex.
+        Cada región usa su host (y su RateGovernor) y su cache en memoria;
+        la sesión, el store y la cache negativa se comparten (van por región).
+        """
+        return run_per_region(regions, lambda r: self._fetch_with(self._fetcher_for_region(r), concurrency))
+
+    def plan_groups(self) -> List[FetchGroup]:
+        """
+        Agrupa los item_ids por el conjunto de ciudades y calidades que piden.
+        Un item en varios specs pide la unión de lo que necesita cada uno.
+        Los grupos salen en el orden en que aparece su primer item en los
+        specs, y dentro de cada grupo los items quedan en el orden de los specs
+        (prioridad: ver CatalogBMAnalyzer.run con deadline_ms).
+        """
+        need: Dict[str, Tuple[Set[str], Set[int]]] = {}
+        for s in self.specs:
+            cities = set(s.cities or self.cities)
+            qualities = set(int(q) for q in (s.qualities or self.qualities))
+            for item_id in self._build_item_ids_for_spec(s):
+                c, q = need.setdefault(item_id, (set(), set()))
+                c.update(cities)
+                q.update(qualities)
+
+        groups: Dict[Tuple[FrozenSet[str], FrozenSet[int]], List[str]] = {}
+        for item_id, (c, q) in need.items():
+            groups.setdefault((frozenset(c), frozenset(q)), []).append(item_id)
+
+        return [
+            FetchGroup(cities=self._ordered_cities(c), qualities=tuple(sorted(q)), item_ids=tuple(ids))
+            for (c, q), ids in groups.items()
+        ]
+
+    def plan_chunks(self, *, adaptive: bool = True) -> List[List[str]]:
+        """
+        Batches de item_ids (grupo por grupo), llenando cada URL hasta
+        max_url_bytes (batch_size, si se indica, limita además los ids por batch).
+        adaptive=False ignora el batch_scale AIMD del governor (ver PriceFetcher.plan_chunks).
+        """
+        chunks: List[List[str]] = []
+        for g in self.plan_groups():
+            chunks.extend(
+                self._fetcher_for(g).plan_chunks(list(g.item_ids), max_items=self.batch_size, adaptive=adaptive)
+            )
+        return chunks
+
+    def plan_request_count(self, *, adaptive: bool = True) -> int:
+        return len(self.plan_chunks(adaptive=adaptive))
 
-        item_ids = self.build_item_ids()
-        for chunk in self._chunks(item_ids, self.batch_size):
-            url = self._build_url(chunk)
-            data = self._get_json(url)
-            if not isinstance(data, list):
-                continue
-
-            for e in data:
-                item_id = e.get("item_id")
-                city = e.get("city") or e.get("location")
-                quality = e.get("quality")
-
-                if not item_id or not city or quality is None:
-                    continue
-
-                try:
-                    q_int = int(quality)
-                except Exception:
-                    continue
-
-                sell_min = int(e.get("sell_price_min", 0) or 0)
-                sell_max = int(e.get("sell_price_max", 0) or 0)
-                buy_min  = int(e.get("buy_price_min", 0) or 0)
-                buy_max  = int(e.get("buy_price_max", 0) or 0)
-
-                if sell_min == 0 and sell_max == 0 and buy_min == 0 and buy_max == 0:
-                    continue
-
-                quote = Quote(
-                    sell_min=sell_min,
-                    sell_max=sell_max,
-                    buy_min=buy_min,
-                    buy_max=buy_max,
-                    sell_min_date=e.get("sell_price_min_date", ""),
-                    sell_max_date=e.get("sell_price_max_date", ""),
-                    buy_min_date=e.get("buy_price_min_date", ""),
-                    buy_max_date=e.get("buy_price_max_date", ""),
-                )
-
-                index.setdefault(item_id, {}).setdefault(city, {})[q_int] = quote
+    # ---------------- internal ----------------
 
+    def _fetch_with(self, fetcher: PriceFetcher, concurrency: Optional[int]) -> MarketIndex:
+        index: MarketIndex = {}
+        for g in self.plan_groups():
+            part = fetcher.scoped(cities=list(g.cities), qualities=list(g.qualities)).fetch_items(
+                list(g.item_ids), max_items=self.batch_size, concurrency=concurrency
+            )
+            index.update(part)  # los grupos no comparten items
         return index
 
-    # ---------------- internal ----------------
+    def _fetcher_for(self, g: FetchGroup) -> PriceFetcher:
+        return self.fetcher.scoped(cities=list(g.cities), qualities=list(g.qualities))
+
+    def _fetcher_for_region(self, region: str) -> PriceFetcher:
+        region = normalize_region(region)  # "West" / " west" son la misma región (y la misma cache)
+        if region == self.region:
+            return self.fetcher
+        f = self.fetcher
+        return PriceFetcher(
+            base_url=base_url_for_region(region),
+            cities=f.cities,
+            qualities=f.qualities,
+            timeout_sec=f.timeout_sec,
+            session=f.session,
+            concurrency=f.concurrency,
+            max_url_bytes=f.max_url_bytes,
+            store=f.store,
+            negative_cache=f.negative_cache,
+            region=region,
+        )
+
+    def _ordered_cities(self, cities: FrozenSet[str]) -> Tuple[str, ...]:
+        # respeta el orden de self.cities; las extra (si hay) van al final
+        known = [c for c in self.cities if c in cities]
+        return tuple(known + sorted(cities.difference(known)))
 
     @staticmethod
     def _build_item_ids_for_spec(s: TieredSpec) -> List[str]:
@@ -110,21 +238,4 @@ class MultiMarketQuery:
         return ids
 
     def _build_url(self, item_ids: List[str]) -> str:
-        items_str = ",".join(item_ids)
-        loc_str = ",".join(self._encode_location(x) for x in self.cities)
-        qual_str = ",".join(map(str, self.qualities))
-        return f"{FastMarketQuery.BASE_URL}/{items_str}.json?locations={loc_str}&qualities={qual_str}"
-
-    def _get_json(self, url: str):
-        r = self.session.get(url, timeout=self.timeout_sec)
-        r.raise_for_status()
-        return r.json()
-
-    @staticmethod
-    def _encode_location(s: str) -> str:
-        return s.strip().replace(" ", "%20")
-
-    @staticmethod
-    def _chunks(items: List[str], n: int):
-        for i in range(0, len(items), n):
-            yield items[i : i + n]
+        return self.fetcher.build_url(item_ids)
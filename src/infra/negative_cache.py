@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.infra.market_types import MarketIndex
+from src.infra.regions import DEFAULT_REGION
+
+_SQL_IN_CHUNK = 500
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS empty_items (
+  region TEXT NOT NULL,                  -- servidor: west | east | europe
+  item_id TEXT NOT NULL,
+  scope TEXT NOT NULL,                   -- "ciudades|calidades" pedidas
+  empty_scans INTEGER NOT NULL,          -- scans vacíos seguidos
+  last_checked_at REAL NOT NULL,         -- epoch del último pedido (o sonda)
+  PRIMARY KEY (region, item_id, scope)
+) WITHOUT ROWID;
+"""
+
+
+class NegativeCache:
+    """
+    Cache negativa persistente (SQLite) de items que nunca cotizan.
+
+    Cada vez que un item se pide y no vuelve con ninguna fila no-cero se suma
+    un scan vacío; si vuelve con precios se borra. Con `min_empty_scans`
+    scans vacíos seguidos el item se poda: no se pide más, salvo una sonda
+    cada `probe_every_sec` por si empezó a tradearse.
+
+    La poda es por item (no por ciudad/calidad): el request al API es por
+    item_id, así que es la única granularidad que ahorra requests. La
+    `region` y el `scope` (ciudades|calidades pedidas) evitan que otro
+    servidor o una consulta acotada a pocas ciudades pode el item para un
+    scan completo.
+    """
+
+    DEFAULT_MIN_EMPTY_SCANS = 3
+    DEFAULT_PROBE_EVERY_SEC = 6 * 3600
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        min_empty_scans: int = DEFAULT_MIN_EMPTY_SCANS,
+        probe_every_sec: float = DEFAULT_PROBE_EVERY_SEC,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.min_empty_scans = int(min_empty_scans)
+        self.probe_every_sec = float(probe_every_sec)
+        self._ensure_schema()
+
+    # ---------------- Public ----------------
+
+    @staticmethod
+    def scope_for(cities: Sequence[str], qualities: Sequence[int]) -> str:
+        return ",".join(sorted(cities)) + "|" + ",".join(str(q) for q in sorted(int(x) for x in qualities))
+
+    def split(
+        self,
+        item_ids: Sequence[str],
+        scope: str,
+        *,
+        region: str = DEFAULT_REGION,
+        now: Optional[float] = None,
+    ) -> Tuple[List[str], List[str]]:
+        """
+        (a_pedir, podados). Los podados cuya última sonda es vieja vuelven a pedirse.
+        """
+        now = time.time() if now is None else now
+        probe_before = now - self.probe_every_sec
+
+        pruned: set = set()
+        con = self._connect()
+        try:
+            for part in self._parts(item_ids):
+                rows = con.execute(
+                    f"SELECT item_id FROM empty_items "
+                    f"WHERE region = ? AND scope = ? AND empty_scans >= ? AND last_checked_at > ? "
+                    f"AND item_id IN ({','.join('?' * len(part))})",
+                    [region, scope, self.min_empty_scans, probe_before, *part],
+                ).fetchall()
+                pruned.update(r[0] for r in rows)
+        finally:
+            con.close()
+
+        to_fetch = [x for x in item_ids if x not in pruned]
+        return to_fetch, [x for x in item_ids if x in pruned]
+
+    def record(
+        self,
+        item_ids: Sequence[str],
+        index: MarketIndex,
+        scope: str,
+        *,
+        region: str = DEFAULT_REGION,
+        now: Optional[float] = None,
+    ) -> None:
+        """Actualiza las rachas con el resultado de un fetch (1 transacción)."""
+        now = time.time() if now is None else now
+        empty = [(region, x, scope, now) for x in item_ids if not index.get(x)]
+        traded = [(region, x, scope) for x in item_ids if index.get(x)]
+
+        con = self._connect()
+        try:
+            with con:
+                con.executemany("DELETE FROM empty_items WHERE region = ? AND item_id = ? AND scope = ?", traded)
+                con.executemany(
+                    "INSERT INTO empty_items(region, item_id, scope, empty_scans, last_checked_at) "
+                    "VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT(region, item_id, scope) DO UPDATE SET "
+                    "empty_scans = empty_scans + 1, last_checked_at = excluded.last_checked_at",
+                    empty,
+                )
+        finally:
+            con.close()
+
+    def pruned_items(self) -> Dict[str, int]:
+        """item_id -> mayor racha de scans vacíos (solo los que ya están podados)."""
+        con = self._connect()
+        try:
+            rows = con.execute(
+                "SELECT item_id, MAX(empty_scans) FROM empty_items "
+                "WHERE empty_scans >= ? GROUP BY item_id",
+                (self.min_empty_scans,),
+            ).fetchall()
+        finally:
+            con.close()
+        return {r[0]: int(r[1]) for r in rows}
+
+    # ---------------- Internal ----------------
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _ensure_schema(self) -> None:
+        con = self._connect()
+        try:
+            con.executescript(SCHEMA_SQL)
+        finally:
+            con.close()
+
+    @staticmethod
+    def _parts(items: Sequence[str]):
+        items = list(items)
+        for i in range(0, len(items), _SQL_IN_CHUNK):
+            yield items[i : i + _SQL_IN_CHUNK]
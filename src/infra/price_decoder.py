@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import codecs
+import json
+import sys
+from typing import AbstractSet, Iterable, Iterator, Optional, Tuple
+
+from src.infra.market_types import MarketIndex, Quote
+
+PriceRow = Tuple[str, str, int, Quote]
+#          item_id, city, quality, Quote
+
+# Una fila "vacía" del API trae los 4 precios en 0. Con JSON compacto (como
+# responde el Albion Data API) se detecta por texto, sin decodificar la fila.
+_Z_SELL_MIN = '"sell_price_min":0,'
+_Z_SELL_MAX = '"sell_price_max":0,'
+_Z_BUY_MIN = '"buy_price_min":0,'
+_Z_BUY_MAX = '"buy_price_max":0,'
+
+_DECODER = json.JSONDecoder()
+_WS = " \t\r\n,"
+
+
+def iter_price_rows(
+    chunks: Iterable[bytes],
+    *,
+    cities: Optional[AbstractSet[str]] = None,
+    encoding: str = "utf-8",
+) -> Iterator[PriceRow]:
+    """
+    Decodifica en streaming el array JSON de /stats/prices, fila por fila.
+
+      - las filas con los 4 precios en 0 se descartan antes de parsearlas
+      - las ciudades fuera de `cities` (si se indica) se descartan al parsear
+      - cada fila válida sale como (item_id, city, quality, Quote) ya tipada
+
+    Nunca materializa el body completo ni la lista de dicts.
+    """
+    text_decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buf = ""
+    pos = 0
+    started = False
+
+    for raw in chunks:
+        if not raw:
+            continue
+        buf = buf[pos:] + text_decoder.decode(raw)
+        pos = 0
+
+        if not started:
+            pos = _skip_ws(buf, pos)
+            if pos >= len(buf):
+                continue
+            if buf[pos] != "[":
+                return  # no es un array (error del upstream): sin filas
+            started = True
+            pos += 1
+
+        while True:
+            pos = _skip_ws(buf, pos)
+            if pos >= len(buf) or buf[pos] == "]":
+                break
+
+            obj, pos_after = _next_object(buf, pos)
+            if pos_after < 0:
+                break  # objeto incompleto: falta el próximo chunk
+            pos = pos_after
+
+            if obj is None:
+                continue
+            row = _row_from_obj(obj, cities)
+            if row is not None:
+                yield row
+
+
+def merge_decoded_rows(index: MarketIndex, rows: Iterable[PriceRow]) -> None:
+    for item_id, city, quality, quote in rows:
+        index.setdefault(item_id, {}).setdefault(city, {})[quality] = quote
+
+
+# ---------------- internal ----------------
+
+def _skip_ws(buf: str, pos: int) -> int:
+    n = len(buf)
+    while pos < n and buf[pos] in _WS:
+        pos += 1
+    return pos
+
+
+def _next_object(buf: str, pos: int) -> Tuple[Optional[dict], int]:
+    """
+    (obj, pos_siguiente). obj=None si la fila es todo-cero (no se parsea).
+    pos_siguiente=-1 si el objeto todavía no llegó completo.
+    """
+    # Las filas son planas (sin objetos anidados ni '}' en los valores):
+    # el primer '}' cierra la fila.
+    end = buf.find("}", pos)
+    if end < 0:
+        return None, -1
+
+    segment = buf[pos : end + 1]
+    if (
+        _Z_SELL_MIN in segment
+        and _Z_SELL_MAX in segment
+        and _Z_BUY_MIN in segment
+        and _Z_BUY_MAX in segment
+    ):
+        return None, end + 1
+
+    try:
+        return json.loads(segment), end + 1
+    except ValueError:
+        pass
+
+    # Fallback genérico (formato inesperado): decoder completo desde pos
+    try:
+        obj, after = _DECODER.raw_decode(buf, pos)
+    except ValueError:
+        return None, -1
+    return (obj if isinstance(obj, dict) else None), after
+
+
+def _row_from_obj(e: dict, cities: Optional[AbstractSet[str]]) -> Optional[PriceRow]:
+    item_id = e.get("item_id")
+    city = e.get("city") or e.get("location")
+    quality = e.get("quality")
+
+    if not item_id or not city or quality is None:
+        return None
+    if cities is not None and city not in cities:
+        return None
+
+    try:
+        q_int = int(quality)
+    except Exception:
+        return None
+
+    sell_min = int(e.get("sell_price_min", 0) or 0)
+    sell_max = int(e.get("sell_price_max", 0) or 0)
+    buy_min = int(e.get("buy_price_min", 0) or 0)
+    buy_max = int(e.get("buy_price_max", 0) or 0)
+
+    if sell_min == 0 and sell_max == 0 and buy_min == 0 and buy_max == 0:
+        return None
+
+    quote = Quote(
+        sell_min=sell_min,
+        sell_max=sell_max,
+        buy_min=buy_min,
+        buy_max=buy_max,
+        sell_min_date=e.get("sell_price_min_date", ""),
+        sell_max_date=e.get("sell_price_max_date", ""),
+        buy_min_date=e.get("buy_price_min_date", ""),
+        buy_max_date=e.get("buy_price_max_date", ""),
+    )
+    # item_id/city se repiten en miles de filas: internarlos comparte el string
+    return sys.intern(item_id), sys.intern(city), q_int, quote
@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.infra.market_types import MarketIndex
+from src.infra.negative_cache import NegativeCache
+from src.infra.price_decoder import PriceRow, iter_price_rows, merge_decoded_rows
+from src.infra.quote_cache import QuoteCache, shared_quote_cache
+from src.infra.quote_store import QuoteStore
+from src.infra.rate_governor import RateGovernor, governor_for
+from src.infra.regions import DEFAULT_REGION, normalize_region
+from src.infra.replay import install_replay
+from src.infra.single_flight import SingleFlight, shared_single_flight
+
+# Límite práctico del Albion Data API (por encima responde 414 / corta la conexión)
+DEFAULT_MAX_URL_BYTES = 4096
+
+# Respuestas que indican "batch demasiado grande": se parte en dos y se reintenta
+SPLIT_STATUS_CODES = {413, 414, 431}
+
+# Respuestas transitorias: se reintentan con backoff (el mismo batch)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class FetchCancelled(Exception):
+    """El fetch se cortó por su evento `cancel` (deadline vencido, apagado del proceso)."""
+
+
+def make_session(pool_maxsize: int = 10) -> requests.Session:
+    """
+    requests.Session con el pool keep-alive dimensionado para `pool_maxsize`
+    requests en vuelo. Con el default de requests (10) y más hilos que eso,
+    urllib3 descarta conexiones y vuelve a abrir TCP/TLS en cada batch.
+
+    Con AURIA_REPLAY=record|replay la sesión graba / reproduce las respuestas
+    del upstream (ver src/infra/replay.py).
+    """
+    session = requests.Session()
+    if install_replay(session, pool_maxsize=pool_maxsize) is None:
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, int(pool_maxsize)))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+
+class PriceFetcher:
+    """
+    Motor de descarga compartido por FastMarketQuery y MultiMarketQuery.
+
+      - arma las URLs /stats/prices/{ids}.json?locations=..&qualities=..
+      - empaqueta los item_ids por bytes de URL (no por cantidad fija)
+      - descarga los batches en serie (concurrency=1) o con N en vuelo
+        sobre un pool de hilos que reutiliza las conexiones keep-alive
+      - decodifica cada respuesta en streaming directo a filas tipadas
+        y las fusiona en un único MarketIndex
+      - respeta el RateGovernor del host: token bucket, backoff con Retry-After
+        y concurrencia/tamaño de batch adaptativos (AIMD)
+      - lee primero la cache en memoria del proceso, luego el store SQLite
+        (si hay) y solo pide al upstream los items vencidos
+      - con negative_cache: no pide los items que nunca cotizan (salvo sondas)
+      - con cancel (ver cancellable): deja de pedir apenas se setea el evento,
+        antes de cada batch y de cada reintento o espera de backoff
+
+    Un fetcher habla con UNA región (servidor): cache, store y cache negativa
+    van separados por `region`, y el governor es el del host de esa región.
+    """
+
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        cities: List[str],
+        qualities: List[int],
+        timeout_sec: int = 30,
+        session: Optional[requests.Session] = None,
+        concurrency: int = 1,
+        max_url_bytes: int = DEFAULT_MAX_URL_BYTES,
+        store: Optional[QuoteStore] = None,
+        cache: Optional[QuoteCache] = None,
+        flight: Optional[SingleFlight] = None,
+        governor: Optional[RateGovernor] = None,
+        negative_cache: Optional[NegativeCache] = None,
+        region: str = DEFAULT_REGION,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.region = normalize_region(region)
+        self.cities = cities
+        self.qualities = qualities
+        self.timeout_sec = timeout_sec
+        self.concurrency = max(1, int(concurrency))
+        self.max_url_bytes = int(max_url_bytes)
+        self.store = store
+        self.cache = cache if cache is not None else shared_quote_cache(self.region)
+        self.flight = flight if flight is not None else shared_single_flight()
+        self.governor = governor if governor is not None else governor_for(self.base_url)
+        self.negative_cache = negative_cache
+        self.session = session or make_session(self.concurrency)
+        self.cancel: Optional[threading.Event] = None
+        self.on_request: Optional[Callable[[], None]] = None
+
+    # ---------------- Public ----------------
+
+    def scoped(self, *, cities: List[str], qualities: List[int]) -> "PriceFetcher":
+        """
+        Mismo fetcher (sesión, caches, store, governor) pidiendo solo otras
+        ciudades/calidades. Para grupos de items con necesidades distintas.
+        """
+        if list(cities) == list(self.cities) and list(qualities) == list(self.qualities):
+            return self
+        other = copy.copy(self)
+        other.cities = list(cities)
+        other.qualities = list(qualities)
+        return other
+
+    def cancellable(self, cancel: Optional[threading.Event]) -> "PriceFetcher":
+        """
+        Mismo fetcher, pero que corta con FetchCancelled cuando se setea `cancel`:
+        no arranca más batches ni reintentos, y despierta de las esperas de backoff.
+        """
+        if cancel is None or cancel is self.cancel:
+            return self
+        other = copy.copy(self)
+        other.cancel = cancel
+        return other
+
+    def build_url(self, item_ids: List[str]) -> str:
+        items_str = ",".join(item_ids)
+        loc_str = ",".join(self._encode_location(x) for x in self.cities)
+        qual_str = ",".join(map(str, self.qualities))
+        return f"{self.base_url}/{items_str}.json?locations={loc_str}&qualities={qual_str}"
+
+    def plan_chunks(
+        self,
+        item_ids: List[str],
+        *,
+        max_items: Optional[int] = None,
+        adaptive: bool = True,
+    ) -> List[List[str]]:
+        """
+        Empaqueta item_ids en batches que llenan la URL hasta max_url_bytes
+        (escalado por el batch_scale AIMD del governor; adaptive=False usa el
+        límite configurado tal cual, para planes que no dependan del estado
+        del governor).
+        max_items (opcional) limita además la cantidad de ids por batch.
+        Un id que por sí solo no cabe va en un batch propio (el API decidirá).
+        """
+        scale = self.governor.batch_scale if adaptive else 1.0
+        overhead = len(self.build_url([]).encode("utf-8"))
+        budget = overhead + (self.max_url_bytes - overhead) * scale
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        size = overhead
+
+        for item_id in item_ids:
+            extra = len(item_id.encode("utf-8")) + (1 if current else 0)  # +1 por la coma
+            full = size + extra > budget
+            if max_items is not None and len(current) >= max_items:
+                full = True
+            if current and full:
+                chunks.append(current)
+                current, size = [], overhead
+                extra = len(item_id.encode("utf-8"))
+            current.append(item_id)
+            size += extra
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def fetch_items(
+        self,
+        item_ids: List[str],
+        *,
+        max_items: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> MarketIndex:
+        """
+        MarketIndex para item_ids: cache en memoria -> store SQLite -> upstream.
+        Solo lo que falta en ambos (y no está podado por la cache negativa)
+        se empaqueta y se descarga.
+        """
+        index: MarketIndex = {}
+        for part in self.iter_items(item_ids, max_items=max_items, concurrency=concurrency):
+            index.update(part)
+        return index
+
+    def iter_items(
+        self,
+        item_ids: List[str],
+        *,
+        max_items: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        on_resolved: Optional[Callable[[List[str]], None]] = None,
+    ) -> Iterator[MarketIndex]:
+        """
+        Igual que fetch_items, pero entrega el índice por partes: primero lo
+        que ya estaba en cache/store y después cada batch apenas llega (en
+        orden de llegada, no de plan). Un item viene siempre completo en una
+        sola parte, así que cada parte se puede analizar sola mientras los
+        demás batches siguen en vuelo.
+        Cache, store y cache negativa se actualizan al terminar la descarga
+        (o al cortar antes el consumidor: se guardan los batches que llegaron).
+
+        on_resolved (opcional) recibe los ids que ya tienen respuesta (con o
+        sin precios, o podados), antes de entregar la parte que los trae.
+        """
+        index, missing = self.cache.lookup(item_ids, self.cities, self.qualities)
+
+        if missing and self.store is not None:
+            # lo leído del store no se re-cachea: su TTL ya corre desde otro fetched_at
+            stored, missing = self.store.lookup(missing, self.cities, self.qualities, region=self.region)
+            index.update(stored)
+
+        if on_resolved is not None and len(missing) < len(item_ids):
+            missing_set = set(missing)
+            on_resolved([x for x in item_ids if x not in missing_set])
+
+        if index:
+            yield index
+
+        if missing and self.negative_cache is not None:
+            scope = NegativeCache.scope_for(self.cities, self.qualities)
+            missing, pruned = self.negative_cache.split(missing, scope, region=self.region)
+            if pruned and on_resolved is not None:
+                on_resolved(list(pruned))
+
+        if not missing:
+            return
+
+        fetched: MarketIndex = {}
+        resolved: List[str] = []
+        try:
+            for chunk, rows in self._iter_completed(self.plan_chunks(missing, max_items=max_items), concurrency):
+                part: MarketIndex = {}
+                merge_decoded_rows(part, rows)
+                fetched.update(part)  # los batches no comparten items
+                resolved.extend(chunk)
+                if on_resolved is not None:
+                    on_resolved(chunk)
+                if part:
+                    yield part
+        finally:
+            # solo lo que tuvo respuesta: lo demás sigue vencido para el próximo fetch
+            if resolved:
+                if self.negative_cache is not None:
+                    self.negative_cache.record(resolved, fetched, scope, region=self.region)
+                if self.store is not None:
+                    self.store.save(fetched, resolved, self.cities, self.qualities, region=self.region)
+                self.cache.save(fetched, resolved, self.cities, self.qualities)
+
+    def fetch_index(
+        self,
+        chunks: Iterable[List[str]],
+        *,
+        concurrency: Optional[int] = None,
+        on_request: Optional[Callable[[], None]] = None,
+    ) -> MarketIndex:
+        """
+        Descarga los batches tal cual (sin cache ni store).
+        on_request (opcional) se llama por cada request que sale al upstream,
+        desde el hilo que lo hace: reintentos y mitades de un batch partido
+        (413/414) cuentan, los batches que esperaron a otro (single-flight) no.
+        """
+        f = self
+        if on_request is not None:
+            f = copy.copy(self)
+            f.on_request = on_request
+        index: MarketIndex = {}
+        for rows in f._fetch_all(list(chunks), concurrency):
+            merge_decoded_rows(index, rows)
+        return index
+
+    # ---------------- Internal ----------------
+
+    def _fetch_all(self, chunks: List[List[str]], concurrency: Optional[int]) -> Iterator[List[PriceRow]]:
+        # n hilos como techo; los requests en vuelo los acota el governor (AIMD)
+        n = max(1, int(concurrency or self.concurrency))
+        if n == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield self._fetch_chunk(chunk)
+            return
+
+        # map() conserva el orden de los batches: el merge es idéntico al modo serie
+        with ThreadPoolExecutor(max_workers=min(n, len(chunks))) as pool:
+            yield from pool.map(self._fetch_chunk, chunks)
+
+    def _iter_completed(
+        self, chunks: List[List[str]], concurrency: Optional[int]
+    ) -> Iterator[Tuple[List[str], List[PriceRow]]]:
+        """Como _fetch_all, pero cada batch sale (con sus ids) apenas termina: orden de llegada."""
+        n = max(1, int(concurrency or self.concurrency))
+        if n == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield chunk, self._fetch_chunk(chunk)
+            return
+
+        with ThreadPoolExecutor(max_workers=min(n, len(chunks))) as pool:
+            futures = {pool.submit(self._fetch_chunk, chunk): chunk for chunk in chunks}
+            try:
+                for f in as_completed(futures):
+                    yield futures[f], f.result()
+            finally:
+                # si el consumidor corta antes (o falla un batch), no arrancamos los pendientes
+                for f in futures:
+                    f.cancel()
+
+    def _fetch_chunk(self, chunk: List[str]) -> List[PriceRow]:
+        """
+        Descarga un batch. Si el upstream lo rechaza por tamaño (413/414/431)
+        o hace timeout, lo parte en dos mitades y reintenta cada una.
+        """
+        self._check_cancel()
+        try:
+            return self._get_rows_shared(chunk)
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status not in SPLIT_STATUS_CODES or len(chunk) <= 1:
+                raise
+            return self._fetch_halves(chunk)
+        except requests.Timeout:
+            self.governor.on_error()
+            if len(chunk) <= 1:
+                raise
+            return self._fetch_halves(chunk)
+
+    def _fetch_halves(self, chunk: List[str]) -> List[PriceRow]:
+        mid = len(chunk) // 2
+        return self._fetch_chunk(chunk[:mid]) + self._fetch_chunk(chunk[mid:])
+
+    def _get_rows_shared(self, chunk: List[str]) -> List[PriceRow]:
+        """
+        _get_rows con single-flight: si otro hilo ya está pidiendo exactamente
+        este batch (misma región, ids, ciudades y calidades, en cualquier orden),
+        espera su respuesta en vez de repetir el request. La región va en la
+        clave aunque el host sea el mismo (AURIA_BASE_URL apunta todas al stand-in).
+
+        El `cancel` del que hace el request corta solo a ese caller: si el
+        FetchCancelled compartido viene de otro (su deadline, no el nuestro),
+        este vuelve a entrar al single-flight y pide el batch él mismo.
+        """
+        key = (
+            self.region,
+            self.base_url,
+            tuple(sorted(chunk)),
+            tuple(sorted(self.cities)),
+            tuple(sorted(int(q) for q in self.qualities)),
+        )
+        while True:
+            try:
+                return self.flight.do(key, lambda: self._get_rows(self.build_url(chunk)))
+            except FetchCancelled:
+                if self.cancel is not None and self.cancel.is_set():
+                    raise
+
+    def _get_rows(self, url: str) -> List[PriceRow]:
+        """
+        Descarga y decodifica el body en streaming (ver price_decoder):
+        sin body completo en memoria, sin filas todo-cero ni ciudades ajenas.
+        """
+        cities = frozenset(self.cities)
+
+        def consume(r: requests.Response) -> List[PriceRow]:
+            return list(iter_price_rows(r.iter_content(chunk_size=64 * 1024), cities=cities))
+
+        return self._request(url, consume, stream=True)
+
+    def _request(self, url: str, consume: Callable[[requests.Response], T], *, stream: bool = False) -> T:
+        """
+        GET con reintentos: 429/5xx y errores de conexión (también los que
+        saltan leyendo el body) se reintentan con backoff (Retry-After si
+        viene) hasta governor.max_retries.
+        consume(r) lee el body dentro del slot del governor.
+        """
+        gov = self.governor
+        attempt = 0
+        while True:
+            retry_after: Optional[float] = None
+            self._check_cancel()
+            with gov.slot():
+                self._check_cancel()  # la espera por el slot/token pudo ser larga
+                t0 = time.monotonic()
+                if self.on_request is not None:
+                    self.on_request()
+                try:
+                    r = self.session.get(url, timeout=self.timeout_sec, stream=stream)
+                    if r.status_code not in RETRY_STATUS_CODES:
+                        try:
+                            r.raise_for_status()
+                            result = consume(r)
+                        finally:
+                            r.close()
+                        gov.on_success(time.monotonic() - t0)
+                        return result
+                except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError):
+                    # conexión caída, o timeout / corte mientras se leía el body en streaming
+                    # (requests los reporta como ConnectionError desde iter_content)
+                    gov.on_error()
+                    if attempt >= gov.max_retries:
+                        raise
+                    r = None
+
+            if r is not None:
+                r.close()
+                if r.status_code == 429:
+                    retry_after = gov.parse_retry_after(r.headers.get("Retry-After"))
+                    gov.on_throttle(retry_after)
+                else:
+                    gov.on_error()
+                if attempt >= gov.max_retries:
+                    r.raise_for_status()
+
+            # con Retry-After la espera ya la impone el bucket (pausado para todos los hilos)
+            self._check_cancel()
+            if retry_after is None:
+                self._sleep(gov.backoff_delay(attempt))
+            attempt += 1
+
+    def _check_cancel(self) -> None:
+        if self.cancel is not None and self.cancel.is_set():
+            raise FetchCancelled()
+
+    def _sleep(self, seconds: float) -> None:
+        if self.cancel is None:
+            time.sleep(seconds)
+        elif self.cancel.wait(seconds):
+            raise FetchCancelled()
+
+    @staticmethod
+    def _encode_location(s: str) -> str:
+        return s.strip().replace(" ", "%20")
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from src.infra.market_types import MarketIndex, Quote
+from src.infra.regions import DEFAULT_REGION, normalize_region
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    items: int
+    quotes: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return (self.hits / total) if total else 0.0
+
+
+@dataclass(frozen=True)
+class _Entry:
+    fetched_at: float
+    cities: FrozenSet[str]
+    qualities: FrozenSet[int]
+    city_map: Dict[str, Dict[int, Quote]]
+    n_quotes: int
+
+
+class QuoteCache:
+    """
+    Cache en memoria LRU + TTL de Quotes, compartida por todo el proceso
+    (ver shared_quote_cache). Misma interfaz que QuoteStore:
+
+      lookup(item_ids, cities, qualities) -> (index_fresco, item_ids_faltantes)
+      save(index, item_ids, cities, qualities)
+
+    Una entrada por item (con todas sus Quotes). El tamaño se acota por
+    cantidad total de Quotes: al pasarse, se expulsan los items menos usados.
+    """
+
+    DEFAULT_TTL_SEC = 60
+    DEFAULT_MAX_QUOTES = 500_000
+
+    def __init__(self, *, ttl_sec: float = DEFAULT_TTL_SEC, max_quotes: int = DEFAULT_MAX_QUOTES) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_quotes = int(max_quotes)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._n_quotes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    # ---------------- Public ----------------
+
+    def lookup(
+        self,
+        item_ids: Sequence[str],
+        cities: Sequence[str],
+        qualities: Sequence[int],
+        *,
+        now: Optional[float] = None,
+    ) -> Tuple[MarketIndex, List[str]]:
+        now = time.time() if now is None else now
+        min_ts = now - self.ttl_sec
+        want_cities = frozenset(cities)
+        want_qualities = frozenset(int(q) for q in qualities)
+
+        index: MarketIndex = {}
+        missing: List[str] = []
+
+        with self._lock:
+            for item_id in item_ids:
+                e = self._entries.get(item_id)
+                if e is None or e.fetched_at < min_ts:
+                    if e is not None:
+                        self._drop(item_id)
+                    missing.append(item_id)
+                    continue
+                if not (want_cities <= e.cities and want_qualities <= e.qualities):
+                    missing.append(item_id)
+                    continue
+
+                self._entries.move_to_end(item_id)
+                # copia filtrada: el caller nunca ve (ni toca) los dicts internos
+                city_map = {
+                    city: {q: quote for q, quote in qmap.items() if q in want_qualities}
+                    for city, qmap in e.city_map.items()
+                    if city in want_cities
+                }
+                city_map = {c: qm for c, qm in city_map.items() if qm}
+                if city_map:
+                    index[item_id] = city_map
+
+            self._hits += len(item_ids) - len(missing)
+            self._misses += len(missing)
+
+        return index, missing
+
+    def save(
+        self,
+        index: MarketIndex,
+        item_ids: Iterable[str],
+        cities: Sequence[str],
+        qualities: Sequence[int],
+        *,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        ts = time.time() if fetched_at is None else fetched_at
+        cities_set = frozenset(cities)
+        qualities_set = frozenset(int(q) for q in qualities)
+
+        with self._lock:
+            for item_id in item_ids:
+                city_map = {city: dict(qmap) for city, qmap in index.get(item_id, {}).items()}
+                n = sum(len(qmap) for qmap in city_map.values())
+
+                self._drop(item_id)
+                self._entries[item_id] = _Entry(ts, cities_set, qualities_set, city_map, n)
+                self._n_quotes += n
+
+            while self._n_quotes > self.max_quotes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._evictions += 1
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                items=len(self._entries),
+                quotes=self._n_quotes,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._n_quotes = 0
+
+    # ---------------- Internal ----------------
+
+    def _drop(self, item_id: str) -> None:
+        e = self._entries.pop(item_id, None)
+        if e is not None:
+            self._n_quotes -= e.n_quotes
+
+
+_SHARED_CACHES: Dict[str, QuoteCache] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_quote_cache(region: str = DEFAULT_REGION) -> QuoteCache:
+    """
+    Instancia única del proceso por región: la usan todos los analyzers y routers.
+    Los precios de un servidor no sirven para otro, así que no se mezclan.
+    """
+    key = normalize_region(region)
+    with _SHARED_LOCK:
+        cache = _SHARED_CACHES.get(key)
+        if cache is None:
+            cache = _SHARED_CACHES[key] = QuoteCache()
+        return cache
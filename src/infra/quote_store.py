@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from src.infra.market_types import MarketIndex, Quote
+from src.infra.regions import DEFAULT_REGION
+
+# SQLite limita los parámetros por sentencia; consultamos los IN (...) por tramos
+_SQL_IN_CHUNK = 500
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS quotes (
+  region TEXT NOT NULL,                  -- servidor: west | east | europe
+  item_id TEXT NOT NULL,
+  city TEXT NOT NULL,
+  quality INTEGER NOT NULL,
+  sell_min INTEGER NOT NULL,
+  sell_max INTEGER NOT NULL,
+  buy_min INTEGER NOT NULL,
+  buy_max INTEGER NOT NULL,
+  sell_min_date TEXT NOT NULL DEFAULT '',
+  sell_max_date TEXT NOT NULL DEFAULT '',
+  buy_min_date TEXT NOT NULL DEFAULT '',
+  buy_max_date TEXT NOT NULL DEFAULT '',
+  fetched_at REAL NOT NULL,              -- epoch (segundos)
+  PRIMARY KEY (region, item_id, city, quality)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS quote_fetches (
+  region TEXT NOT NULL,
+  item_id TEXT NOT NULL,
+  cities TEXT NOT NULL,                  -- CSV de ciudades pedidas
+  qualities TEXT NOT NULL,               -- CSV de calidades pedidas
+  fetched_at REAL NOT NULL,
+  PRIMARY KEY (region, item_id)
+) WITHOUT ROWID;
+"""
+
+
+class QuoteStore:
+    """
+    Cache persistente de cotizaciones en SQLite (misma DB que el catálogo).
+
+      - quotes:        última Quote no-cero por (item_id, city, quality)
+      - quote_fetches: cuándo se pidió cada item y con qué ciudades/calidades
+                       (un item sin ninguna fila no-cero también queda "fresco")
+
+    Read-through: lookup() devuelve lo fresco (<= ttl_sec) y la lista de items
+    que hay que pedir; save() guarda un refresh completo en una sola transacción.
+    Todo va por región (servidor del juego): cada una tiene sus propios precios.
+    """
+
+    DEFAULT_TTL_SEC = 300
+
+    def __init__(self, db_path: Path, *, ttl_sec: float = DEFAULT_TTL_SEC) -> None:
+        self.db_path = Path(db_path)
+        self.ttl_sec = float(ttl_sec)
+        self._ensure_schema()
+
+    # ---------------- Public ----------------
+
+    def lookup(
+        self,
+        item_ids: Sequence[str],
+        cities: Sequence[str],
+        qualities: Sequence[int],
+        *,
+        region: str = DEFAULT_REGION,
+        now: Optional[float] = None,
+    ) -> Tuple[MarketIndex, List[str]]:
+        """
+        Retorna (index_con_lo_fresco, item_ids_a_descargar), respetando el orden de item_ids.
+        Un item es fresco si se pidió hace <= ttl_sec con (al menos) esas ciudades y calidades.
+        """
+        now = time.time() if now is None else now
+        min_ts = now - self.ttl_sec
+        want_cities = set(cities)
+        want_qualities = {int(q) for q in qualities}
+
+        fresh: List[str] = []
+        con = self._connect()
+        try:
+            for part in self._parts(item_ids):
+                rows = con.execute(
+                    f"SELECT item_id, cities, qualities, fetched_at FROM quote_fetches "
+                    f"WHERE region = ? AND item_id IN ({','.join('?' * len(part))})",
+                    [region, *part],
+                ).fetchall()
+                for item_id, cities_csv, qualities_csv, fetched_at in rows:
+                    if fetched_at < min_ts:
+                        continue
+                    if not want_cities.issubset(cities_csv.split(",")):
+                        continue
+                    if not want_qualities.issubset(int(q) for q in qualities_csv.split(",")):
+                        continue
+                    fresh.append(item_id)
+
+            index: MarketIndex = {}
+            for part in self._parts(fresh):
+                rows = con.execute(
+                    f"SELECT item_id, city, quality, sell_min, sell_max, buy_min, buy_max, "
+                    f"sell_min_date, sell_max_date, buy_min_date, buy_max_date "
+                    f"FROM quotes WHERE region = ? AND item_id IN ({','.join('?' * len(part))})",
+                    [region, *part],
+                ).fetchall()
+                for r in rows:
+                    if r[1] not in want_cities or r[2] not in want_qualities:
+                        continue
+                    index.setdefault(r[0], {}).setdefault(r[1], {})[int(r[2])] = Quote(*r[3:])
+        finally:
+            con.close()
+
+        fresh_set = set(fresh)
+        missing = [x for x in item_ids if x not in fresh_set]
+        return index, missing
+
+    def save(
+        self,
+        index: MarketIndex,
+        item_ids: Iterable[str],
+        cities: Sequence[str],
+        qualities: Sequence[int],
+        *,
+        region: str = DEFAULT_REGION,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        """
+        Reemplaza lo guardado para item_ids por el contenido de index (bulk, 1 transacción).
+        item_ids son TODOS los pedidos, incluso los que no trajeron filas.
+        """
+        ts = time.time() if fetched_at is None else fetched_at
+        ids = list(dict.fromkeys(item_ids))
+        if not ids:
+            return
+
+        cities_csv = ",".join(cities)
+        qualities_csv = ",".join(str(int(q)) for q in qualities)
+
+        quote_rows = [
+            (
+                region, item_id, city, int(quality),
+                q.sell_min, q.sell_max, q.buy_min, q.buy_max,
+                q.sell_min_date, q.sell_max_date, q.buy_min_date, q.buy_max_date,
+                ts,
+            )
+            for item_id in ids
+            for city, qmap in index.get(item_id, {}).items()
+            for quality, q in qmap.items()
+        ]
+
+        con = self._connect()
+        try:
+            with con:
+                con.executemany(
+                    "DELETE FROM quotes WHERE region = ? AND item_id = ?", [(region, x) for x in ids]
+                )
+                con.executemany(
+                    "INSERT INTO quotes(region, item_id, city, quality, sell_min, sell_max, buy_min, buy_max, "
+                    "sell_min_date, sell_max_date, buy_min_date, buy_max_date, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    quote_rows,
+                )
+                con.executemany(
+                    "INSERT OR REPLACE INTO quote_fetches(region, item_id, cities, qualities, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(region, x, cities_csv, qualities_csv, ts) for x in ids],
+                )
+        finally:
+            con.close()
+
+    # ---------------- Internal ----------------
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _ensure_schema(self) -> None:
+        con = self._connect()
+        try:
+            con.executescript(SCHEMA_SQL)
+        finally:
+            con.close()
+
+    @staticmethod
+    def _parts(items: Sequence[str]):
+        items = list(items)
+        for i in range(0, len(items), _SQL_IN_CHUNK):
+            yield items[i : i + _SQL_IN_CHUNK]
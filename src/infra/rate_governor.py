@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import os
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+from src.infra.regions import REGION_BASE_URLS
+
+# Hosts con la cuota del Albion Data API: ahí rige el default (55/min)
+API_HOSTS = frozenset(urlsplit(u).netloc for u in REGION_BASE_URLS.values())
+
+# Para otros hosts (localhost, el stand-in src/scripts/fake_albion_api.py) no
+# hay cuota que cuidar: el bucket queda prácticamente abierto
+UNMETERED_RATE_PER_MIN = 60_000
+UNMETERED_BURST = 1_000
+
+# Override del límite sostenido (requests/min) para cualquier host
+ENV_RATE_PER_MIN = "AURIA_RATE_PER_MIN"
+
+
+class TokenBucket:
+    """
+    Token bucket clásico: `rate_per_sec` tokens/s, hasta `burst` acumulados.
+    acquire() bloquea hasta que haya un token.
+    """
+
+    def __init__(self, rate_per_sec: float, burst: int) -> None:
+        self.rate_per_sec = float(rate_per_sec)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate_per_sec)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate_per_sec
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Vacía el bucket: el próximo token sale en `seconds` como mínimo
+        (p.ej. tras un 429 con Retry-After). Pausas que se solapan no se
+        suman: varios 429 simultáneos frenan el host una sola vez.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate_per_sec)
+            self._last = now
+            self._tokens = min(self._tokens, 1.0 - seconds * self.rate_per_sec)
+
+
+class RateGovernor:
+    """
+    Gobernador del upstream (uno por host, compartido por todo el proceso):
+
+      - token bucket: requests/min sostenido + ráfaga
+      - backoff exponencial con jitter, respetando Retry-After
+      - AIMD sobre la concurrencia (requests en vuelo) y el tamaño de batch:
+          * éxito con latencia <= target: suma (additive increase)
+          * 429 / 5xx / timeout / latencia alta: multiplica por `decrease` (multiplicative decrease)
+            (un 429 solo baja la concurrencia: achicar batches gastaría más cuota)
+
+    Defaults pensados para el Albion Data API (180 req/min y 300 req/5 min):
+    55/min + ráfaga de 20 queda debajo de ambos límites.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate_per_min: float = 55,
+        burst: int = 20,
+        max_retries: int = 4,
+        base_backoff_sec: float = 1.0,
+        max_backoff_sec: float = 60.0,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        target_latency_sec: float = 3.0,
+        min_batch_scale: float = 0.25,
+        decrease: float = 0.5,
+    ) -> None:
+        self.bucket = TokenBucket(rate_per_min / 60.0, burst)
+        self.max_retries = int(max_retries)
+        self.base_backoff_sec = float(base_backoff_sec)
+        self.max_backoff_sec = float(max_backoff_sec)
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.max_concurrency = max(self.min_concurrency, int(max_concurrency))
+        self.target_latency_sec = float(target_latency_sec)
+        self.min_batch_scale = float(min_batch_scale)
+        self.decrease = float(decrease)
+
+        self._limit = float(self.max_concurrency)
+        self._batch_scale = 1.0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+        self.successes = 0
+        self.throttled = 0
+        self.errors = 0
+
+    # ---------------- estado AIMD ----------------
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.min_concurrency, int(self._limit))
+
+    @property
+    def batch_scale(self) -> float:
+        """Fracción (min_batch_scale..1) del presupuesto de URL a usar por batch."""
+        return self._batch_scale
+
+    # ---------------- uso ----------------
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Ocupa un lugar de concurrencia (según el límite AIMD actual) y un token.
+        """
+        with self._cond:
+            while self._in_flight >= self.concurrency:
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def on_success(self, latency_sec: float) -> None:
+        with self._cond:
+            self.successes += 1
+            if latency_sec > 2 * self.target_latency_sec:
+                self._decrease()
+                return
+            if latency_sec <= self.target_latency_sec:
+                self._limit = min(self.max_concurrency, self._limit + 1.0 / max(self._limit, 1.0))
+                self._batch_scale = min(1.0, self._batch_scale + 0.05)
+            self._cond.notify_all()
+
+    def on_throttle(self, retry_after_sec: Optional[float]) -> None:
+        """429: baja la concurrencia y, si vino Retry-After, frena el bucket ese tiempo."""
+        with self._cond:
+            self.throttled += 1
+            # 429 es de cuota, no de tamaño: batches más chicos solo gastarían más requests
+            self._decrease(shrink_batch=False)
+        if retry_after_sec:
+            self.bucket.pause(min(self.max_backoff_sec, retry_after_sec))
+
+    def on_error(self) -> None:
+        """5xx / timeout / conexión caída: bajan concurrencia y tamaño de batch."""
+        with self._cond:
+            self.errors += 1
+            self._decrease()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+        Backoff exponencial con "full jitter" (para errores sin Retry-After;
+        con Retry-After la espera la impone on_throttle pausando el bucket).
+        """
+        cap = min(self.max_backoff_sec, self.base_backoff_sec * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            dt = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+    # ---------------- internal ----------------
+
+    def _decrease(self, *, shrink_batch: bool = True) -> None:
+        self._limit = max(float(self.min_concurrency), self._limit * self.decrease)
+        if shrink_batch:
+            self._batch_scale = max(self.min_batch_scale, self._batch_scale * self.decrease)
+
+
+_GOVERNORS: Dict[str, RateGovernor] = {}
+_GOVERNORS_LOCK = threading.Lock()
+
+
+def governor_for(base_url: str) -> RateGovernor:
+    """
+    Un RateGovernor por host (el presupuesto del upstream es por host).
+    Solo los hosts del Albion Data API llevan el límite de 55/min; AURIA_RATE_PER_MIN
+    fija otro valor para todos los hosts.
+    """
+    host = urlsplit(base_url).netloc or base_url
+    with _GOVERNORS_LOCK:
+        gov = _GOVERNORS.get(host)
+        if gov is None:
+            gov = _GOVERNORS[host] = RateGovernor(**_limits_for_host(host))
+        return gov
+
+
+def _limits_for_host(host: str) -> Dict[str, float]:
+    override = os.getenv(ENV_RATE_PER_MIN)
+    if override:
+        return {"rate_per_min": float(override)}
+    if host in API_HOSTS:
+        return {}
+    return {"rate_per_min": UNMETERED_RATE_PER_MIN, "burst": UNMETERED_BURST}
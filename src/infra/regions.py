@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Sequence, TypeVar
+
+# Un host del Albion Data Project por servidor del juego
+REGION_BASE_URLS: Dict[str, str] = {
+    "west": "https://west.albion-online-data.com/api/v2/stats/prices",
+    "east": "https://east.albion-online-data.com/api/v2/stats/prices",
+    "europe": "https://europe.albion-online-data.com/api/v2/stats/prices",
+}
+
+DEFAULT_REGION = "west"
+
+# Override por entorno (p.ej. el stand-in local src/scripts/fake_albion_api.py):
+#   AURIA_BASE_URL_<REGION>  -> solo esa región (AURIA_BASE_URL_EUROPE=...)
+#   AURIA_BASE_URL           -> todas las regiones
+ENV_BASE_URL = "AURIA_BASE_URL"
+
+T = TypeVar("T")
+
+
+def normalize_region(region: str) -> str:
+    """'West ' -> 'west'. ValueError si el servidor no existe."""
+    key = (region or "").strip().lower()
+    if key not in REGION_BASE_URLS:
+        raise ValueError(f"región desconocida: {region!r} (usa {', '.join(REGION_BASE_URLS)})")
+    return key
+
+
+def base_url_for_region(region: str) -> str:
+    key = normalize_region(region)
+    return (
+        os.getenv(f"{ENV_BASE_URL}_{key.upper()}")
+        or os.getenv(ENV_BASE_URL)
+        or REGION_BASE_URLS[key]
+    )
+
+
+def run_per_region(regions: Sequence[str], fn: Callable[[str], T]) -> Dict[str, T]:
+    """
+    fn(region) para cada región, todas en paralelo (un hilo por región).
+    Cada región tiene su host y por lo tanto su propio RateGovernor:
+    no compiten por el mismo presupuesto de requests.
+    """
+    keys = list(dict.fromkeys(normalize_region(r) for r in regions))
+    if len(keys) <= 1:
+        return {r: fn(r) for r in keys}
+    with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+        return dict(zip(keys, pool.map(fn, keys)))
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Variables de entorno (routers, página de Streamlit y scripts demo_* las leen vía make_session)
+ENV_MODE = "AURIA_REPLAY"                   # record | replay  (vacío = upstream real)
+ENV_DIR = "AURIA_REPLAY_DIR"                # default: data/replay
+ENV_LATENCY_MS = "AURIA_REPLAY_LATENCY_MS"  # latencia simulada al reproducir
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_REPLAY_DIR = ROOT / "data" / "replay"
+
+MODES = ("record", "replay")
+
+
+@dataclass(frozen=True)
+class ReplayConfig:
+    mode: str          # "record" | "replay"
+    directory: Path
+    latency_ms: int = 0
+
+
+def replay_config_from_env() -> Optional[ReplayConfig]:
+    mode = os.getenv(ENV_MODE, "").strip().lower()
+    if not mode:
+        return None
+    if mode not in MODES:
+        raise ValueError(f"{ENV_MODE}={mode!r} inválido (usa {' | '.join(MODES)})")
+    return ReplayConfig(
+        mode=mode,
+        directory=Path(os.getenv(ENV_DIR) or DEFAULT_REPLAY_DIR),
+        latency_ms=int(os.getenv(ENV_LATENCY_MS, "0") or 0),
+    )
+
+
+@dataclass(frozen=True)
+class BatchRequest:
+    """Lo que pide una URL de /stats/prices: host+ruta, ids, ciudades y calidades."""
+    prefix: str                   # host + ruta sin el segmento de ids
+    item_ids: List[str]
+    cities: FrozenSet[str]
+    qualities: FrozenSet[str]     # vacío = el request no filtró calidades
+
+    def covers(self) -> Set[str]:
+        """Pares "ciudad|calidad" pedidos ('*' = cualquier calidad)."""
+        qualities = self.qualities or {"*"}
+        return {f"{c}|{q}" for c in self.cities for q in qualities}
+
+    def wants(self, row: dict) -> bool:
+        city = row.get("city") or row.get("location")
+        if self.cities and city not in self.cities:
+            return False
+        return not self.qualities or str(row.get("quality")) in self.qualities
+
+
+def parse_batch_url(url: str) -> BatchRequest:
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    prefix, ids_str = path.rsplit("/", 1) if "/" in path else ("", path)
+    if ids_str.endswith(".json"):
+        ids_str = ids_str[: -len(".json")]
+    qs = parse_qs(parts.query)
+
+    def _csv(name: str) -> FrozenSet[str]:
+        return frozenset(x.strip() for x in ",".join(qs.get(name, [])).split(",") if x.strip())
+
+    return BatchRequest(
+        prefix=f"{parts.netloc}{prefix}",
+        item_ids=list(dict.fromkeys(x for x in ids_str.split(",") if x)),
+        cities=_csv("locations"),
+        qualities=_csv("qualities"),
+    )
+
+
+def item_key(prefix: str, item_id: str) -> str:
+    """Clave de la grabación de un item: host + ruta + item_id."""
+    return hashlib.sha1(f"{prefix}|{item_id}".encode("utf-8")).hexdigest()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Transport adapter de requests:
+
+      - record: pide al upstream real y, por cada respuesta 200, guarda las
+        filas de cada item en <dir>/<clave del item>.json.gz junto con los
+        pares ciudad|calidad pedidos (aunque no hayan traído filas), más una
+        línea en <dir>/index.jsonl con la URL y sus items
+      - replay: no toca la red; arma la respuesta con las filas grabadas de
+        los items del batch, filtradas a sus ciudades/calidades (con latencia
+        opcional). Responde 404 solo si algún item/ciudad/calidad pedido nunca
+        se grabó
+
+    Como se graba por item, el batch reproducido no tiene que coincidir con
+    el grabado: el empaquetado depende del store, la cache negativa y el
+    batch_scale AIMD del governor, que cambian de una corrida a otra.
+
+    Va por debajo de PriceFetcher: governor, reintentos y decoder no cambian.
+    """
+
+    def __init__(self, config: ReplayConfig, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.config = config
+        self._lock = threading.Lock()
+        if config.mode == "record":
+            config.directory.mkdir(parents=True, exist_ok=True)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        batch = parse_batch_url(request.url)
+        if self.config.mode == "replay":
+            return self._replay(request, batch)
+
+        r = super().send(request, **kwargs)
+        if r.status_code == 200:
+            self._record(batch, request.url, r.content)  # r.content lo deja leído: iter_content sigue andando
+        return r
+
+    # ---------------- internal ----------------
+
+    def _path(self, key: str) -> Path:
+        return self.config.directory / f"{key}.json.gz"
+
+    def _load(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return json.loads(gzip.decompress(path.read_bytes()))
+
+    def _record(self, batch: BatchRequest, url: str, body: bytes) -> None:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return
+        if not isinstance(data, list):
+            return
+
+        rows_by_item: Dict[str, List[dict]] = {x: [] for x in batch.item_ids}
+        for row in data:
+            if isinstance(row, dict) and row.get("item_id") in rows_by_item:
+                rows_by_item[row["item_id"]].append(row)
+
+        covers = batch.covers()
+        with self._lock:
+            for item_id, rows in rows_by_item.items():
+                key = item_key(batch.prefix, item_id)
+                rec = self._load(key) or {"item_id": item_id, "covers": [], "rows": []}
+                # lo nuevo pisa lo grabado para los mismos ciudad|calidad
+                kept = [
+                    row for row in rec["rows"]
+                    if f"{row.get('city') or row.get('location')}|{row.get('quality')}" not in covers
+                    and f"{row.get('city') or row.get('location')}|*" not in covers
+                ]
+                rec["rows"] = kept + rows
+                rec["covers"] = sorted(set(rec["covers"]) | covers)
+
+                tmp = self._path(key).with_suffix(".tmp")
+                tmp.write_bytes(gzip.compress(json.dumps(rec).encode("utf-8")))
+                tmp.replace(self._path(key))
+
+            with open(self.config.directory / "index.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps({"url": url, "items": batch.item_ids, "recorded_at": time.time()}) + "\n")
+
+    def _replay(self, request: requests.PreparedRequest, batch: BatchRequest) -> requests.Response:
+        if self.config.latency_ms > 0:
+            time.sleep(self.config.latency_ms / 1000.0)
+
+        rows: List[dict] = []
+        missing: List[str] = []
+        for item_id in batch.item_ids:
+            rec = self._load(item_key(batch.prefix, item_id))
+            if rec is None or not self._covered(batch, set(rec["covers"])):
+                missing.append(item_id)
+                continue
+            rows.extend(row for row in rec["rows"] if batch.wants(row))
+
+        if missing:
+            status = 404
+            body = json.dumps({"error": f"items no grabados: {','.join(missing)}"}).encode("utf-8")
+        else:
+            status, body = 200, json.dumps(rows, separators=(",", ":")).encode("utf-8")
+
+        r = requests.Response()
+        r.status_code = status
+        r.reason = "OK" if status == 200 else "Not Recorded"
+        r.url = request.url
+        r.request = request
+        r.headers["Content-Type"] = "application/json"
+        r.headers["Content-Length"] = str(len(body))
+        r._content = body
+        r._content_consumed = True
+        r.encoding = "utf-8"
+        return r
+
+    @staticmethod
+    def _covered(batch: BatchRequest, recorded: Set[str]) -> bool:
+        for pair in batch.covers():
+            city = pair.split("|", 1)[0]
+            if pair not in recorded and f"{city}|*" not in recorded:
+                return False
+        return True
+
+
+def install_replay(session: requests.Session, *, pool_maxsize: int = 10) -> Optional[ReplayConfig]:
+    """Si hay AURIA_REPLAY, monta el ReplayAdapter en la sesión. Devuelve la config usada."""
+    config = replay_config_from_env()
+    if config is None:
+        return None
+    adapter = ReplayAdapter(config, pool_connections=4, pool_maxsize=max(1, int(pool_maxsize)))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return config
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS scan_jobs (
+  scan_id TEXT PRIMARY KEY,
+  region TEXT NOT NULL,
+  params TEXT NOT NULL,                  -- JSON con los parámetros de CatalogBMAnalyzer.run
+  created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scan_tasks (
+  scan_id TEXT NOT NULL,
+  shard TEXT NOT NULL,                   -- slug de categoría
+  status TEXT NOT NULL,                  -- pending | leased | done | failed
+  worker_id TEXT,
+  lease_until REAL NOT NULL DEFAULT 0,   -- epoch; vencido = otro worker lo puede tomar
+  attempts INTEGER NOT NULL DEFAULT 0,
+  result TEXT,                           -- JSON del CategoryRun
+  error TEXT,
+  updated_at REAL NOT NULL,
+  PRIMARY KEY (scan_id, shard)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_scan_tasks_status ON scan_tasks(scan_id, status);
+"""
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class ScanJob:
+    scan_id: str
+    region: str
+    params: Dict[str, Any]
+    created_at: float
+
+
+@dataclass(frozen=True)
+class ScanTask:
+    scan_id: str
+    shard: str
+    attempts: int
+
+
+@dataclass(frozen=True)
+class ScanProgress:
+    pending: int
+    leased: int
+    done: int
+    failed: int
+
+    @property
+    def total(self) -> int:
+        return self.pending + self.leased + self.done + self.failed
+
+    @property
+    def finished(self) -> bool:
+        return self.pending == 0 and self.leased == 0
+
+
+class ScanQueue:
+    """
+    Cola de trabajo durable en SQLite (misma DB que el catálogo) para repartir
+    un scan entre varios procesos o máquinas que comparten el archivo.
+
+      - scan_jobs:  un scan = región + parámetros (JSON)
+      - scan_tasks: un shard por fila (hoy una categoría) con su estado
+
+    Los workers toman shards con lease(): la transacción es BEGIN IMMEDIATE,
+    así dos procesos nunca se llevan el mismo. El lease vence a los lease_sec;
+    si un worker muere, su shard vuelve a estar disponible para otro
+    (hasta max_attempts intentos; agotados, la fila pasa a failed). El resultado de cada shard se guarda
+    como texto (JSON) y lo junta el coordinador.
+    """
+
+    DEFAULT_LEASE_SEC = 120
+    DEFAULT_MAX_ATTEMPTS = 3
+
+    def __init__(self, db_path: Path, *, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> None:
+        self.db_path = Path(db_path)
+        self.max_attempts = int(max_attempts)
+        self._ensure_schema()
+
+    # ---------------- Public ----------------
+
+    def create(self, *, region: str, shards: Sequence[str], params: Dict[str, Any]) -> str:
+        scan_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute(
+                "INSERT INTO scan_jobs (scan_id, region, params, created_at) VALUES (?, ?, ?, ?)",
+                (scan_id, region, json.dumps(params, sort_keys=True), now),
+            )
+            con.executemany(
+                "INSERT INTO scan_tasks (scan_id, shard, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(scan_id, s, PENDING, now) for s in dict.fromkeys(shards)],
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+        return scan_id
+
+    def job(self, scan_id: str) -> Optional[ScanJob]:
+        con = self._connect()
+        try:
+            row = con.execute(
+                "SELECT scan_id, region, params, created_at FROM scan_jobs WHERE scan_id = ?",
+                (scan_id,),
+            ).fetchone()
+        finally:
+            con.close()
+        if row is None:
+            return None
+        return ScanJob(scan_id=row[0], region=row[1], params=json.loads(row[2]), created_at=row[3])
+
+    def latest_scan_id(self) -> Optional[str]:
+        con = self._connect()
+        try:
+            row = con.execute("SELECT scan_id FROM scan_jobs ORDER BY created_at DESC LIMIT 1").fetchone()
+        finally:
+            con.close()
+        return row[0] if row else None
+
+    def lease(self, scan_id: str, worker_id: str, *, lease_sec: float = DEFAULT_LEASE_SEC) -> Optional[ScanTask]:
+        """Toma un shard pendiente (o con lease vencido). None si no queda nada para tomar."""
+        now = time.time()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            self._expire_leases(con, scan_id, now)
+            row = con.execute(
+                """
+                SELECT shard, attempts FROM scan_tasks
+                 WHERE scan_id = ?
+                   AND (status = ? OR (status = ? AND lease_until < ?))
+                   AND attempts < ?
+                 ORDER BY attempts, shard
+                 LIMIT 1
+                """,
+                (scan_id, PENDING, LEASED, now, self.max_attempts),
+            ).fetchone()
+            if row is None:
+                con.execute("COMMIT")
+                return None
+            shard, attempts = row
+            con.execute(
+                """
+                UPDATE scan_tasks
+                   SET status = ?, worker_id = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?
+                 WHERE scan_id = ? AND shard = ?
+                """,
+                (LEASED, worker_id, now + lease_sec, now, scan_id, shard),
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+        return ScanTask(scan_id=scan_id, shard=shard, attempts=attempts + 1)
+
+    def heartbeat(self, task: ScanTask, worker_id: str, *, lease_sec: float = DEFAULT_LEASE_SEC) -> bool:
+        """Extiende el lease. False si el shard ya no es de este worker (venció y lo tomó otro)."""
+        now = time.time()
+        return self._update(
+            "UPDATE scan_tasks SET lease_until = ?, updated_at = ? "
+            "WHERE scan_id = ? AND shard = ? AND status = ? AND worker_id = ?",
+            (now + lease_sec, now, task.scan_id, task.shard, LEASED, worker_id),
+        )
+
+    def complete(self, task: ScanTask, result: str) -> bool:
+        """
+        Guarda el resultado del shard. Si el lease se había vencido y otro lo
+        terminó antes, gana el primero (los dos resultados son equivalentes).
+        """
+        return self._update(
+            "UPDATE scan_tasks SET status = ?, result = ?, error = NULL, updated_at = ? "
+            "WHERE scan_id = ? AND shard = ? AND status != ?",
+            (DONE, result, time.time(), task.scan_id, task.shard, DONE),
+        )
+
+    def fail(self, task: ScanTask, error: str) -> None:
+        """Devuelve el shard a la cola; tras max_attempts queda failed."""
+        status = FAILED if task.attempts >= self.max_attempts else PENDING
+        self._update(
+            "UPDATE scan_tasks SET status = ?, error = ?, lease_until = 0, updated_at = ? "
+            "WHERE scan_id = ? AND shard = ? AND status = ?",
+            (status, error, time.time(), task.scan_id, task.shard, LEASED),
+        )
+
+    def progress(self, scan_id: str) -> ScanProgress:
+        con = self._connect()
+        try:
+            self._expire_leases(con, scan_id, time.time())
+            rows = con.execute(
+                "SELECT status, COUNT(*) FROM scan_tasks WHERE scan_id = ? GROUP BY status",
+                (scan_id,),
+            ).fetchall()
+        finally:
+            con.close()
+
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return ScanProgress(pending=counts[PENDING], leased=counts[LEASED], done=counts[DONE], failed=counts[FAILED])
+
+    def results(self, scan_id: str) -> Dict[str, str]:
+        """shard -> resultado, solo de los terminados (en orden de shard)."""
+        con = self._connect()
+        try:
+            rows = con.execute(
+                "SELECT shard, result FROM scan_tasks WHERE scan_id = ? AND status = ? ORDER BY shard",
+                (scan_id, DONE),
+            ).fetchall()
+        finally:
+            con.close()
+        return {shard: result for shard, result in rows}
+
+    def failed_shards(self, scan_id: str) -> List[str]:
+        con = self._connect()
+        try:
+            self._expire_leases(con, scan_id, time.time())
+            rows = con.execute(
+                "SELECT shard FROM scan_tasks WHERE scan_id = ? AND status = ? ORDER BY shard",
+                (scan_id, FAILED),
+            ).fetchall()
+        finally:
+            con.close()
+        return [r[0] for r in rows]
+
+    # ---------------- internal ----------------
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: las transacciones las abrimos a mano (BEGIN IMMEDIATE)
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _expire_leases(self, con: sqlite3.Connection, scan_id: str, now: float) -> None:
+        """Lease vencido sin intentos restantes: nadie lo va a volver a tomar, queda failed."""
+        con.execute(
+            "UPDATE scan_tasks SET status = ?, error = COALESCE(error, 'lease vencido'), updated_at = ? "
+            "WHERE scan_id = ? AND status = ? AND lease_until < ? AND attempts >= ?",
+            (FAILED, now, scan_id, LEASED, now, self.max_attempts),
+        )
+
+    def _update(self, sql: str, params: tuple) -> bool:
+        con = self._connect()
+        try:
+            cur = con.execute(sql, params)
+            return cur.rowcount > 0
+        finally:
+            con.close()
+
+    def _ensure_schema(self) -> None:
+        con = self._connect()
+        try:
+            con.executescript(SCHEMA_SQL)
+        finally:
+            con.close()
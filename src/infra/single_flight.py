@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce llamadas concurrentes con la misma key: el primero ejecuta fn(),
+    los demás esperan y reciben el MISMO resultado (o la misma excepción).
+
+    No es una cache: cuando la llamada termina la key se libera y la próxima
+    vuelve a ejecutar fn(). El resultado compartido no se debe mutar.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.shared = 0  # llamadas que se ahorraron esperando a otra
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+
+_SHARED_FLIGHT = SingleFlight()
+
+
+def shared_single_flight() -> SingleFlight:
+    """Instancia única del proceso: coalesce batches idénticos de cualquier query."""
+    return _SHARED_FLIGHT
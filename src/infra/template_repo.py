@@ -5,6 +5,10 @@ from pathlib import Path
 from typing import List, Optional, Tuple
 import sqlite3
 
+from src.infra.catalog_repo import parse_qualities
+
+ALL_QUALITIES: Tuple[int, ...] = (1, 2, 3, 4, 5)
+
 
 @dataclass(frozen=True)
 class TemplateSpec:
@@ -13,6 +17,8 @@ class TemplateSpec:
     tier_max: int
     ench_min: int
     ench_max: int
+    qualities: Tuple[int, ...] = ALL_QUALITIES
+    cities: Optional[Tuple[str, ...]] = None   # None = todas las ciudades
 
 
 class TemplateRepository:
@@ -24,8 +30,13 @@ class TemplateRepository:
       - tabla de templates: tiene 'template_key', 'tier_min', 'tier_max', 'ench_min', 'ench_max'
       - tabla puente (opcional): tiene 'template_id' y 'category_id'
         Si no existe, intenta relación directa desde templates vía 'category_id' o 'category_slug'.
+
+    Columnas opcionales de templates: 'qualities' y 'cities' (CSV); si no
+    existen se asumen todas las calidades / todas las ciudades.
     """
 
+    OPTIONAL_TEMPLATE_COLS = ("qualities", "cities")
+
     TEMPLATE_COLS = {"template_key", "tier_min", "tier_max", "ench_min", "ench_max"}
     CATEGORY_COLS = {"slug"}
 
@@ -57,6 +68,9 @@ class TemplateRepository:
 
             bridge = self._find_bridge_table(con, prefer=["template_categories", "category_templates", "template_category"])
 
+            tpl_cols = self._cols(con, tpl_table)
+            extra = "".join(f", t.{c}" for c in self.OPTIONAL_TEMPLATE_COLS if c in tpl_cols)
+
             # where de categoría (exacto o include_children)
             where = "c.slug = ?"
             params: list = [slug]
@@ -72,7 +86,7 @@ class TemplateRepository:
                     t.tier_min,
                     t.tier_max,
                     t.ench_min,
-                    t.ench_max
+                    t.ench_max{extra}
                 FROM {tpl_table} t
                 JOIN {bridge} tc ON tc.template_id = t.id
                 JOIN {cat_table} c ON c.id = tc.category_id
@@ -83,8 +97,6 @@ class TemplateRepository:
                 return [self._row_to_spec(r) for r in rows]
 
             # Caso B: relación directa desde templates
-            tpl_cols = self._cols(con, tpl_table)
-
             if "category_id" in tpl_cols:
                 sql = f"""
                 SELECT
@@ -92,7 +104,7 @@ class TemplateRepository:
                     t.tier_min,
                     t.tier_max,
                     t.ench_min,
-                    t.ench_max
+                    t.ench_max{extra}
                 FROM {tpl_table} t
                 JOIN {cat_table} c ON c.id = t.category_id
                 WHERE {where}
@@ -105,16 +117,16 @@ class TemplateRepository:
                 # include_children en este caso se hace contra el campo category_slug del template
                 if include_children:
                     sql = f"""
-                    SELECT template_key, tier_min, tier_max, ench_min, ench_max
-                    FROM {tpl_table}
+                    SELECT t.template_key, t.tier_min, t.tier_max, t.ench_min, t.ench_max{extra}
+                    FROM {tpl_table} t
                     WHERE (category_slug = ? OR category_slug LIKE ?)
                     ORDER BY template_key
                     """
                     rows = con.execute(sql, [slug, slug.rstrip("/") + "/%"]).fetchall()
                 else:
                     sql = f"""
-                    SELECT template_key, tier_min, tier_max, ench_min, ench_max
-                    FROM {tpl_table}
+                    SELECT t.template_key, t.tier_min, t.tier_max, t.ench_min, t.ench_max{extra}
+                    FROM {tpl_table} t
                     WHERE category_slug = ?
                     ORDER BY template_key
                     """
@@ -134,12 +146,23 @@ class TemplateRepository:
 
     @staticmethod
     def _row_to_spec(r: sqlite3.Row) -> TemplateSpec:
+        keys = r.keys()
+        qualities = ALL_QUALITIES
+        if "qualities" in keys and r["qualities"]:
+            qualities = tuple(parse_qualities(r["qualities"]))
+
+        cities = None
+        if "cities" in keys and r["cities"]:
+            cities = tuple(c.strip() for c in str(r["cities"]).split(",") if c.strip()) or None
+
         return TemplateSpec(
             template_key=str(r["template_key"]),
             tier_min=int(r["tier_min"]),
             tier_max=int(r["tier_max"]),
             ench_min=int(r["ench_min"]),
             ench_max=int(r["ench_max"]),
+            qualities=qualities,
+            cities=cities,
         )
 
     @staticmethod
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import gzip
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from src.infra.market_query import FastMarketQuery
+from src.infra.market_types import MarketIndex, Quote
+from src.infra.price_decoder import iter_price_rows, merge_decoded_rows
+from src.scripts.fake_albion_api import render_rows, synthetic_row
+
+CHUNK = 64 * 1024
+N_ITEMS = 1000
+
+
+def synthetic_body() -> bytes:
+    """Respuesta grande: N_ITEMS items x 8 ciudades x 5 calidades (~80% filas en 0)."""
+    item_ids = [f"T{t}_ITEM_{i}@{e}" for i in range(N_ITEMS // 25) for t in range(4, 9) for e in range(5)]
+    rows = [
+        synthetic_row(i, c, q)
+        for i in item_ids
+        for c in FastMarketQuery.DEFAULT_CITIES
+        for q in FastMarketQuery.DEFAULT_QUALITIES
+    ]
+    return render_rows(rows)
+
+
+def load_body(path: str) -> bytes:
+    data = Path(path).read_bytes()
+    return gzip.decompress(data) if path.endswith(".gz") else data
+
+
+def merge_price_rows(index: MarketIndex, data) -> None:
+    """
+    Camino anterior al decoder en streaming (referencia del bench): la
+    respuesta entera ya parseada como lista de dicts, volcada en `index`.
+    Descarta filas inválidas y las que tienen los 4 precios en 0.
+    """
+    if not isinstance(data, list):
+        return
+
+    for e in data:
+        item_id = e.get("item_id")
+        city = e.get("city") or e.get("location")
+        quality = e.get("quality")
+
+        if not item_id or not city or quality is None:
+            continue
+
+        try:
+            q_int = int(quality)
+        except Exception:
+            continue
+
+        sell_min = int(e.get("sell_price_min", 0) or 0)
+        sell_max = int(e.get("sell_price_max", 0) or 0)
+        buy_min  = int(e.get("buy_price_min", 0) or 0)
+        buy_max  = int(e.get("buy_price_max", 0) or 0)
+
+        # elimina solo si los 4 están en 0
+        if sell_min == 0 and sell_max == 0 and buy_min == 0 and buy_max == 0:
+            continue
+
+        quote = Quote(
+            sell_min=sell_min,
+            sell_max=sell_max,
+            buy_min=buy_min,
+            buy_max=buy_max,
+            sell_min_date=e.get("sell_price_min_date", ""),
+            sell_max_date=e.get("sell_price_max_date", ""),
+            buy_min_date=e.get("buy_price_min_date", ""),
+            buy_max_date=e.get("buy_price_max_date", ""),
+        )
+
+        index.setdefault(item_id, {}).setdefault(city, {})[q_int] = quote
+
+
+def decode_json(body: bytes) -> MarketIndex:
+    # camino anterior: r.json() + dicts
+    index: MarketIndex = {}
+    merge_price_rows(index, json.loads(body))
+    return index
+
+
+def decode_stream(body: bytes) -> MarketIndex:
+    chunks = (body[i : i + CHUNK] for i in range(0, len(body), CHUNK))
+    index: MarketIndex = {}
+    merge_decoded_rows(index, iter_price_rows(chunks, cities=frozenset(FastMarketQuery.DEFAULT_CITIES)))
+    return index
+
+
+def measure(fn: Callable[[bytes], MarketIndex], body: bytes, repeat: int = 5) -> tuple[MarketIndex, float, int]:
+    # tiempo (mejor de N) y memoria por separado: tracemalloc distorsiona los tiempos
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        index = fn(body)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, best, peak
+
+
+def main():
+    # Uso: python -m src.scripts.bench_decode [respuesta.json|respuesta.json.gz]
+    body = load_body(sys.argv[1]) if len(sys.argv) > 1 else synthetic_body()
+    print(f"body: {len(body) / 1e6:.1f} MB")
+
+    a, t_json, m_json = measure(decode_json, body)
+    b, t_stream, m_stream = measure(decode_stream, body)
+
+    print(f"json + dicts : {t_json * 1000:7.1f} ms   pico {m_json / 1e6:6.1f} MB")
+    print(f"streaming    : {t_stream * 1000:7.1f} ms   pico {m_stream / 1e6:6.1f} MB")
+    print(f"mismo índice : {a == b}  ({len(b)} items)")
+
+
+if __name__ == "__main__":
+    main()
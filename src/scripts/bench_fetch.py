@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer
+from src.infra.multi_market_query import MultiMarketQuery, TieredSpec
+from src.infra.quote_cache import QuoteCache
+from src.infra.rate_governor import RateGovernor
+from src.scripts.fake_albion_api import PRICES_PATH
+
+ROOT = Path(__file__).resolve().parents[2]
+DB_PATH = ROOT / "data" / "auria.db"
+
+LATENCY_MS = 150
+
+
+def catalog_specs() -> list[TieredSpec]:
+    runner = CatalogBMAnalyzer(DB_PATH)
+    specs: dict[str, TieredSpec] = {}
+    for slug in runner.list_categories_with_templates():
+        for s in runner.template_repo.list_for_category(slug):
+            specs[s.template_key] = TieredSpec(
+                template_key=s.template_key,
+                tier_min=s.tier_min,
+                tier_max=s.tier_max,
+                ench_min=s.ench_min,
+                ench_max=s.ench_max,
+            )
+    return list(specs.values())
+
+
+def spawn_stand_in(latency_ms: int) -> tuple[subprocess.Popen, str]:
+    """
+    Stand-in en otro proceso: así su CPU (generar JSON) no compite por el GIL
+    con el cliente que estamos midiendo.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.scripts.fake_albion_api", "--port", str(port), "--latency-ms", str(latency_ms)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return proc, f"http://127.0.0.1:{port}{PRICES_PATH.rstrip('/')}"
+
+
+def main():
+    server, base_url = spawn_stand_in(LATENCY_MS)
+    specs = catalog_specs()
+
+    print(f"Stand-in: {base_url} (latencia {LATENCY_MS} ms)")
+    baseline = None
+    for concurrency in (1, 2, 4, 8):
+        # cache vacía y governor sin cuota por corrida: medimos solo la red
+        mq = MultiMarketQuery(
+            specs,
+            base_url=base_url,
+            concurrency=concurrency,
+            cache=QuoteCache(),
+            governor=RateGovernor(rate_per_min=60_000, burst=1000, max_concurrency=concurrency),
+        )
+        requests_needed = mq.plan_request_count()
+
+        t0 = time.perf_counter()
+        index = mq.fetch_index()
+        dt = time.perf_counter() - t0
+
+        baseline = baseline or dt
+        print(
+            f"concurrency={concurrency}  requests={requests_needed}"
+            f"  items={len(index)}  {dt:.2f}s  x{baseline / dt:.1f}"
+        )
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
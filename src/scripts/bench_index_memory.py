@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import gc
+import sys
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from src.domain.bm_analyzer import BMFlippingAnalyzer
+from src.domain.bm_kernel import HAS_NUMPY
+from src.infra.columnar_index import ColumnarIndex
+from src.infra.market_query import FastMarketQuery
+from src.infra.market_types import MarketIndex
+from src.infra.price_decoder import iter_price_rows, merge_decoded_rows
+from src.scripts import fake_albion_api
+from src.scripts.fake_albion_api import render_rows, synthetic_row
+
+N_ITEMS = 4050  # ~ el catálogo completo (ver demo_fetch_plan)
+CHUNK = 64 * 1024
+
+
+def catalog_body(n_items: int, empty_ratio: float) -> bytes:
+    """Respuesta de n_items x 8 ciudades x 5 calidades; empty_ratio = fracción de filas sin órdenes."""
+    fake_albion_api.EMPTY_ROW_RATIO = empty_ratio
+    item_ids = [f"T{t}_ITEM_{i}@{e}" for i in range(n_items // 25) for t in range(4, 9) for e in range(5)]
+    rows = [
+        synthetic_row(i, c, q)
+        for i in item_ids
+        for c in FastMarketQuery.DEFAULT_CITIES
+        for q in FastMarketQuery.DEFAULT_QUALITIES
+    ]
+    return render_rows(rows)
+
+
+def rows_of(body: bytes):
+    chunks = (body[i : i + CHUNK] for i in range(0, len(body), CHUNK))
+    return iter_price_rows(chunks, cities=frozenset(FastMarketQuery.DEFAULT_CITIES))
+
+
+def build_dicts(body: bytes) -> MarketIndex:
+    index: MarketIndex = {}
+    merge_decoded_rows(index, rows_of(body))
+    return index
+
+
+def build_columnar(body: bytes) -> ColumnarIndex:
+    return ColumnarIndex.from_rows(rows_of(body))
+
+
+def measure(build: Callable[[bytes], object], body: bytes) -> Tuple[object, int, int, float]:
+    """(índice, bytes retenidos, pico, segundos). Los Quote del decoder cuentan mientras viven."""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    index = build(body)
+    dt = time.perf_counter() - t0
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return index, current, peak, dt
+
+
+def main():
+    for label, empty_ratio in (("realista (80% filas vacías)", 0.8), ("denso (todas las filas)", 0.0)):
+        body = catalog_body(N_ITEMS, empty_ratio)
+
+        dicts, mem_d, peak_d, t_d = measure(build_dicts, body)
+        cols, mem_c, peak_c, t_c = measure(build_columnar, body)
+        rows = cols.n_rows
+
+        print(f"[{label}] {len(dicts)} items, {rows} filas")
+        print(f"  dicts + Quote : {mem_d / 2**20:7.1f} MiB  ({mem_d / rows:5.0f} B/fila)  pico {peak_d / 2**20:6.1f} MiB  {t_d:.2f}s")
+        print(f"  ColumnarIndex : {mem_c / 2**20:7.1f} MiB  ({mem_c / rows:5.0f} B/fila)  pico {peak_c / 2**20:6.1f} MiB  {t_c:.2f}s"
+              f"  -> {mem_d / mem_c:.1f}x menos")
+
+        # la vista Mapping es el mismo índice
+        if cols != dicts:
+            sys.exit("ColumnarIndex difiere del MarketIndex")
+
+        engines = ("python", "numpy") if HAS_NUMPY else ("python",)
+        for engine in engines:
+            a = BMFlippingAnalyzer(base_item="ITEM", engine=engine)
+            t0 = time.perf_counter()
+            r_d = a.analyze_index(dicts, top_n=25)
+            t1 = time.perf_counter()
+            r_c = a.analyze_index(cols, top_n=25)
+            t2 = time.perf_counter()
+            print(f"  analyze_index top 25 [{engine}]: dicts {(t1 - t0) * 1000:.0f} ms  "
+                  f"columnar {(t2 - t1) * 1000:.0f} ms  paridad={'OK' if r_d == r_c else 'DIFIERE'}")
+            if r_d != r_c:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
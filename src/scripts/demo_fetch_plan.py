@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer
+from src.infra.multi_market_query import MultiMarketQuery, TieredSpec
+
+ROOT = Path(__file__).resolve().parents[2]
+DB_PATH = ROOT / "data" / "auria.db"
+
+
+def main():
+    runner = CatalogBMAnalyzer(DB_PATH)
+
+    total_fixed = 0
+    total_packed = 0
+    longest_fixed = 0
+    print(f"{'categoría':45} {'ids':>6} {'fijo(120)':>10} {'por bytes':>10}")
+    for slug in runner.list_categories_with_templates():
+        specs = [
+            TieredSpec(s.template_key, s.tier_min, s.tier_max, s.ench_min, s.ench_max)
+            for s in runner.template_repo.list_for_category(slug)
+        ]
+        # batch_size=120 + URL sin límite práctico = comportamiento anterior
+        fixed = MultiMarketQuery(specs, batch_size=120, max_url_bytes=1 << 30)
+        packed = MultiMarketQuery(specs)
+
+        longest_fixed = max([longest_fixed] + [len(fixed.fetcher.build_url(c)) for c in fixed.plan_chunks()])
+        n_fixed = fixed.plan_request_count()
+        n_packed = packed.plan_request_count()
+        total_fixed += n_fixed
+        total_packed += n_packed
+        print(f"{slug:45} {len(packed.build_item_ids()):>6} {n_fixed:>10} {n_packed:>10}")
+
+    print(f"\nTOTAL requests: fijo={total_fixed}  por bytes={total_packed} "
+          f"(max_url_bytes={packed.fetcher.max_url_bytes})")
+    print(f"URL más larga con batch fijo: {longest_fixed} bytes")
+
+
+if __name__ == "__main__":
+    main()
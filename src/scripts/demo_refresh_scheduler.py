@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+
+from src.domain.bm_analyzer import BMFlippingAnalyzer
+from src.domain.refresh_scheduler import RefreshScheduler
+from src.infra.multi_market_query import MultiMarketQuery
+from src.infra.quote_cache import QuoteCache
+from src.infra.rate_governor import RateGovernor
+from src.scripts.bench_fetch import catalog_specs
+from src.scripts.fake_albion_api import base_url_for, start_server
+
+REQUESTS_PER_MIN = 30
+TICK_SEC = 5
+SIM_MINUTES = 20
+
+
+def main():
+    server = start_server(latency_ms=20)
+    base_url = base_url_for(server)
+    specs = catalog_specs()
+
+    # governor sin cuota: el presupuesto lo pone el scheduler; reloj simulado
+    mq = MultiMarketQuery(
+        specs,
+        base_url=base_url,
+        cache=QuoteCache(),
+        governor=RateGovernor(rate_per_min=60_000, burst=1000),
+    )
+    analyzer = BMFlippingAnalyzer(base_item=specs[0].template_key)
+    item_ids = mq.build_item_ids()
+
+    sched = RefreshScheduler(
+        mq.fetcher,
+        item_ids,
+        requests_per_min=REQUESTS_PER_MIN,
+        analyze=lambda idx: analyzer.analyze_index(idx),
+    )
+
+    print(f"Stand-in: {base_url}")
+    print(f"{len(item_ids)} items, {mq.plan_request_count()} requests para un barrido completo, "
+          f"presupuesto {REQUESTS_PER_MIN}/min")
+
+    now = time.time()
+    spent = 0
+    for _ in range(SIM_MINUTES * 60 // TICK_SEC):
+        now += TICK_SEC
+        spent += sched.tick(now=now).requests
+
+    print(f"\n{SIM_MINUTES} min simulados: {spent} requests "
+          f"({spent / SIM_MINUTES:.1f}/min), index con {len(sched.index)} items")
+
+    # refreshes por item según su valor (mejor profit_net suavizado)
+    buckets = Counter()
+    counts = Counter()
+    for st in sched.items.values():
+        if st.value <= 0:
+            b = "sin oportunidad"
+        elif st.value < 10_000:
+            b = "profit < 10k"
+        elif st.value < 100_000:
+            b = "profit 10k-100k"
+        else:
+            b = "profit >= 100k"
+        buckets[b] += 1
+        counts[b] += st.refreshes
+
+    print(f"\n{'grupo':18} {'items':>7} {'refresh/item':>13}")
+    for b in ("sin oportunidad", "profit < 10k", "profit 10k-100k", "profit >= 100k"):
+        if buckets[b]:
+            print(f"{b:18} {buckets[b]:>7} {counts[b] / buckets[b]:>13.2f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+PRICES_PATH = "/api/v2/stats/prices/"
+STATS_PATH = "/__stats"
+
+# Como el API real: la mayoría de (item, ciudad, calidad) no tiene órdenes
+EMPTY_ROW_RATIO = 0.8
+
+# Config también por entorno (útil al levantarlo desde otro proceso / docker)
+ENV_PREFIX = "AURIA_FAKE_"
+
+
+def synthetic_row(item_id: str, city: str, quality: int) -> dict:
+    """
+    Fila determinista (mismo input -> mismo precio) con la forma de /stats/prices.
+    """
+    h = int(hashlib.md5(f"{item_id}|{city}|{quality}".encode("utf-8")).hexdigest()[:8], 16)
+    if (h % 1000) < EMPTY_ROW_RATIO * 1000:
+        return _empty_row(item_id, city, quality)
+
+    base = 1000 + h % 200_000
+    date = "2024-01-01T00:00:00"
+    return {
+        "item_id": item_id,
+        "city": city,
+        "quality": quality,
+        "sell_price_min": base,
+        "sell_price_min_date": date,
+        "sell_price_max": base + h % 5000,
+        "sell_price_max_date": date,
+        "buy_price_min": max(base - 3000, 0),
+        "buy_price_min_date": date,
+        "buy_price_max": base + (h % 7) * 1000,
+        "buy_price_max_date": date,
+    }
+
+
+def _empty_row(item_id: str, city: str, quality: int) -> dict:
+    date = "0001-01-01T00:00:00"
+    return {
+        "item_id": item_id,
+        "city": city,
+        "quality": quality,
+        "sell_price_min": 0,
+        "sell_price_min_date": date,
+        "sell_price_max": 0,
+        "sell_price_max_date": date,
+        "buy_price_min": 0,
+        "buy_price_min_date": date,
+        "buy_price_max": 0,
+        "buy_price_max_date": date,
+    }
+
+
+def render_rows(rows: List[dict]) -> bytes:
+    # JSON compacto, igual que el API real
+    return json.dumps(rows, separators=(",", ":")).encode("utf-8")
+
+
+# ------------------------- latencia -------------------------
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """
+    Distribución de latencia en ms:
+      "150" / "fixed:150"     -> siempre 150
+      "uniform:50:300"        -> uniforme entre 50 y 300
+      "normal:150:40"         -> media 150, desvío 40 (cortada en 0)
+      "lognormal:150:0.6"     -> mediana 150, sigma 0.6 (cola larga, como el API real)
+      "exp:150"               -> exponencial de media 150
+    """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exp")
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        parts = [p.strip() for p in str(spec).split(":") if p.strip()]
+        if not parts:
+            return cls()
+        if len(parts) == 1:
+            return cls("fixed", float(parts[0]))
+        kind, nums = parts[0].lower(), [float(x) for x in parts[1:]]
+        if kind not in cls.KINDS:
+            raise ValueError(f"latencia inválida: {spec!r} (usa {' | '.join(cls.KINDS)})")
+        return cls(kind, nums[0], nums[1] if len(nums) > 1 else 0.0)
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(self.a, self.b))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(0.0, self.b) * self.a if self.a > 0 else 0.0
+        if self.kind == "exp":
+            return rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+        return self.a
+
+
+# ------------------------- config -------------------------
+
+@dataclass(frozen=True)
+class ServerConfig:
+    latency: LatencyModel = LatencyModel()
+    error_429_ratio: float = 0.0       # fracción de requests que responden 429
+    error_5xx_ratio: float = 0.0       # fracción que responden 500/502/503/504
+    retry_after_sec: Optional[float] = 1.0  # header Retry-After de los 429 (None = sin header)
+    max_rpm: int = 0                   # cuota real por minuto (ventana deslizante); 0 = sin cuota
+    max_url_bytes: int = 0             # 414 si path+query supera esto; 0 = sin límite
+    seed: Optional[int] = None         # semilla de latencias/fallas (reproducible)
+
+    @classmethod
+    def from_env(cls, base: Optional["ServerConfig"] = None) -> "ServerConfig":
+        """AURIA_FAKE_LATENCY, _429_RATIO, _5XX_RATIO, _RETRY_AFTER, _MAX_RPM, _MAX_URL_BYTES, _SEED."""
+        cfg = base or cls()
+        env = lambda k: os.getenv(ENV_PREFIX + k)  # noqa: E731
+        if env("LATENCY"):
+            cfg = replace(cfg, latency=LatencyModel.parse(env("LATENCY")))
+        if env("429_RATIO"):
+            cfg = replace(cfg, error_429_ratio=float(env("429_RATIO")))
+        if env("5XX_RATIO"):
+            cfg = replace(cfg, error_5xx_ratio=float(env("5XX_RATIO")))
+        if env("RETRY_AFTER"):
+            cfg = replace(cfg, retry_after_sec=float(env("RETRY_AFTER")))
+        if env("MAX_RPM"):
+            cfg = replace(cfg, max_rpm=int(env("MAX_RPM")))
+        if env("MAX_URL_BYTES"):
+            cfg = replace(cfg, max_url_bytes=int(env("MAX_URL_BYTES")))
+        if env("SEED"):
+            cfg = replace(cfg, seed=int(env("SEED")))
+        return cfg
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, config: ServerConfig) -> None:
+        super().__init__(addr, _Handler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.window: Deque[float] = deque()
+
+        self.requests_served = 0   # 200 con filas
+        self.throttled = 0         # 429 (inyectados o por cuota)
+        self.server_errors = 0     # 5xx inyectados
+        self.too_long = 0          # 414
+
+    # compat: start_server(latency_ms=...) / server.latency_ms
+    @property
+    def latency_ms(self) -> float:
+        return self.config.latency.a if self.config.latency.kind == "fixed" else 0.0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests_served": self.requests_served,
+                "throttled": self.throttled,
+                "server_errors": self.server_errors,
+                "too_long": self.too_long,
+            }
+
+    def draw(self) -> tuple[float, float]:
+        """(latencia_ms, u) con el rng compartido (random.Random no es thread-safe)."""
+        with self.lock:
+            return self.config.latency.sample_ms(self.rng), self.rng.random()
+
+    def over_quota(self) -> bool:
+        if self.config.max_rpm <= 0:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.window and self.window[0] <= now - 60.0:
+                self.window.popleft()
+            if len(self.window) >= self.config.max_rpm:
+                return True
+            self.window.append(now)
+            return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, igual que el API real
+    server: _Server
+
+    def do_GET(self) -> None:
+        srv = self.server
+        cfg = srv.config
+        parts = urlsplit(self.path)
+
+        if parts.path == STATS_PATH:
+            self._send(200, json.dumps(srv.stats()).encode("utf-8"))
+            return
+        if not parts.path.startswith(PRICES_PATH) or not parts.path.endswith(".json"):
+            self._send(404, b"[]")
+            return
+
+        if cfg.max_url_bytes and len(self.path.encode("utf-8")) > cfg.max_url_bytes:
+            with srv.lock:
+                srv.too_long += 1
+            self._send(414, b'{"error":"URI Too Long"}')
+            return
+
+        latency_ms, u = srv.draw()
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000.0)
+
+        if u < cfg.error_429_ratio or srv.over_quota():
+            with srv.lock:
+                srv.throttled += 1
+            headers = {}
+            if cfg.retry_after_sec is not None:
+                headers["Retry-After"] = f"{cfg.retry_after_sec:g}"
+            self._send(429, b'{"error":"Too Many Requests"}', headers)
+            return
+        if u < cfg.error_429_ratio + cfg.error_5xx_ratio:
+            with srv.lock:
+                srv.server_errors += 1
+                status = srv.rng.choice((500, 502, 503, 504))
+            self._send(status, b'{"error":"upstream"}')
+            return
+
+        ids_str = unquote(parts.path[len(PRICES_PATH):-len(".json")])
+        qs = parse_qs(parts.query)
+        item_ids = [x for x in ids_str.split(",") if x]
+        cities = [x for x in ",".join(qs.get("locations", [])).split(",") if x]
+        qualities = [int(x) for x in ",".join(qs.get("qualities", ["1"])).split(",") if x]
+
+        rows: List[dict] = [
+            synthetic_row(i, c, q) for i in item_ids for c in cities for q in qualities
+        ]
+        with srv.lock:
+            srv.requests_served += 1
+        self._send(200, render_rows(rows))
+
+    def _send(self, status: int, body: bytes, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args) -> None:  # silencioso
+        pass
+
+
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    *,
+    latency_ms: int = 0,
+    config: Optional[ServerConfig] = None,
+) -> _Server:
+    """
+    Levanta el stand-in en un hilo daemon y lo devuelve.
+    URL base para FastMarketQuery/MultiMarketQuery: base_url_for(server)
+    (o por entorno: AURIA_BASE_URL=<esa url>, ver src/infra/regions.py).
+    """
+    config = config or ServerConfig(latency=LatencyModel("fixed", float(latency_ms)))
+    server = _Server((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url_for(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{PRICES_PATH.rstrip('/')}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stand-in local del Albion Data API (/stats/prices)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=int, default=None, help="latencia fija (atajo de --latency)")
+    ap.add_argument("--latency", default=None, help="fixed:150 | uniform:50:300 | normal:150:40 | lognormal:150:0.6 | exp:150")
+    ap.add_argument("--rate-429", type=float, default=None, help="fracción de requests con 429")
+    ap.add_argument("--rate-5xx", type=float, default=None, help="fracción de requests con 5xx")
+    ap.add_argument("--retry-after", type=float, default=None, help="Retry-After de los 429 (s)")
+    ap.add_argument("--max-rpm", type=int, default=None, help="cuota real por minuto (429 al pasarse)")
+    ap.add_argument("--max-url-bytes", type=int, default=None, help="414 por encima de este largo de URL")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    # CLI > entorno > defaults
+    cfg = ServerConfig.from_env()
+    if args.latency_ms is not None:
+        cfg = replace(cfg, latency=LatencyModel("fixed", float(args.latency_ms)))
+    if args.latency is not None:
+        cfg = replace(cfg, latency=LatencyModel.parse(args.latency))
+    if args.rate_429 is not None:
+        cfg = replace(cfg, error_429_ratio=args.rate_429)
+    if args.rate_5xx is not None:
+        cfg = replace(cfg, error_5xx_ratio=args.rate_5xx)
+    if args.retry_after is not None:
+        cfg = replace(cfg, retry_after_sec=args.retry_after)
+    if args.max_rpm is not None:
+        cfg = replace(cfg, max_rpm=args.max_rpm)
+    if args.max_url_bytes is not None:
+        cfg = replace(cfg, max_url_bytes=args.max_url_bytes)
+    if args.seed is not None:
+        cfg = replace(cfg, seed=args.seed)
+
+    server = start_server(args.host, args.port, config=cfg)
+    print(f"Sirviendo en {base_url_for(server)} (Ctrl+C para salir)")
+    print(f"Config: {cfg}")
+    print(f"Contadores: http://{args.host}:{args.port}{STATS_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
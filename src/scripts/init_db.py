@@ -1,6 +1,10 @@
 import sqlite3
 from pathlib import Path
 
+from src.infra.negative_cache import NegativeCache
+from src.infra.quote_store import QuoteStore
+from src.infra.scan_queue import ScanQueue
+
 ROOT = Path(__file__).resolve().parents[2]  # carpeta AURIA/
 DB_PATH = ROOT / "data" / "auria.db"
 SCHEMA_PATH = Path(__file__).with_name("schema.sql")
@@ -18,6 +22,11 @@ def main():
     finally:
         con.close()
 
+    # tablas que define su propio módulo (un solo esquema, ver src/infra/)
+    QuoteStore(DB_PATH)
+    NegativeCache(DB_PATH)
+    ScanQueue(DB_PATH)
+
     print(f"OK: DB creada/actualizada en: {DB_PATH}")
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+from src.infra.catalog_repo import TemplateRow, expand_template_to_item_ids
+from src.infra.negative_cache import NegativeCache
+
+ROOT = Path(__file__).resolve().parents[2]
+DB_PATH = ROOT / "data" / "auria.db"
+
+
+def load_templates(db_path: Path) -> list[TemplateRow]:
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute("""
+            SELECT template_key, mode, tier_min, tier_max, ench_min, ench_max, qualities
+            FROM item_templates
+            WHERE is_active = 1
+            ORDER BY template_key
+        """).fetchall()
+    finally:
+        con.close()
+    return [TemplateRow(r[0], r[1], r[2], r[3], int(r[4]), int(r[5]), r[6]) for r in rows]
+
+
+def main():
+    neg = NegativeCache(DB_PATH)
+    pruned = neg.pruned_items()
+
+    total_ids = 0
+    total_pruned = 0
+    report = []
+    for t in load_templates(DB_PATH):
+        ids = expand_template_to_item_ids(t)
+        hit = [x for x in ids if x in pruned]
+        total_ids += len(ids)
+        total_pruned += len(hit)
+        if hit:
+            report.append((t.template_key, len(ids), hit))
+
+    print(f"Cobertura: {total_pruned}/{total_ids} item_ids podados "
+          f"(>= {neg.min_empty_scans} scans vacíos, sonda cada {neg.probe_every_sec / 3600:.0f} h)\n")
+
+    report.sort(key=lambda x: len(x[2]) / x[1], reverse=True)
+    for key, n, hit in report:
+        print(f"{key:35} {len(hit):>3}/{n:<3} podados")
+        print("    " + ", ".join(hit[:10]) + (f" ... (+{len(hit) - 10})" if len(hit) > 10 else ""))
+
+
+if __name__ == "__main__":
+    main()
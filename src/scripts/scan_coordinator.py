@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer
+from src.domain.catalog_scan import CatalogScanCoordinator
+from src.infra.scan_queue import ScanQueue
+
+ROOT = Path(__file__).resolve().parents[2]
+DB_PATH = ROOT / "data" / "auria.db"
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Crea un scan de catálogo en la cola, (opcional) lanza workers locales y junta el resultado"
+    )
+    ap.add_argument("--db", type=Path, default=DB_PATH)
+    ap.add_argument("--region", default="west")
+    ap.add_argument("--categories", nargs="*", default=None, help="default: todas las que tienen templates")
+    ap.add_argument("--workers", type=int, default=4, help="procesos locales (0 = solo encolar y esperar workers externos)")
+    ap.add_argument("--top-n-global", type=int, default=100)
+    ap.add_argument("--timeout", type=float, default=None, help="segundos; se junta lo que haya terminado")
+    args = ap.parse_args()
+
+    queue = ScanQueue(args.db)
+    coordinator = CatalogScanCoordinator(CatalogBMAnalyzer(args.db), queue)
+    scan_id = coordinator.submit(region=args.region, category_slugs=args.categories, top_n_global=args.top_n_global)
+    print(f"scan {scan_id}: {queue.progress(scan_id).total} categorías en cola")
+
+    t0 = time.perf_counter()
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "src.scripts.scan_worker", "--db", str(args.db),
+             "--scan-id", scan_id, "--worker-id", f"local-{i}"],
+            cwd=ROOT,
+        )
+        for i in range(args.workers)
+    ]
+
+    def show(p):
+        print(f"\r  hechas {p.done}/{p.total}  en curso {p.leased}  fallidas {p.failed}", end="", flush=True)
+
+    progress = coordinator.wait(scan_id, timeout=args.timeout, on_progress=show)
+    if progress.finished:
+        for proc in procs:
+            proc.wait()
+    # con timeout los workers siguen hasta vaciar la cola; merge() junta lo terminado
+    print(f"\n{progress.done}/{progress.total} categorías en {time.perf_counter() - t0:.1f}s")
+
+    failed = queue.failed_shards(scan_id)
+    if failed:
+        print(f"fallidas: {', '.join(failed)}")
+
+    report = coordinator.merge(scan_id)
+    print("\n=== TOP GLOBAL ===\n")
+    for r in report.top_global[:30]:
+        print(
+            r.item_id,
+            "city=", r.origin_city,
+            "q=", r.origin_quality,
+            "bmQ=", r.bm_quality_used,
+            "net8=", r.profit_net,
+            f"({round(r.margin_net*100,2)}%)",
+            "robust=", r.is_robust,
+        )
+
+
+if __name__ == "__main__":
+    main()
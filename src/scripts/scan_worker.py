@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer
+from src.domain.catalog_scan import CatalogScanWorker
+from src.infra.scan_queue import ScanQueue
+
+ROOT = Path(__file__).resolve().parents[2]
+DB_PATH = ROOT / "data" / "auria.db"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Worker de scan: toma categorías de la cola hasta vaciarla")
+    ap.add_argument("--db", type=Path, default=DB_PATH, help="DB compartida (cola + catálogo + quotes)")
+    ap.add_argument("--scan-id", default=None, help="scan a procesar (default: el último creado)")
+    ap.add_argument("--worker-id", default=None, help="default: host:pid")
+    ap.add_argument("--lease-sec", type=float, default=ScanQueue.DEFAULT_LEASE_SEC)
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    queue = ScanQueue(args.db)
+    scan_id = args.scan_id or queue.latest_scan_id()
+    if scan_id is None:
+        raise SystemExit("No hay scans en la cola")
+
+    worker = CatalogScanWorker(CatalogBMAnalyzer(args.db), queue, worker_id=args.worker_id, lease_sec=args.lease_sec)
+    done = worker.run(scan_id)
+    print(f"[{worker.worker_id}] scan {scan_id}: {done} categorías")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ CREATE TABLE IF NOT EXISTS item_templates (
   ench_min INTEGER NOT NULL DEFAULT 0,
   ench_max INTEGER NOT NULL DEFAULT 0,
   qualities TEXT NOT NULL DEFAULT '1,2,3,4,5', -- CSV: "1,2,3,4,5"
+  cities TEXT,                       -- CSV opcional; NULL = todas las ciudades
   is_active INTEGER NOT NULL DEFAULT 1,
   notes TEXT
 );
@@ -46,6 +47,9 @@ CREATE TABLE IF NOT EXISTS watchlist_templates (
   FOREIGN KEY(template_id) REFERENCES item_templates(id) ON DELETE CASCADE
 );
 
+-- quotes / quote_fetches / empty_items / scan_jobs / scan_tasks: cada una la define
+-- su módulo en src/infra/ (quote_store, negative_cache, scan_queue); init_db.py las crea
+
 -- Índices
 CREATE INDEX IF NOT EXISTS idx_categories_parent ON categories(parent_id);
 CREATE INDEX IF NOT EXISTS idx_templates_active ON item_templates(is_active);
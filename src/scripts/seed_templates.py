@@ -19,6 +19,24 @@ def csv_qualities(qs) -> str:
     raise ValueError(f"qualities inválidas: {qs!r}")
 
 
+def csv_cities(cs) -> str | None:
+    # None = todas las ciudades; lista ["Caerleon", ...] o string "Caerleon,Lymhurst"
+    if cs is None:
+        return None
+    if isinstance(cs, str):
+        cs = cs.split(",")
+    if isinstance(cs, list):
+        return ",".join(str(c).strip() for c in cs if str(c).strip()) or None
+    raise ValueError(f"cities inválidas: {cs!r}")
+
+
+def ensure_cities_column(con: sqlite3.Connection) -> None:
+    # DBs creadas antes de la columna cities
+    cols = {r[1] for r in con.execute("PRAGMA table_info(item_templates)").fetchall()}
+    if "cities" not in cols:
+        con.execute("ALTER TABLE item_templates ADD COLUMN cities TEXT")
+
+
 def get_category_id(con: sqlite3.Connection, slug: str) -> int:
     row = con.execute("SELECT id FROM categories WHERE slug = ?", (slug,)).fetchone()
     if not row:
@@ -48,6 +66,7 @@ def upsert_template(con: sqlite3.Connection, t: dict) -> int:
     ench_min = int(t.get("ench_min", 0))
     ench_max = int(t.get("ench_max", 0))
     qualities = csv_qualities(t.get("qualities"))
+    cities = csv_cities(t.get("cities"))
 
     is_active = int(t.get("is_active", 1))
     notes = t.get("notes")
@@ -63,19 +82,19 @@ def upsert_template(con: sqlite3.Connection, t: dict) -> int:
             """
             UPDATE item_templates
                SET mode = ?, tier_min = ?, tier_max = ?, ench_min = ?, ench_max = ?,
-                   qualities = ?, is_active = ?, notes = ?
+                   qualities = ?, cities = ?, is_active = ?, notes = ?
              WHERE id = ?
             """,
-            (mode, tier_min, tier_max, ench_min, ench_max, qualities, is_active, notes, template_id),
+            (mode, tier_min, tier_max, ench_min, ench_max, qualities, cities, is_active, notes, template_id),
         )
         return template_id
 
     cur = con.execute(
         """
-        INSERT INTO item_templates(template_key, mode, tier_min, tier_max, ench_min, ench_max, qualities, is_active, notes)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO item_templates(template_key, mode, tier_min, tier_max, ench_min, ench_max, qualities, cities, is_active, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
-        (template_key, mode, tier_min, tier_max, ench_min, ench_max, qualities, is_active, notes),
+        (template_key, mode, tier_min, tier_max, ench_min, ench_max, qualities, cities, is_active, notes),
     )
     return int(cur.lastrowid)
 
@@ -101,7 +120,7 @@ def expand_templates(data: dict) -> list[dict]:
       - template_groups: [
           {
             name: "axes",
-            mode/tier_min/.../qualities/categories: ...,
+            mode/tier_min/.../qualities/cities/categories: ...,
             template_keys: ["MAIN_AXE", "2H_AXE", ...]
           }
         ]
@@ -175,6 +194,7 @@ def main():
     con = sqlite3.connect(DB_PATH)
     try:
         con.execute("PRAGMA foreign_keys = ON;")
+        ensure_cities_column(con)
 
         for t in templates:
             template_id = upsert_template(con, t)
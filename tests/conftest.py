@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src.infra.quote_cache import shared_quote_cache
+from src.infra.regions import ENV_BASE_URL, REGION_BASE_URLS
+from src.scripts.fake_albion_api import ServerConfig, base_url_for, start_server
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / "src" / "scripts" / "schema.sql"
+
+# categoría -> [(template_key, qualities CSV, cities CSV o None)]
+CATALOG = {
+    "weapons": [("MAIN_AXE", "1,2", None), ("MAIN_SWORD", "1,2", None)],
+    "armor": [("HEAD_PLATE_SET1", "1,2", None), ("ARMOR_PLATE_SET1", "1,2", None)],
+    "mixed": [("MAIN_SWORD", "1,2", None), ("BAG", "1,2", None)],
+}
+
+
+@pytest.fixture
+def catalog_db(tmp_path) -> Path:
+    """DB con el esquema de init_db y un catálogo chico (T4-T6, encantamiento 0-1)."""
+    db = tmp_path / "auria.db"
+    con = sqlite3.connect(db)
+    try:
+        con.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+        for slug, templates in CATALOG.items():
+            cat_id = con.execute("INSERT INTO categories(name, slug) VALUES (?, ?)", (slug, slug)).lastrowid
+            for key, qualities, cities in templates:
+                row = con.execute("SELECT id FROM item_templates WHERE template_key = ?", (key,)).fetchone()
+                tpl_id = row[0] if row else con.execute(
+                    "INSERT INTO item_templates(template_key, tier_min, tier_max, ench_min, ench_max, qualities, cities) "
+                    "VALUES (?, 4, 6, 0, 1, ?, ?)",
+                    (key, qualities, cities),
+                ).lastrowid
+                con.execute("INSERT INTO template_categories(template_id, category_id) VALUES (?, ?)", (tpl_id, cat_id))
+        con.commit()
+    finally:
+        con.close()
+    return db
+
+
+@pytest.fixture
+def clean_quote_caches():
+    """Las caches compartidas del proceso viven entre tests: se vacían antes y después."""
+    for region in REGION_BASE_URLS:
+        shared_quote_cache(region).clear()
+    yield
+    for region in REGION_BASE_URLS:
+        shared_quote_cache(region).clear()
+
+
+@pytest.fixture
+def fake_api(monkeypatch, clean_quote_caches):
+    """
+    Stand-in local del API para todas las regiones (AURIA_BASE_URL).
+    Devuelve una función que levanta otro server con un ServerConfig y apunta el entorno a él.
+    """
+    servers = []
+
+    def start(config: ServerConfig = ServerConfig()):
+        server = start_server(config=config)
+        servers.append(server)
+        monkeypatch.setenv(ENV_BASE_URL, base_url_for(server))
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import pytest
+
+try:
+    from fastapi.testclient import TestClient
+except (ImportError, RuntimeError):  # el TestClient pide el cliente httpx de starlette
+    pytest.skip("TestClient de FastAPI sin su cliente HTTP instalado", allow_module_level=True)
+
+from src.api import main, services  # noqa: E402
+
+
+def test_services_are_built_once_shared_and_closed_on_shutdown(catalog_db, fake_api, monkeypatch):
+    fake_api()
+    built = []
+
+    def build_for_test():
+        built.append(services.build_services(catalog_db))
+        return built[-1]
+
+    monkeypatch.setattr(main, "build_services", build_for_test)
+
+    with TestClient(main.app) as client:
+        container = main.app.state.services
+        assert built == [container]
+
+        assert client.get("/black-market/catalog/categories").json() == ["armor", "mixed", "weapons"]
+        first = client.get("/black-market/catalog/snapshot")
+        assert first.status_code == 503  # el primer scan arrancó en background
+
+        refresher = container.snapshots["west"]
+        assert refresher.refresh(wait=True, timeout=10) is not None
+        second = client.get("/black-market/catalog/snapshot")
+        assert second.status_code == 200 and second.json()["version"] == 1
+
+        # los dos requests usaron el mismo contenedor y el mismo refresher
+        assert main.app.state.services is container
+        assert container.snapshots == {"west": refresher}
+        assert len(built) == 1
+
+    assert refresher._stop.is_set()
+    assert refresher._worker is not None and not refresher._worker.is_alive()
+    assert refresher.get().refreshing is False
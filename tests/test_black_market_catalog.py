@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import dataclasses
+
+from src.api.routers.black_market_catalog import filter_report
+from src.domain.bm_analyzer import FlipResult
+from src.domain.catalog_bm_analyzer import CatalogReport, CategoryRun, TemplateRun
+
+
+def flip(item_id: str, profit: int) -> FlipResult:
+    return FlipResult(
+        item_id=item_id, origin_quality=1, bm_quality_used=1, origin_city="Caerleon",
+        origin_price=1000, origin_price_source="sell_min", bm_price=1000 + profit, bm_price_source="buy_max",
+        profit_net=profit, margin_net=profit / 1000, profit_flip=profit, margin_flip=0.0,
+        profit_order=profit, margin_order=0.0, is_robust=True,
+    )
+
+
+def category(slug: str, results) -> CategoryRun:
+    return CategoryRun(category_slug=slug, templates=[TemplateRun("X", list(results))], top_results=list(results))
+
+
+def test_filter_report_dedupes_equal_results_from_different_categories():
+    axe = flip("T4_MAIN_AXE", 500)
+    report = CatalogReport(
+        categories=[
+            category("weapons", [axe, flip("T4_MAIN_SWORD", 300)]),
+            # mismo resultado, otro objeto (p.ej. reconstruido desde JSON por catalog_scan)
+            category("mixed", [dataclasses.replace(axe), flip("T4_BAG", 100)]),
+        ],
+        top_global=[],
+    )
+
+    out = filter_report(report, category_slugs=["weapons", "mixed"], top_n_global=10, min_profit_net=0, min_margin_net=0.0)
+    assert [r.item_id for r in out.top_global] == ["T4_MAIN_AXE", "T4_MAIN_SWORD", "T4_BAG"]
+
+    out = filter_report(report, category_slugs=["mixed"], top_n_global=10, min_profit_net=200, min_margin_net=0.0)
+    assert [c.category_slug for c in out.categories] == ["mixed"]
+    assert [r.item_id for r in out.top_global] == ["T4_MAIN_AXE"]
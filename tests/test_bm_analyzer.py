@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from src.domain.bm_analyzer import BMFlippingAnalyzer
+from src.infra.market_types import MarketIndex, Quote
+
+CITIES = ["Caerleon", "Lymhurst", "Martlock", "Black Market"]
+
+
+def q(sell_min=0, sell_max=0, buy_min=0, buy_max=0) -> Quote:
+    return Quote(sell_min, sell_max, buy_min, buy_max, "", "", "", "")
+
+
+def random_index(seed: int, n_items: int = 300) -> MarketIndex:
+    """Precios con huecos (0) y valores repetidos para forzar empates de ranking."""
+    rng = random.Random(seed)
+
+    def price() -> int:
+        return rng.choice((0, 0, 1_000, 2_000, 5_000, rng.randint(1, 10_000)))
+
+    index: MarketIndex = {}
+    for n in range(n_items):
+        city_map = {}
+        for city in CITIES:
+            qmap = {}
+            for quality in range(1, 6):
+                if rng.random() < 0.3:
+                    continue
+                qmap[quality] = q(price(), price(), price(), price())
+            if qmap:
+                city_map[city] = qmap
+        index[f"T{4 + n % 5}_ITEM_{n}"] = city_map
+    return index
+
+
+@pytest.fixture
+def analyzer() -> BMFlippingAnalyzer:
+    return BMFlippingAnalyzer(base_item="ITEM", engine="python")
+
+
+def test_select_top_keeps_stable_order_on_ties(analyzer):
+    c = lambda name: (name,)  # noqa: E731  (candidato opaco: _flip_result es el que lo arma)
+    ranked = [
+        ((True, 100, 0.5), c("a")),
+        ((True, 100, 0.5), c("b")),
+        ((False, 900, 0.9), c("c")),
+        ((True, 100, 0.5), c("d")),
+        ((True, 200, 0.1), c("e")),
+    ]
+    analyzer._flip_result = lambda name: name  # type: ignore[method-assign]
+
+    expected = [name for _, (name,) in sorted(ranked, key=lambda x: x[0], reverse=True)]
+    assert expected == ["e", "a", "b", "d", "c"]
+    for k in range(len(ranked) + 2):
+        assert analyzer._select_top(iter(ranked), k) == expected[:k]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("top_n", [0, 1, 7, 50, 10_000])
+def test_top_n_matches_full_sort(analyzer, seed, top_n):
+    index = random_index(seed)
+    full = analyzer.analyze_index(index, min_profit_net=1)
+    assert analyzer.analyze_index(index, min_profit_net=1, top_n=top_n) == full[:top_n]
+
+
+# ---------------- escalera BM (same_quality) ----------------
+
+def reference_same_quality(a: BMFlippingAnalyzer, index: MarketIndex):
+    """
+    Motor original (antes de la escalera): por cada origen busca, entre las
+    calidades BM <= la suya, la mejor venta (empate: mayor calidad).
+    """
+    out = []
+    for item_id, city_map in index.items():
+        bm_qmap = city_map.get(a.BM_CITY)
+        if not bm_qmap:
+            continue
+        bm_rev_by_q = {}
+        for q_bm, quote_bm in bm_qmap.items():
+            rev, src = a._bm_revenue_with_source(quote_bm)
+            if rev > 0:
+                bm_rev_by_q[q_bm] = (rev, src)
+        if not bm_rev_by_q:
+            continue
+
+        for origin_city, qmap in city_map.items():
+            if origin_city == a.BM_CITY:
+                continue
+            for origin_quality, quote_origin in qmap.items():
+                robust_cost, robust_src = a._origin_cost_robust(quote_origin)
+                opp_cost, opp_src = a._origin_cost_opportunistic(quote_origin)
+                if robust_cost <= 0 and opp_cost <= 0:
+                    continue
+
+                best = None
+                for q_bm, (rev, src) in bm_rev_by_q.items():
+                    if q_bm > origin_quality:
+                        continue
+                    if best is None or rev > best[1] or (rev == best[1] and q_bm > best[0]):
+                        best = (q_bm, rev, src)
+                if best is None:
+                    continue
+
+                cost, cost_src = a._choose_cost_for_output(robust_cost, robust_src, opp_cost, opp_src)
+                if cost <= 0 or best[1] - cost <= 0:
+                    continue
+                rung = a._bm_rung(*best)
+                out.append(a._flip_result(item_id, origin_city, origin_quality, cost, cost_src, robust_cost, robust_src, rung))
+    return out
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4])
+def test_ladder_matches_reference_engine(analyzer, seed):
+    index = random_index(seed)
+    assert analyzer._compute(index) == reference_same_quality(analyzer, index)
+
+
+def test_ladder_prefers_higher_quality_on_equal_revenue():
+    ladder = BMFlippingAnalyzer._bm_quality_ladder({1: q(buy_max=500), 3: q(buy_max=500), 4: q(buy_min=200)})
+    assert [r.quality if r else None for r in ladder] == [None, 1, 1, 3, 3]
+    assert BMFlippingAnalyzer._bm_quality_ladder({2: q()}) == []
+
+
+# ---------------- sourcing upgrade ----------------
+
+def reference_upgrade(a: BMFlippingAnalyzer, index: MarketIndex, *, any_city: bool):
+    """Fuerza bruta: cada orden del BM contra todas las publicaciones de calidad >= la suya."""
+    out = []
+    for item_id, city_map in index.items():
+        bm_qmap = city_map.get(a.BM_CITY)
+        if not bm_qmap:
+            continue
+        listings = []  # (cost, quality, city_pos, city, cost_src, robust_cost, robust_src)
+        for pos, (city, qmap) in enumerate(city_map.items()):
+            if city == a.BM_CITY:
+                continue
+            for quality, quote in qmap.items():
+                robust_cost, robust_src = a._origin_cost_robust(quote)
+                opp_cost, opp_src = a._origin_cost_opportunistic(quote)
+                cost, cost_src = a._choose_cost_for_output(robust_cost, robust_src, opp_cost, opp_src)
+                if cost > 0:
+                    listings.append((cost, quality, pos, city, cost_src, robust_cost, robust_src))
+
+        groups = [listings] if any_city else [
+            [x for x in listings if x[3] == city] for city in city_map if city != a.BM_CITY
+        ]
+        for q_bm in sorted(bm_qmap):
+            rev, src = a._bm_revenue_with_source(bm_qmap[q_bm])
+            if rev <= 0:
+                continue
+            rung = a._bm_rung(q_bm, rev, src)
+            for group in groups:
+                eligible = [x for x in group if x[1] >= q_bm]
+                if not eligible:
+                    continue
+                cost, quality, _, city, cost_src, robust_cost, robust_src = min(eligible, key=lambda x: x[:3])
+                if rev - cost > 0:
+                    out.append(a._flip_result(item_id, city, quality, cost, cost_src, robust_cost, robust_src, rung))
+    return out
+
+
+@pytest.mark.parametrize("sourcing", ["upgrade", "upgrade_any_city"])
+@pytest.mark.parametrize("seed", [1, 2])
+def test_upgrade_matches_brute_force(seed, sourcing):
+    a = BMFlippingAnalyzer(base_item="ITEM", engine="python", sourcing=sourcing)
+    index = random_index(seed)
+    expected = reference_upgrade(a, index, any_city=sourcing == "upgrade_any_city")
+    assert sorted(a._compute(index), key=repr) == sorted(expected, key=repr)
+
+
+def test_upgrade_fills_low_order_with_cheaper_higher_quality():
+    index = {
+        "T4_ITEM": {
+            "Caerleon": {1: q(sell_min=9_000, sell_max=9_000), 2: q(sell_min=1_000, sell_max=1_000)},
+            "Black Market": {1: q(buy_max=3_000)},
+        }
+    }
+    same = BMFlippingAnalyzer(base_item="ITEM", engine="python").analyze_index(index)
+    up = BMFlippingAnalyzer(base_item="ITEM", engine="python", sourcing="upgrade").analyze_index(index)
+
+    # same_quality: la Q2 ya se vende en la orden Q1 (calidad BM <= origen)
+    assert [(r.origin_quality, r.bm_quality_used) for r in same] == [(2, 1)]
+    # upgrade: la orden Q1 se llena con lo más barato de calidad >= 1, que es la Q2
+    assert [(r.origin_quality, r.bm_quality_used, r.origin_price) for r in up] == [(2, 1, 1_000)]
+
+
+def test_numpy_engine_rejects_upgrade_sourcing():
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError, match="sourcing"):
+        BMFlippingAnalyzer(base_item="ITEM", engine="numpy", sourcing="upgrade")
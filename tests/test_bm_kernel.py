@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.domain.bm_analyzer import BMFlippingAnalyzer  # noqa: E402
+from src.scripts.bench_bm_kernel import edge_case_index, synthetic_index  # noqa: E402
+
+INDEXES = {
+    "edge": lambda: edge_case_index(seed=7, n_items=600),
+    "catalog": lambda: synthetic_index(n_items=500),
+}
+
+
+@pytest.fixture(scope="module", params=sorted(INDEXES))
+def index(request):
+    return INDEXES[request.param]()
+
+
+def test_compute_parity(index):
+    py = BMFlippingAnalyzer(base_item="ITEM", engine="python")
+    vec = BMFlippingAnalyzer(base_item="ITEM", engine="numpy")
+    # mismos FlipResult en el mismo orden
+    assert vec._compute(index) == py._compute(index)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [dict(), dict(top_n=25), dict(top_n=0), dict(min_profit_net=5000, min_margin_net=0.1, top_n=100)],
+)
+def test_analyze_index_parity(index, kwargs):
+    py = BMFlippingAnalyzer(base_item="ITEM", engine="python")
+    vec = BMFlippingAnalyzer(base_item="ITEM", engine="numpy")
+    assert vec.analyze_index(index, **kwargs) == py.analyze_index(index, **kwargs)
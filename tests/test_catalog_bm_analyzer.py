@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer, result_key
+from src.infra.price_fetcher import FetchCancelled
+from src.scripts.fake_albion_api import ServerConfig
+
+SLUGS = ["weapons", "armor", "mixed"]
+
+
+def coverage(report):
+    return {c.category_slug: (c.status, c.items_done, c.items_total) for c in report.coverage}
+
+
+def test_deadline_scan_that_finishes_in_time_matches_full_scan(catalog_db, fake_api):
+    fake_api()
+    in_time = CatalogBMAnalyzer(catalog_db).run(category_slugs=SLUGS, deadline_ms=30_000)
+    full = CatalogBMAnalyzer(catalog_db).run(category_slugs=SLUGS)
+
+    assert not in_time.deadline_hit
+    assert coverage(in_time) == {slug: ("complete", 12, 12) for slug in SLUGS}
+    assert in_time.top_global == full.top_global
+    assert full.top_global  # el stand-in da oportunidades en este catálogo
+
+
+def test_deadline_returns_partial_report_with_coverage(catalog_db, fake_api):
+    fake_api()
+    warm = CatalogBMAnalyzer(catalog_db).run(category_slugs=["weapons"])
+
+    # el upstream ahora falla siempre: solo responde lo que quedó en cache
+    fake_api(ServerConfig(error_5xx_ratio=1.0))
+    report = CatalogBMAnalyzer(catalog_db).run(category_slugs=SLUGS, deadline_ms=300)
+
+    assert report.deadline_hit
+    assert coverage(report) == {
+        "weapons": ("complete", 12, 12),
+        "armor": ("skipped", 0, 12),
+        "mixed": ("partial", 6, 12),
+    }
+    by_slug = {c.category_slug: c for c in report.categories}
+    assert by_slug["weapons"].top_results == warm.categories[0].top_results
+    assert by_slug["armor"].top_results == []
+    assert {r.item_id.split("_", 1)[1].split("@")[0] for r in by_slug["mixed"].top_results} <= {"MAIN_SWORD"}
+
+
+class _BackoffAtDeadline(CatalogBMAnalyzer):
+    """
+    El fetch queda en una espera cancelable (como el backoff de PriceFetcher) y
+    sale con FetchCancelled apenas se corta; stop.set() le da tiempo a terminar
+    antes de que el scan mire si el hilo sigue vivo.
+    """
+
+    def _iter_template_tops(self, specs, *, cancel, **kwargs):
+        set_event = cancel.set
+
+        def set_and_let_worker_exit():
+            set_event()
+            time.sleep(0.2)
+
+        cancel.set = set_and_let_worker_exit
+        yield {s.template_key: [] for s in specs}
+        cancel.wait(5)
+        raise FetchCancelled()
+
+
+def test_deadline_hit_while_fetch_waits_in_backoff_is_not_an_error(catalog_db):
+    report = _BackoffAtDeadline(catalog_db).run(category_slugs=["armor"], deadline_ms=100)
+    assert report.deadline_hit
+    assert coverage(report) == {"armor": ("skipped", 0, 12)}
+
+
+def test_catalog_plan_dedupes_templates_shared_by_categories(catalog_db):
+    plan = CatalogBMAnalyzer(catalog_db).plan_catalog(["weapons", "mixed"])
+
+    assert [s.template_key for s in plan.specs] == ["MAIN_AXE", "MAIN_SWORD", "BAG"]
+    assert plan.stats.categories == 2
+    assert plan.stats.item_ids_requested == 24  # MAIN_SWORD cuenta en las dos
+    assert plan.stats.item_ids_unique == 18
+    assert plan.stats.requests_planned <= plan.stats.requests_per_category
+    assert plan.requests_by_category == {"weapons": 1, "mixed": 1}
+
+
+def test_global_top_counts_a_shared_template_once(catalog_db, fake_api):
+    fake_api()
+    report = CatalogBMAnalyzer(catalog_db).run(category_slugs=["weapons", "mixed"])
+
+    sword = lambda results: [r for r in results if "_MAIN_SWORD" in r.item_id]  # noqa: E731
+    by_slug = {c.category_slug: c for c in report.categories}
+    assert sword(by_slug["weapons"].top_results) == sword(by_slug["mixed"].top_results) != []
+    keys = [result_key(r) for r in report.top_global]
+    assert len(keys) == len(set(keys))
+    assert sword(report.top_global) == sword(by_slug["weapons"].top_results)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer, result_key
+from src.domain.catalog_scan import CatalogScanCoordinator, CatalogScanWorker
+from src.infra.scan_queue import ScanQueue
+
+SLUGS = ["weapons", "armor", "mixed"]
+
+
+class FlakyCatalog(CatalogBMAnalyzer):
+    """Falla las primeras `failures` veces que se escanea `shard`."""
+
+    def __init__(self, db_path, *, shard: str, failures: int) -> None:
+        super().__init__(db_path)
+        self.shard = shard
+        self.failures = failures
+
+    def iter_category_runs(self, slug, **kwargs):
+        if slug == self.shard and self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("upstream caído")
+        yield from super().iter_category_runs(slug, **kwargs)
+
+
+def test_worker_drains_the_queue_and_merge_matches_a_direct_run(catalog_db, fake_api):
+    fake_api()
+    catalog = CatalogBMAnalyzer(catalog_db)
+    queue = ScanQueue(catalog_db)
+    coordinator = CatalogScanCoordinator(catalog, queue)
+
+    scan_id = coordinator.submit(category_slugs=SLUGS + ["sin-templates"])
+    assert CatalogScanWorker(catalog, queue, worker_id="w1").run(scan_id) == 4
+    assert coordinator.wait(scan_id, poll_sec=0.01, timeout=5).done == 4
+
+    merged = coordinator.merge(scan_id)
+    direct = catalog.run(category_slugs=SLUGS)
+
+    by_slug = {c.category_slug: c for c in merged.categories}
+    assert sorted(by_slug) == sorted(SLUGS + ["sin-templates"])
+    assert by_slug["sin-templates"].top_results == []
+    for c in direct.categories:
+        assert by_slug[c.category_slug].top_results == c.top_results
+    # MAIN_SWORD está en weapons y mixed: cuenta una vez en el global
+    assert sorted(map(result_key, merged.top_global)) == sorted(map(result_key, direct.top_global))
+    assert len(merged.top_global) == len({result_key(r) for r in merged.top_global})
+
+
+def test_failed_shard_is_retried_then_marked_failed(catalog_db, fake_api):
+    fake_api()
+    queue = ScanQueue(catalog_db, max_attempts=2)
+
+    flaky = FlakyCatalog(catalog_db, shard="armor", failures=1)
+    coordinator = CatalogScanCoordinator(flaky, queue)
+    scan_id = coordinator.submit(category_slugs=SLUGS)
+    assert CatalogScanWorker(flaky, queue, worker_id="w1").run(scan_id) == 3  # reintento exitoso
+    assert queue.failed_shards(scan_id) == []
+
+    broken = FlakyCatalog(catalog_db, shard="armor", failures=99)
+    scan_id = CatalogScanCoordinator(broken, queue).submit(category_slugs=SLUGS)
+    assert CatalogScanWorker(broken, queue, worker_id="w1").run(scan_id) == 2
+    assert broken.failures == 97  # max_attempts intentos y nada más
+    assert queue.failed_shards(scan_id) == ["armor"]
+
+    progress = queue.progress(scan_id)
+    assert (progress.done, progress.failed, progress.finished) == (2, 1, True)
+    partial = CatalogScanCoordinator(broken, queue).merge(scan_id)
+    assert sorted(c.category_slug for c in partial.categories) == ["mixed", "weapons"]
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from src.domain.catalog_bm_analyzer import CatalogReport
+from src.domain.catalog_snapshot import CatalogSnapshotRefresher
+from src.infra.price_fetcher import FetchCancelled
+
+
+class StubCatalog:
+    """run() espera `gate` (o el cancel) y devuelve un reporte vacío; `fail` lo hace fallar."""
+
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.gate.set()
+        self.calls = 0
+        self.fail = False
+        self.entered = threading.Event()
+
+    def run(self, *, region, cancel, **kwargs) -> CatalogReport:
+        self.calls += 1
+        self.entered.set()
+        while not self.gate.wait(0.01):
+            if cancel.is_set():
+                raise FetchCancelled()
+        if self.fail:
+            raise RuntimeError("upstream caído")
+        return CatalogReport(categories=[], top_global=[])
+
+
+def wait_idle(refresher: CatalogSnapshotRefresher) -> None:
+    with refresher._lock:
+        refresher._done.wait_for(lambda: not refresher._state.refreshing, timeout=5)
+
+
+def test_serves_stale_snapshot_while_revalidating():
+    catalog = StubCatalog()
+    r = CatalogSnapshotRefresher(catalog, max_age_sec=60)
+
+    first = r.get()
+    assert first.snapshot is None and first.stale and first.refreshing
+    wait_idle(r)
+    snap = r.get().snapshot
+    assert snap.version == 1 and not r.get().stale
+
+    catalog.gate.clear()
+    later = r.get(now=snap.built_at + 61)
+    assert later.snapshot is snap  # el viejo se sigue sirviendo, sin esperar
+    assert later.stale and later.refreshing
+
+    catalog.gate.set()
+    wait_idle(r)
+    assert r.get().snapshot.version == 2
+    r.stop()
+
+
+def test_only_one_refresh_runs_at_a_time():
+    catalog = StubCatalog()
+    catalog.gate.clear()
+    r = CatalogSnapshotRefresher(catalog)
+
+    threads = [threading.Thread(target=r.get) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert r.refresh(wait=False) is None  # se suma al que está en curso
+    catalog.gate.set()
+    wait_idle(r)
+
+    assert catalog.calls == 1
+    assert r.get().snapshot.version == 1
+    r.stop()
+
+
+def test_failed_refresh_keeps_snapshot_and_cools_down():
+    catalog = StubCatalog()
+    r = CatalogSnapshotRefresher(catalog, max_age_sec=60)
+    snap = r.refresh(timeout=5)
+
+    catalog.fail = True
+    r.get(now=snap.built_at + 61)
+    wait_idle(r)
+    status = r.get(now=snap.built_at + 61)
+    assert status.snapshot is snap
+    assert status.last_error == "RuntimeError: upstream caído"
+    assert not status.refreshing and catalog.calls == 2  # en cooldown: no reintenta
+
+    r._state.failed_at -= CatalogSnapshotRefresher.ERROR_RETRY_SEC
+    catalog.fail = False
+    assert r.get(now=snap.built_at + 61).refreshing
+    wait_idle(r)
+    status = r.get()
+    assert status.snapshot.version == 2 and status.last_error is None
+    r.stop()
+
+
+def test_stop_cancels_the_scan_in_flight_and_blocks_new_ones():
+    catalog = StubCatalog()
+    catalog.gate.clear()
+    r = CatalogSnapshotRefresher(catalog)
+    r.start()
+    assert catalog.entered.wait(5)
+
+    t0 = time.monotonic()
+    r.stop(timeout=5)
+    assert time.monotonic() - t0 < 2
+    assert not r._worker.is_alive()
+
+    status = r.get()
+    assert status.snapshot is None and status.last_error is None  # apagado: no es un error
+    assert not status.refreshing
+    assert r.refresh(wait=False) is None
+    assert catalog.calls == 1
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from src.domain.bm_analyzer import BMFlippingAnalyzer
+from src.domain.bm_kernel import HAS_NUMPY
+from src.infra.columnar_index import ColumnarIndex
+from src.infra.market_types import MarketIndex, Quote
+from src.infra.price_decoder import merge_decoded_rows
+from src.scripts.bench_bm_kernel import edge_case_index
+
+CITIES = ["Caerleon", "Lymhurst", "Martlock", "Black Market"]
+DATES = ["2024-01-01T00:00:00", "2023-12-31T23:59:59", "", "2024-01-01T00:00:00.500", "no-es-fecha", "0001-01-01T00:00:00"]
+
+needs_numpy = pytest.mark.skipif(not HAS_NUMPY, reason="numpy no está instalado")
+
+
+def random_rows(seed: int, n_items: int = 200):
+    """Filas (item, ciudad, calidad, Quote) mezcladas entre items, con repetidas y fechas raras."""
+    rng = random.Random(seed)
+
+    def price() -> int:
+        return rng.choice((0, 0, 1_000, 2_000, 5_000, rng.randint(1, 300_000)))
+
+    rows = []
+    for n in range(n_items):
+        for city in CITIES:
+            for quality in range(1, 6):
+                if rng.random() < 0.3:
+                    continue
+                dates = [rng.choice(DATES) for _ in range(4)]
+                rows.append((f"T{4 + n % 5}_ITEM_{n}", city, quality, Quote(price(), price(), price(), price(), *dates)))
+    rng.shuffle(rows)
+    rows += rows[: len(rows) // 10]  # repetidas: pisan a la anterior en su lugar
+    return rows
+
+
+def as_dicts(index) -> list:
+    """Contenido Y orden de recorrido de un MarketIndex (dict o columnar)."""
+    return [
+        (item_id, [(city, list(qmap.items())) for city, qmap in city_map.items()])
+        for item_id, city_map in index.items()
+    ]
+
+
+def dict_index(rows) -> MarketIndex:
+    index: MarketIndex = {}
+    merge_decoded_rows(index, rows)
+    return index
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_from_rows_matches_merge_decoded_rows_including_dates_and_order(seed):
+    rows = random_rows(seed)
+    col = ColumnarIndex.from_rows(rows)
+
+    assert as_dicts(col) == as_dicts(dict_index(rows))
+    assert len(col) == len(dict_index(rows))
+
+
+def test_round_trip_from_market_index():
+    index = dict_index(random_rows(4))
+    col = ColumnarIndex.from_market_index(index)
+    assert as_dicts(col) == as_dicts(index)
+
+    item_id = next(iter(index))
+    city = next(iter(index[item_id]))
+    quality = next(iter(index[item_id][city]))
+    assert col[item_id][city][quality] == index[item_id][city][quality]
+    assert "T4_NOPE" not in col
+    with pytest.raises(KeyError):
+        col[item_id][city][9]
+
+
+def test_odd_dates_follow_their_rows_when_rows_are_reordered():
+    odd = Quote(1, 2, 3, 4, "raro", "", "2024-01-01T00:00:00", "")
+    rows = [
+        ("T4_A", "Caerleon", 1, Quote(5, 5, 5, 5, "", "", "", "")),
+        ("T4_B", "Caerleon", 1, Quote(6, 6, 6, 6, "", "", "", "")),
+        ("T4_A", "Lymhurst", 2, odd),   # llega después de otro item: se reordena
+    ]
+    col = ColumnarIndex.from_rows(rows)
+    assert col["T4_A"]["Lymhurst"][2] == odd
+    assert col["T4_B"]["Caerleon"][1].sell_min_date == ""
+
+
+@pytest.mark.parametrize("engine", ["python", pytest.param("numpy", marks=needs_numpy)])
+@pytest.mark.parametrize("make_index", [lambda: edge_case_index(seed=3, n_items=400), lambda: dict_index(random_rows(5))])
+def test_analysis_parity_between_dict_and_columnar(engine, make_index):
+    index = make_index()
+    col = ColumnarIndex.from_market_index(index)
+    a = BMFlippingAnalyzer(base_item="ITEM", engine=engine)
+
+    assert a._compute(col) == a._compute(index)
+    for kw in (dict(), dict(top_n=25), dict(min_profit_net=5000, min_margin_net=0.1, top_n=100)):
+        assert a.analyze_index(col, **kw) == a.analyze_index(index, **kw)
+
+
+@pytest.mark.parametrize("sourcing", ["upgrade", "upgrade_any_city"])
+def test_upgrade_sourcing_parity_between_dict_and_columnar(sourcing):
+    index = dict_index(random_rows(6))
+    col = ColumnarIndex.from_market_index(index)
+    a = BMFlippingAnalyzer(base_item="ITEM", engine="python", sourcing=sourcing)
+
+    results = a.analyze_index(index)
+    assert results  # hay oportunidades que comparar
+    assert a.analyze_index(col) == results
+    assert a.analyze_index(col, top_n=10) == a.analyze_index(index, top_n=10)
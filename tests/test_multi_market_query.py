@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from src.domain.catalog_bm_analyzer import CatalogBMAnalyzer
+from src.infra.multi_market_query import MultiMarketQuery, TieredSpec
+from src.infra.quote_cache import QuoteCache, shared_quote_cache
+from src.infra.rate_governor import RateGovernor
+from src.infra.template_repo import TemplateSpec
+
+CITIES = ["Caerleon", "Lymhurst", "Black Market"]
+
+
+def spec(key, *, tiers=(4, 4), qualities=None, cities=None) -> TieredSpec:
+    return TieredSpec(key, tiers[0], tiers[1], 0, 0, qualities=qualities, cities=cities)
+
+
+def query(specs) -> MultiMarketQuery:
+    return MultiMarketQuery(
+        specs, cities=CITIES, qualities=[1, 2, 3], cache=QuoteCache(), governor=RateGovernor()
+    )
+
+
+def test_items_are_grouped_by_cities_and_qualities():
+    groups = query([
+        spec("BAG", tiers=(4, 5)),
+        spec("CAPE", qualities=(1,), cities=("Black Market",)),
+        spec("MAIN_AXE", tiers=(4, 5)),
+    ]).plan_groups()
+
+    assert [(g.cities, g.qualities, g.item_ids) for g in groups] == [
+        (tuple(CITIES), (1, 2, 3), ("T4_BAG", "T5_BAG", "T4_MAIN_AXE", "T5_MAIN_AXE")),
+        (("Black Market",), (1,), ("T4_CAPE",)),
+    ]
+
+
+def test_item_in_several_specs_asks_for_the_union_of_their_needs():
+    groups = query([
+        spec("BAG", tiers=(4, 5), qualities=(1,), cities=("Caerleon", "Black Market")),
+        spec("BAG", tiers=(5, 6), qualities=(3,), cities=("Lymhurst", "Black Market")),
+    ]).plan_groups()
+
+    by_item = {x: (g.cities, g.qualities) for g in groups for x in g.item_ids}
+    assert by_item == {
+        "T4_BAG": (("Caerleon", "Black Market"), (1,)),
+        "T5_BAG": (tuple(CITIES), (1, 3)),
+        "T6_BAG": (("Lymhurst", "Black Market"), (3,)),
+    }
+    # cada item en un solo grupo
+    assert sum(len(g.item_ids) for g in groups) == 3
+
+
+def test_groups_follow_spec_order_not_group_size():
+    # el primer spec (más prioritario) es un grupo chico: sale primero igual
+    mq = query([
+        spec("CAPE", qualities=(1,)),
+        spec("BAG", tiers=(4, 8)),
+        spec("MAIN_AXE", tiers=(4, 8)),
+        spec("SHOES", qualities=(1,)),
+    ])
+    groups = mq.plan_groups()
+    assert [g.item_ids for g in groups] == [
+        ("T4_CAPE", "T4_SHOES"),
+        tuple(f"T{t}_{k}" for k in ("BAG", "MAIN_AXE") for t in range(4, 9)),
+    ]
+    assert [x for chunk in mq.plan_chunks() for x in chunk] == [x for g in groups for x in g.item_ids]
+
+
+def test_template_qualities_and_cities_are_pushed_down_with_the_black_market():
+    template = TemplateSpec("BAG", 4, 4, 0, 0, qualities=(2, 3), cities=("Caerleon",))
+    [group] = MultiMarketQuery(
+        [CatalogBMAnalyzer._tiered_spec(template)], cache=QuoteCache(), governor=RateGovernor()
+    ).plan_groups()
+    assert group.cities == ("Caerleon", "Black Market")
+    assert group.qualities == (2, 3)
+
+
+def test_fetcher_for_region_normalizes_the_region():
+    mq = query([spec("BAG")])
+    assert mq._fetcher_for_region(" West") is mq.fetcher
+    east = mq._fetcher_for_region("EAST ")
+    assert east.region == "east"
+    assert east.cache is shared_quote_cache("east")
+
+
+def test_fetch_regions_keeps_each_region_apart(fake_api):
+    server = fake_api()
+    mq = MultiMarketQuery(
+        [spec("BAG", tiers=(4, 8)), spec("CAPE", tiers=(4, 8))],
+        cities=["Caerleon", "Black Market"], qualities=[1, 2],
+    )
+    by_region = mq.fetch_regions(["west", "East", "east"])
+
+    assert sorted(by_region) == ["east", "west"]
+    assert by_region["west"] == by_region["east"] != {}  # el stand-in responde igual en todas
+    assert server.requests_served == 2  # un batch por región
+
+    # cada región cachea lo suyo: repetir no pide nada, y west no vuelve a pedir
+    mq.fetch_regions(["west", "east"])
+    assert server.requests_served == 2
+    assert shared_quote_cache("west").lookup(mq.build_item_ids(), mq.cities, mq.qualities) == (by_region["west"], [])
+    assert shared_quote_cache("europe").stats().items == 0
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from src.infra.market_types import Quote
+from src.infra.negative_cache import NegativeCache
+
+SCOPE = NegativeCache.scope_for(["Caerleon", "Black Market"], [2, 1])
+QUOTE = Quote(100, 100, 90, 90, "", "", "", "")
+ITEMS = ["T4_DEAD", "T4_LIVE"]
+
+
+def traded(*item_ids):
+    return {x: {"Caerleon": {1: QUOTE}} for x in item_ids}
+
+
+def test_scope_is_order_independent():
+    assert SCOPE == NegativeCache.scope_for(["Black Market", "Caerleon"], [1, 2]) == "Black Market,Caerleon|1,2"
+
+
+def test_item_is_pruned_after_min_empty_scans(tmp_path):
+    neg = NegativeCache(tmp_path / "neg.db", min_empty_scans=3, probe_every_sec=100)
+    for t in range(3):
+        assert neg.split(ITEMS, SCOPE, now=t) == (ITEMS, [])
+        neg.record(ITEMS, traded("T4_LIVE"), SCOPE, now=t)
+
+    assert neg.split(ITEMS, SCOPE, now=3) == (["T4_LIVE"], ["T4_DEAD"])
+    assert neg.pruned_items() == {"T4_DEAD": 3}
+
+
+def test_a_trade_resets_the_streak(tmp_path):
+    neg = NegativeCache(tmp_path / "neg.db", min_empty_scans=2)
+    neg.record(["T4_DEAD"], {}, SCOPE, now=0)
+    neg.record(["T4_DEAD"], traded("T4_DEAD"), SCOPE, now=1)
+    neg.record(["T4_DEAD"], {}, SCOPE, now=2)
+    assert neg.split(["T4_DEAD"], SCOPE, now=3) == (["T4_DEAD"], [])
+
+
+def test_pruned_item_is_probed_again_after_probe_interval(tmp_path):
+    neg = NegativeCache(tmp_path / "neg.db", min_empty_scans=1, probe_every_sec=100)
+    neg.record(["T4_DEAD"], {}, SCOPE, now=0)
+
+    assert neg.split(["T4_DEAD"], SCOPE, now=50) == ([], ["T4_DEAD"])
+    assert neg.split(["T4_DEAD"], SCOPE, now=101) == (["T4_DEAD"], [])
+
+    neg.record(["T4_DEAD"], {}, SCOPE, now=101)  # la sonda vuelve vacía: otro período podado
+    assert neg.split(["T4_DEAD"], SCOPE, now=150) == ([], ["T4_DEAD"])
+
+
+def test_region_and_scope_are_isolated(tmp_path):
+    neg = NegativeCache(tmp_path / "neg.db", min_empty_scans=1)
+    neg.record(["T4_DEAD"], {}, SCOPE, region="east", now=0)
+
+    assert neg.split(["T4_DEAD"], SCOPE, region="east", now=1) == ([], ["T4_DEAD"])
+    assert neg.split(["T4_DEAD"], SCOPE, region="west", now=1) == (["T4_DEAD"], [])
+    narrow = NegativeCache.scope_for(["Caerleon"], [1])
+    assert neg.split(["T4_DEAD"], narrow, region="east", now=1) == (["T4_DEAD"], [])
+
+
+def test_split_handles_more_items_than_one_sql_chunk(tmp_path):
+    neg = NegativeCache(tmp_path / "neg.db", min_empty_scans=1)
+    ids = [f"T4_ITEM_{i}" for i in range(1200)]
+    neg.record(ids[::2], {}, SCOPE, now=0)
+
+    to_fetch, pruned = neg.split(ids, SCOPE, now=1)
+    assert pruned == ids[::2]
+    assert to_fetch == ids[1::2]
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from src.infra.price_decoder import iter_price_rows, merge_decoded_rows
+
+
+def row(item_id, city, quality, sell_min=0, sell_max=0, buy_min=0, buy_max=0) -> dict:
+    return {
+        "item_id": item_id,
+        "city": city,
+        "quality": quality,
+        "sell_price_min": sell_min,
+        "sell_price_min_date": "2024-01-01T00:00:00",
+        "sell_price_max": sell_max,
+        "sell_price_max_date": "2024-01-01T00:00:00",
+        "buy_price_min": buy_min,
+        "buy_price_min_date": "2024-01-01T00:00:00",
+        "buy_price_max": buy_max,
+        "buy_price_max_date": "2024-01-01T00:00:00",
+    }
+
+
+ROWS = [
+    row("T4_BAG", "Caerleon", 1, 100, 120, 80, 90),
+    row("T4_BAG", "Caerleon", 2),  # todo en 0: se descarta
+    row("T4_BAG", "Black Market", 1, buy_max=150),
+    row("T5_BAG@1", "Lymhurst", 3, sell_min=999),
+    row("T5_BAG@1", "Black Market", 3, 0, 0, 0, 0),
+]
+
+
+def split(body: bytes, size: int):
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 10_000])
+def test_rows_survive_any_chunk_boundary(size):
+    body = json.dumps(ROWS, separators=(",", ":")).encode("utf-8")
+    rows = list(iter_price_rows(split(body, size)))
+
+    assert [(i, c, q) for i, c, q, _ in rows] == [
+        ("T4_BAG", "Caerleon", 1),
+        ("T4_BAG", "Black Market", 1),
+        ("T5_BAG@1", "Lymhurst", 3),
+    ]
+    quote = rows[0][3]
+    assert (quote.sell_min, quote.sell_max, quote.buy_min, quote.buy_max) == (100, 120, 80, 90)
+
+
+def test_pretty_printed_body_and_city_filter():
+    body = json.dumps(ROWS, indent=2).encode("utf-8")
+    rows = list(iter_price_rows(split(body, 5), cities=frozenset({"Black Market"})))
+    assert [(i, c, q) for i, c, q, _ in rows] == [("T4_BAG", "Black Market", 1)]
+
+
+def test_multibyte_text_split_mid_character():
+    body = json.dumps([row("T4_BAG", "Caerleón", 1, sell_min=5)], ensure_ascii=False).encode("utf-8")
+    rows = list(iter_price_rows(split(body, 1)))
+    assert rows[0][1] == "Caerleón"
+
+
+@pytest.mark.parametrize("body", [b"", b"{\"error\":\"rate limited\"}", b"[]", b"  [ ]  "])
+def test_non_array_or_empty_body_yields_nothing(body):
+    assert list(iter_price_rows([body])) == []
+
+
+def test_merge_decoded_rows_builds_index():
+    body = json.dumps(ROWS).encode("utf-8")
+    index = {}
+    merge_decoded_rows(index, iter_price_rows([body]))
+    assert set(index) == {"T4_BAG", "T5_BAG@1"}
+    assert set(index["T4_BAG"]) == {"Caerleon", "Black Market"}
+    assert index["T5_BAG@1"]["Lymhurst"][3].sell_min == 999
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+import requests
+
+from src.infra.price_fetcher import FetchCancelled, PriceFetcher
+from src.infra.quote_cache import QuoteCache
+from src.infra.rate_governor import RateGovernor
+from src.infra.single_flight import SingleFlight
+from src.scripts.fake_albion_api import ServerConfig, base_url_for, render_rows, start_server
+
+BASE_URL = "https://west.albion-online-data.com/api/v2/stats/prices"
+CITIES = ["Caerleon", "Fort Sterling", "Black Market"]
+ITEM_IDS = [f"T{t}_ITEM_{i}@{e}" for i in range(60) for t in range(4, 9) for e in range(4)]
+
+
+def make_fetcher(base_url: str = BASE_URL, **kwargs) -> PriceFetcher:
+    kwargs.setdefault("governor", RateGovernor(rate_per_min=60_000, burst=1000))
+    return PriceFetcher(
+        base_url=base_url,
+        cities=CITIES,
+        qualities=[1, 2, 3],
+        cache=QuoteCache(),
+        flight=SingleFlight(),
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("max_url_bytes", [300, 1024, 4096])
+def test_plan_chunks_respects_url_byte_limit(max_url_bytes):
+    f = make_fetcher(max_url_bytes=max_url_bytes)
+    chunks = f.plan_chunks(ITEM_IDS)
+
+    assert [x for c in chunks for x in c] == ITEM_IDS  # sin perder ni reordenar
+    assert all(len(f.build_url(c).encode("utf-8")) <= max_url_bytes for c in chunks)
+    # cada batch se llena: el primer id del siguiente ya no entraba
+    for cur, nxt in zip(chunks, chunks[1:]):
+        assert len(f.build_url(cur + nxt[:1]).encode("utf-8")) > max_url_bytes
+
+
+def test_plan_chunks_max_items_and_oversized_id():
+    f = make_fetcher(max_url_bytes=200)
+    assert all(len(c) <= 3 for c in f.plan_chunks(ITEM_IDS, max_items=3))
+
+    huge = "T4_" + "X" * 500
+    assert f.plan_chunks(["T4_A", huge, "T4_B"]) == [["T4_A"], [huge], ["T4_B"]]
+
+
+def test_plan_chunks_scales_with_governor_unless_not_adaptive():
+    gov = RateGovernor(rate_per_min=60_000, burst=1000, min_batch_scale=0.25)
+    f = make_fetcher(max_url_bytes=2048, governor=gov)
+    full = f.plan_chunks(ITEM_IDS)
+
+    gov.on_error()  # AIMD: batch_scale 1 -> 0.5
+    assert len(f.plan_chunks(ITEM_IDS)) > len(full)
+    assert f.plan_chunks(ITEM_IDS, adaptive=False) == full
+
+
+def test_rejected_batches_are_split_until_they_fit():
+    server = start_server(config=ServerConfig(max_url_bytes=600))
+    try:
+        f = make_fetcher(base_url_for(server), max_url_bytes=4096)
+        ids = ITEM_IDS[:120]
+        index = f.fetch_items(ids)
+    finally:
+        server.shutdown()
+
+    assert set(index) <= set(ids)
+    assert index  # el stand-in devuelve precios para la mayoría
+    assert server.too_long > 0  # hubo 414 y el batch se partió
+    assert server.requests_served > 1
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, body: bytes = b"[]") -> None:
+        self.status_code = status_code
+        self.headers = {}
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+    def iter_content(self, chunk_size: int = 1):
+        yield self._body
+
+    def close(self) -> None:
+        pass
+
+
+ROW = {"item_id": "T4_A", "city": "Caerleon", "quality": 1,
+       "sell_price_min": 100, "sell_price_max": 120, "buy_price_min": 80, "buy_price_max": 90}
+
+
+class _GatedSession:
+    """El primer GET se queda esperando `gate` y responde 503; los demás, 200 con filas."""
+
+    def __init__(self) -> None:
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None, stream=False):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            self.entered.set()
+            self.gate.wait(5)
+            return _FakeResponse(503)
+        return _FakeResponse(200, render_rows([ROW]))
+
+
+def test_leader_cancellation_is_not_shared_with_other_callers():
+    session = _GatedSession()
+    flight = SingleFlight()
+    gov = RateGovernor(rate_per_min=60_000, burst=1000, base_backoff_sec=0.01)
+    cancel = threading.Event()
+
+    def fetcher() -> PriceFetcher:
+        return PriceFetcher(
+            base_url=BASE_URL, cities=["Caerleon"], qualities=[1],
+            session=session, cache=QuoteCache(), flight=flight, governor=gov,
+        )
+
+    leader = fetcher().cancellable(cancel)
+    waiter = fetcher()
+    outcome = {}
+
+    def run(name, f):
+        try:
+            outcome[name] = f._fetch_chunk(["T4_A"])
+        except Exception as e:
+            outcome[name] = e
+
+    t_leader = threading.Thread(target=run, args=("leader", leader))
+    t_leader.start()
+    assert session.entered.wait(5)
+    t_waiter = threading.Thread(target=run, args=("waiter", waiter))
+    t_waiter.start()
+    while flight.shared < 1:
+        time.sleep(0.001)
+
+    cancel.set()
+    session.gate.set()
+    t_leader.join(5)
+    t_waiter.join(5)
+
+    assert isinstance(outcome["leader"], FetchCancelled)
+    assert [(i, c, q) for i, c, q, _ in outcome["waiter"]] == [("T4_A", "Caerleon", 1)]
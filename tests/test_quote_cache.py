@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from src.infra.market_types import Quote
+from src.infra.quote_cache import QuoteCache
+
+CITIES = ["Caerleon", "Black Market"]
+QUALITIES = [1, 2]
+Q = Quote(100, 120, 80, 90, "", "", "", "")
+
+
+def city_map(n_quotes: int):
+    return {"Caerleon": {q: Q for q in range(1, n_quotes + 1)}}
+
+
+def test_ttl_expiry_and_stats():
+    cache = QuoteCache(ttl_sec=60)
+    cache.save({"T4_BAG": city_map(1)}, ["T4_BAG", "T4_DEAD"], CITIES, QUALITIES, fetched_at=1000)
+
+    index, missing = cache.lookup(["T4_BAG", "T4_DEAD"], CITIES, QUALITIES, now=1060)
+    assert index == {"T4_BAG": {"Caerleon": {1: Q}}}
+    assert missing == []  # un item sin filas también queda cacheado
+
+    assert cache.lookup(["T4_BAG"], CITIES, QUALITIES, now=1061) == ({}, ["T4_BAG"])
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.items) == (2, 1, 1)
+
+
+def test_subset_is_filtered_and_superset_misses():
+    cache = QuoteCache()
+    cache.save({"T4_BAG": city_map(2)}, ["T4_BAG"], CITIES, QUALITIES, fetched_at=1000)
+
+    index, missing = cache.lookup(["T4_BAG"], ["Caerleon"], [2], now=1000)
+    assert index == {"T4_BAG": {"Caerleon": {2: Q}}}
+    assert missing == []
+
+    assert cache.lookup(["T4_BAG"], ["Lymhurst"], [1], now=1000)[1] == ["T4_BAG"]
+    assert cache.lookup(["T4_BAG"], CITIES, [1, 2, 3], now=1000)[1] == ["T4_BAG"]
+
+
+def test_lookup_returns_copies():
+    cache = QuoteCache()
+    cache.save({"T4_BAG": city_map(1)}, ["T4_BAG"], CITIES, QUALITIES, fetched_at=1000)
+    cache.lookup(["T4_BAG"], CITIES, QUALITIES, now=1000)[0]["T4_BAG"]["Caerleon"].clear()
+    assert cache.lookup(["T4_BAG"], CITIES, QUALITIES, now=1000)[0] == {"T4_BAG": {"Caerleon": {1: Q}}}
+
+
+def test_lru_eviction_by_quote_count():
+    cache = QuoteCache(max_quotes=4)
+    cache.save({"A": city_map(2), "B": city_map(2)}, ["A", "B"], CITIES, QUALITIES, fetched_at=1000)
+    cache.lookup(["A"], CITIES, QUALITIES, now=1000)  # A pasa a ser el más reciente
+
+    cache.save({"C": city_map(1)}, ["C"], CITIES, QUALITIES, fetched_at=1000)
+
+    assert cache.lookup(["A", "B", "C"], CITIES, QUALITIES, now=1000)[1] == ["B"]
+    stats = cache.stats()
+    assert (stats.evictions, stats.items, stats.quotes) == (1, 2, 3)
+
+
+def test_resave_does_not_double_count():
+    cache = QuoteCache(max_quotes=2)
+    for t in range(5):
+        cache.save({"A": city_map(2)}, ["A"], CITIES, QUALITIES, fetched_at=1000 + t)
+    stats = cache.stats()
+    assert (stats.evictions, stats.quotes) == (0, 2)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from src.infra.market_types import Quote
+from src.infra.quote_store import QuoteStore
+
+CITIES = ["Caerleon", "Black Market"]
+QUALITIES = [1, 2]
+Q1 = Quote(100, 120, 80, 90, "d1", "d2", "d3", "d4")
+Q2 = Quote(200, 0, 0, 150, "", "", "", "")
+INDEX = {"T4_BAG": {"Caerleon": {1: Q1}, "Black Market": {2: Q2}}}
+
+
+def test_roundtrip_and_empty_items_count_as_fresh(tmp_path):
+    store = QuoteStore(tmp_path / "q.db", ttl_sec=60)
+    store.save(INDEX, ["T4_BAG", "T4_DEAD"], CITIES, QUALITIES, fetched_at=1000)
+
+    index, missing = store.lookup(["T4_BAG", "T4_DEAD", "T4_NEW"], CITIES, QUALITIES, now=1030)
+    assert index == INDEX
+    assert missing == ["T4_NEW"]
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    store = QuoteStore(tmp_path / "q.db", ttl_sec=60)
+    store.save(INDEX, ["T4_BAG"], CITIES, QUALITIES, fetched_at=1000)
+
+    assert store.lookup(["T4_BAG"], CITIES, QUALITIES, now=1060)[1] == []
+    assert store.lookup(["T4_BAG"], CITIES, QUALITIES, now=1061) == ({}, ["T4_BAG"])
+
+
+def test_subset_hits_and_superset_misses(tmp_path):
+    store = QuoteStore(tmp_path / "q.db")
+    store.save(INDEX, ["T4_BAG"], CITIES, QUALITIES, fetched_at=1000)
+
+    index, missing = store.lookup(["T4_BAG"], ["Caerleon"], [1], now=1000)
+    assert index == {"T4_BAG": {"Caerleon": {1: Q1}}}
+    assert missing == []
+
+    assert store.lookup(["T4_BAG"], CITIES + ["Lymhurst"], QUALITIES, now=1000)[1] == ["T4_BAG"]
+    assert store.lookup(["T4_BAG"], CITIES, [1, 2, 3], now=1000)[1] == ["T4_BAG"]
+
+
+def test_save_replaces_previous_quotes(tmp_path):
+    store = QuoteStore(tmp_path / "q.db")
+    store.save(INDEX, ["T4_BAG"], CITIES, QUALITIES, fetched_at=1000)
+    store.save({"T4_BAG": {"Caerleon": {2: Q2}}}, ["T4_BAG"], CITIES, QUALITIES, fetched_at=1010)
+
+    assert store.lookup(["T4_BAG"], CITIES, QUALITIES, now=1010)[0] == {"T4_BAG": {"Caerleon": {2: Q2}}}
+
+
+def test_regions_do_not_mix(tmp_path):
+    store = QuoteStore(tmp_path / "q.db")
+    store.save(INDEX, ["T4_BAG"], CITIES, QUALITIES, region="east", fetched_at=1000)
+
+    assert store.lookup(["T4_BAG"], CITIES, QUALITIES, region="east", now=1000)[0] == INDEX
+    assert store.lookup(["T4_BAG"], CITIES, QUALITIES, region="west", now=1000) == ({}, ["T4_BAG"])
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from src.infra.rate_governor import ENV_RATE_PER_MIN, RateGovernor, TokenBucket, governor_for
+
+
+def test_pause_sets_a_floor_instead_of_stacking():
+    bucket = TokenBucket(rate_per_sec=1.0, burst=20)
+    for _ in range(8):
+        bucket.pause(60)
+    # próximo token en ~60 s, no en 8 x 60
+    assert -60.0 <= bucket._tokens <= -58.9
+
+
+def test_pause_keeps_a_longer_pause_already_in_place():
+    bucket = TokenBucket(rate_per_sec=1.0, burst=20)
+    bucket.pause(60)
+    bucket.pause(5)
+    assert bucket._tokens < -58
+
+
+def test_pause_from_full_bucket_blocks_for_the_requested_time():
+    bucket = TokenBucket(rate_per_sec=2.0, burst=10)
+    bucket.pause(3)
+    # hace falta llegar a 1 token: 3 s a 2 tokens/s
+    assert (1.0 - bucket._tokens) / bucket.rate_per_sec == pytest.approx(3.0, abs=0.01)
+
+
+def test_throttle_pauses_bucket_and_lowers_concurrency():
+    gov = RateGovernor(rate_per_min=60, max_concurrency=8)
+    gov.on_throttle(10)
+    assert gov.concurrency == 4
+    assert gov.batch_scale == 1.0  # un 429 no achica los batches
+    assert gov.bucket._tokens <= 1.0 - 10 * gov.bucket.rate_per_sec + 0.01
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("7", 7.0), (" 2.5 ", 2.5), ("-3", 0.0), ("", None), (None, None), ("nope", None)],
+)
+def test_parse_retry_after(value, expected):
+    assert RateGovernor.parse_retry_after(value) == expected
+
+
+def test_only_albion_hosts_get_the_api_quota(monkeypatch):
+    monkeypatch.delenv(ENV_RATE_PER_MIN, raising=False)
+    api = governor_for("https://europe.albion-online-data.com/api/v2/stats/prices")
+    local = governor_for("http://127.0.0.1:65001/api/v2/stats/prices")
+    assert api.bucket.rate_per_sec == pytest.approx(55 / 60)
+    assert local.bucket.rate_per_sec > 100
+
+
+def test_rate_override_from_env(monkeypatch):
+    monkeypatch.setenv(ENV_RATE_PER_MIN, "120")
+    gov = governor_for("http://127.0.0.1:65002/api/v2/stats/prices")
+    assert gov.bucket.rate_per_sec == pytest.approx(2.0)
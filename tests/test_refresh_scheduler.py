@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+
+import pytest
+
+from src.domain.refresh_scheduler import RefreshScheduler
+from src.infra.market_types import Quote
+from src.infra.price_fetcher import PriceFetcher
+from src.infra.quote_cache import QuoteCache
+from src.infra.rate_governor import RateGovernor
+from src.infra.single_flight import SingleFlight
+from src.scripts.fake_albion_api import ServerConfig, base_url_for
+
+ITEMS = ["T4_A", "T4_B", "T4_C", "T4_D"]
+
+
+def quote(price: int) -> Quote:
+    return Quote(price, price, price, price, "", "", "", "")
+
+
+class StubFetcher:
+    """Un item por batch y un request por batch; `fail` hace fallar los próximos fetch."""
+
+    cities = ["Caerleon"]
+    qualities = [1]
+    store = None
+
+    def __init__(self) -> None:
+        self.cache = QuoteCache()
+        self.fetched: list = []
+        self.fail = 0
+
+    def plan_chunks(self, item_ids):
+        return [[x] for x in item_ids]
+
+    def fetch_index(self, chunks, *, on_request=None):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("upstream caído")
+        for chunk in chunks:
+            on_request()
+            self.fetched.append(chunk[0])
+        return {chunk[0]: {"Caerleon": {1: quote(100)}} for chunk in chunks}
+
+
+def test_priority_weights_value_and_volatility_by_age():
+    s = RefreshScheduler(StubFetcher(), ITEMS)
+    for item_id in ITEMS:
+        s.items[item_id].refreshed_at = 100.0
+    s.items["T4_A"].value = 50_000
+    s.items["T4_B"].volatility = 0.5
+    s.items["T4_D"].refreshed_at = 0.0  # nunca se pidió
+
+    p = {x: s.priority(x, now=110.0) for x in ITEMS}
+    assert p["T4_D"] == math.inf
+    assert p["T4_C"] == pytest.approx(10.0)  # peso 1 x 10 s de edad
+    assert p["T4_A"] == pytest.approx(10.0 * (1 + 3.0 * math.log1p(5.0)))
+    assert p["T4_B"] == pytest.approx(10.0 * (1 + 20.0 * 0.5))
+    # el item quieto envejece más lento: con el doble de edad sigue atrás
+    assert s.priority("T4_C", now=120.0) < p["T4_A"] < p["T4_B"]
+
+
+def test_each_tick_spends_the_budget_on_the_highest_priority_items():
+    fetcher = StubFetcher()
+    s = RefreshScheduler(fetcher, ITEMS, requests_per_min=60)  # 1 request/s
+    for item_id in ITEMS:
+        s.items[item_id].refreshed_at = 1.0
+    s.items["T4_C"].value = 90_000
+    s.items["T4_B"].value = 10_000
+
+    first = s.tick(now=10.0)
+    assert (first.requests, first.item_ids) == (1, ["T4_C"])  # arranca con 1 token
+
+    # T4_C (alto valor) recién pedido ya le gana a T4_A, quieto y 5x más viejo
+    second = s.tick(now=12.0)  # +2 tokens
+    assert (second.requests, second.item_ids) == (2, ["T4_B", "T4_C"])
+    assert s.tick(now=12.0).requests == 0  # sin presupuesto
+
+    assert fetcher.fetched == ["T4_C", "T4_B", "T4_C"]
+    assert set(s.index) == {"T4_B", "T4_C"}
+    assert s.items["T4_C"].refreshes == 2
+
+
+def test_failed_tick_is_not_charged_and_run_keeps_going(caplog):
+    fetcher = StubFetcher()
+    fetcher.fail = 1
+    s = RefreshScheduler(fetcher, ITEMS)
+
+    with pytest.raises(RuntimeError):
+        s.tick(now=1.0)
+    assert s.tick(now=1.0).requests == 1  # el token sigue ahí
+
+    fetcher.fail = 1
+    stop = threading.Event()
+    reports = []
+
+    def on_tick(report):
+        reports.append(report)
+        stop.set()
+
+    s._tokens = 5.0
+    with caplog.at_level(logging.ERROR, logger="src.domain.refresh_scheduler"):
+        s.run(stop, tick_sec=0.01, on_tick=on_tick)
+    assert "falló" in caplog.text
+    assert reports and reports[0].requests >= 1
+
+
+def test_split_batches_are_charged_per_request_sent(fake_api):
+    server = fake_api(ServerConfig(max_url_bytes=300))
+    fetcher = PriceFetcher(
+        base_url=base_url_for(server), cities=["Caerleon", "Black Market"], qualities=[1, 2],
+        cache=QuoteCache(), flight=SingleFlight(), governor=RateGovernor(rate_per_min=60_000, burst=1000),
+        max_url_bytes=4096,
+    )
+    ids = [f"T{t}_ITEM_NUMBER_{i}" for i in range(20) for t in range(4, 9)]
+    s = RefreshScheduler(fetcher, ids, requests_per_min=600)
+    s._tokens = 1.0
+
+    report = s.tick(now=s._last_tick or 0.0)
+    sent = server.too_long + server.requests_served
+    assert server.too_long > 0
+    assert report.requests == sent > 1
+    assert s._tokens == pytest.approx(1.0 - sent)
+    assert set(report.item_ids) == set(ids)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from src.infra.regions import ENV_BASE_URL, REGION_BASE_URLS, base_url_for_region, normalize_region, run_per_region
+
+
+@pytest.mark.parametrize("raw", ["west", "West", " WEST ", "west\n"])
+def test_normalize_region(raw):
+    assert normalize_region(raw) == "west"
+
+
+@pytest.mark.parametrize("raw", ["", None, "americas", "we st"])
+def test_unknown_region_is_rejected(raw):
+    with pytest.raises(ValueError):
+        normalize_region(raw)
+
+
+def test_base_url_overrides(monkeypatch):
+    monkeypatch.delenv(ENV_BASE_URL, raising=False)
+    for region in REGION_BASE_URLS:
+        monkeypatch.delenv(f"{ENV_BASE_URL}_{region.upper()}", raising=False)
+    assert base_url_for_region("East") == REGION_BASE_URLS["east"]
+
+    monkeypatch.setenv(ENV_BASE_URL, "http://127.0.0.1:1/prices")
+    monkeypatch.setenv(f"{ENV_BASE_URL}_EUROPE", "http://127.0.0.1:2/prices")
+    assert base_url_for_region("east") == "http://127.0.0.1:1/prices"
+    assert base_url_for_region("europe") == "http://127.0.0.1:2/prices"
+
+
+def test_run_per_region_dedupes_and_runs_in_parallel():
+    barrier = threading.Barrier(2, timeout=5)  # solo pasa si las dos corren a la vez
+
+    def fn(region):
+        barrier.wait()
+        return region.upper()
+
+    assert run_per_region(["West", "east", " west"], fn) == {"west": "WEST", "east": "EAST"}
+    assert run_per_region(["Europe"], str.upper) == {"europe": "EUROPE"}
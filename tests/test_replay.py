@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+import requests
+
+from src.infra.replay import ReplayAdapter, ReplayConfig, parse_batch_url
+from src.scripts.fake_albion_api import base_url_for, start_server
+
+
+def session_for(mode: str, directory) -> requests.Session:
+    s = requests.Session()
+    s.mount("http://", ReplayAdapter(ReplayConfig(mode=mode, directory=directory)))
+    return s
+
+
+def url(base: str, ids, cities, qualities) -> str:
+    return f"{base}/{','.join(ids)}.json?locations={','.join(cities)}&qualities={','.join(map(str, qualities))}"
+
+
+def rows_of(r: requests.Response):
+    return sorted((row["item_id"], row["city"], row["quality"]) for row in json.loads(r.content))
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    server = start_server()
+    base = base_url_for(server)
+    try:
+        with session_for("record", tmp_path) as s:
+            r = s.get(url(base, ["T4_A", "T4_B", "T4_C"], ["Caerleon", "Lymhurst"], [1, 2]))
+            assert r.status_code == 200
+            original = r.content
+    finally:
+        server.shutdown()
+    return tmp_path, base, json.loads(original)
+
+
+def test_parse_batch_url():
+    b = parse_batch_url("http://h:1/api/v2/stats/prices/T4_A,T4_B,T4_A.json?locations=Caerleon,Lymhurst&qualities=1,2")
+    assert b.prefix == "h:1/api/v2/stats/prices"
+    assert b.item_ids == ["T4_A", "T4_B"]
+    assert b.covers() == {"Caerleon|1", "Caerleon|2", "Lymhurst|1", "Lymhurst|2"}
+
+
+def test_replay_of_the_same_batch_returns_the_recorded_rows(recorded):
+    directory, base, original = recorded
+    with session_for("replay", directory) as s:
+        r = s.get(url(base, ["T4_A", "T4_B", "T4_C"], ["Caerleon", "Lymhurst"], [1, 2]))
+    assert r.status_code == 200
+    assert json.loads(r.content) == original
+
+
+def test_replay_serves_batches_packed_differently(recorded):
+    directory, base, _ = recorded
+    with session_for("replay", directory) as s:
+        r = s.get(url(base, ["T4_C", "T4_A"], ["Lymhurst"], [2]))
+    assert r.status_code == 200
+    assert rows_of(r) == [("T4_A", "Lymhurst", 2), ("T4_C", "Lymhurst", 2)]
+
+
+@pytest.mark.parametrize(
+    "ids, cities, qualities",
+    [
+        (["T4_A", "T4_NEW"], ["Caerleon"], [1]),   # item nunca grabado
+        (["T4_A"], ["Bridgewatch"], [1]),          # ciudad nunca pedida
+        (["T4_A"], ["Caerleon"], [3]),             # calidad nunca pedida
+    ],
+)
+def test_replay_404_only_when_something_was_never_recorded(recorded, ids, cities, qualities):
+    directory, base, _ = recorded
+    with session_for("replay", directory) as s:
+        assert s.get(url(base, ids, cities, qualities)).status_code == 404
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from src.infra.scan_queue import ScanQueue
+
+
+@pytest.fixture
+def queue(tmp_path) -> ScanQueue:
+    return ScanQueue(tmp_path / "scan.db", max_attempts=2)
+
+
+def test_lease_is_exclusive_until_it_expires(queue):
+    scan_id = queue.create(region="west", shards=["bags"], params={})
+
+    task = queue.lease(scan_id, "w1", lease_sec=60)
+    assert task is not None and task.attempts == 1
+    assert queue.lease(scan_id, "w2", lease_sec=60) is None
+
+
+def test_expired_lease_goes_to_another_worker(queue):
+    scan_id = queue.create(region="west", shards=["bags"], params={})
+
+    first = queue.lease(scan_id, "w1", lease_sec=0.01)
+    time.sleep(0.03)
+    second = queue.lease(scan_id, "w2", lease_sec=60)
+
+    assert second is not None and second.shard == first.shard and second.attempts == 2
+    # el dueño anterior perdió el lease
+    assert queue.heartbeat(first, "w1") is False
+    assert queue.heartbeat(second, "w2") is True
+
+
+def test_expired_lease_without_attempts_left_is_failed(queue):
+    scan_id = queue.create(region="west", shards=["bags"], params={})
+
+    for worker in ("w1", "w2"):
+        assert queue.lease(scan_id, worker, lease_sec=0.01).shard == "bags"
+        time.sleep(0.03)
+
+    p = queue.progress(scan_id)
+    assert (p.pending, p.leased, p.done, p.failed) == (0, 0, 0, 1)
+    assert p.finished
+    # progress y failed_shards leen la misma columna
+    assert queue.failed_shards(scan_id) == ["bags"]
+    assert queue.lease(scan_id, "w3", lease_sec=60) is None
+
+
+def test_complete_and_fail(queue):
+    scan_id = queue.create(region="west", shards=["a", "b"], params={"top_n_global": 5})
+
+    a = queue.lease(scan_id, "w1")
+    assert queue.complete(a, "result-a") is True
+
+    b = queue.lease(scan_id, "w1")
+    queue.fail(b, "boom")  # vuelve a la cola
+    b = queue.lease(scan_id, "w1")
+    assert b.attempts == 2
+    queue.fail(b, "boom")  # sin intentos: failed
+
+    p = queue.progress(scan_id)
+    assert p.finished and (p.done, p.failed) == (1, 1)
+    assert queue.results(scan_id) == {"a": "result-a"}
+    assert queue.failed_shards(scan_id) == ["b"]
+    assert queue.job(scan_id).params == {"top_n_global": 5}
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from src.infra.single_flight import SingleFlight
+
+N_WAITERS = 8
+
+
+def run_concurrently(flight: SingleFlight, key, fn):
+    """Lanza N_WAITERS llamadas con la misma key mientras fn sigue corriendo."""
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = []
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    def call(f):
+        try:
+            outcomes.append(("ok", flight.do(key, f)))
+        except Exception as e:
+            outcomes.append(("error", e))
+
+    leader = threading.Thread(target=call, args=(leader_fn,))
+    leader.start()
+    started.wait(5)
+    others = [threading.Thread(target=call, args=(fn,)) for _ in range(N_WAITERS - 1)]
+    for t in others:
+        t.start()
+    while flight.shared < N_WAITERS - 1:
+        threading.Event().wait(0.001)
+    release.set()
+    for t in [leader, *others]:
+        t.join(5)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {"rows": 3}
+
+    outcomes = run_concurrently(flight, ("west", "url"), fn)
+    assert len(calls) == 1
+    assert len(outcomes) == N_WAITERS
+    results = [r for kind, r in outcomes if kind == "ok"]
+    assert len(results) == N_WAITERS and all(r is results[0] for r in results)
+
+
+def test_exception_is_shared_and_key_is_released():
+    flight = SingleFlight()
+
+    def boom():
+        raise RuntimeError("upstream caído")
+
+    outcomes = run_concurrently(flight, "k", boom)
+    assert [kind for kind, _ in outcomes] == ["error"] * N_WAITERS
+    assert len({id(e) for _, e in outcomes}) == 1
+
+    assert flight.do("k", lambda: 42) == 42  # la key quedó libre
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+    for _ in range(3):
+        flight.do("k", lambda: calls.append(1))
+    assert len(calls) == 3
+    assert flight.shared == 0
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do(("west", "u"), lambda: "w") == "w"
+    assert flight.do(("east", "u"), lambda: "e") == "e"
+    with pytest.raises(ValueError):
+        flight.do("bad", lambda: int("x"))